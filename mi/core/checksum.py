@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.checksum Checksums shared by parsers and drivers
+@file mi/core/checksum.py
+@brief Additive, XOR and CRC-16 checksums computed a buffer at a time
+
+Instruments use a handful of checksum schemes: sums of bytes or 16 bit words
+truncated to 8 or 16 bits, the XOR of all bytes, and several CRC-16
+variants.  The functions here compute them over a whole buffer, or a range of
+it, without looping over the bytes in python.  Sums and XORs are reduced with
+NumPy when it is installed and long buffers are checked, with bytearray and
+struct otherwise.  CRC-16s with the CCITT polynomial use binascii.crc_hqx,
+through a 256 entry bit reversal table for the reflected variants, and other
+polynomials use a 256 entry lookup table.
+
+Every function takes the buffer and an optional start and end index, so a
+record can be checked in place without slicing it out of a larger buffer.
+
+Usage:
+
+from mi.core import checksum
+checksum.sum16(record, 0, len(record) - 2)
+checksum.CRC16_X25.calculate(data)
+"""
+
+__license__ = 'Apache 2.0'
+
+import struct
+import binascii
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# initial value of the word sums in Nortek instrument records
+NORTEK_SEED = 0xB58C
+
+# buffers shorter than this are summed without numpy, whose per call overhead is more than the loop it saves
+NUMPY_MIN_BYTES = 64
+
+# byte with the bits of each byte in reverse order, used to compute reflected CRCs with an MSB first CRC
+_BIT_REVERSE = ''.join(chr(int('{0:08b}'.format(i)[::-1], 2)) for i in range(256))
+
+def _range(data, start, end):
+    """
+    Resolve the range of a buffer to check
+    @retval tuple of the start index and number of bytes
+    """
+    if end is None or end > len(data):
+        end = len(data)
+    return (start, max(end - start, 0))
+
+def _bytes(data, start, count):
+    """
+    Get a range of a buffer as a bytearray
+    """
+    if start == 0 and count == len(data):
+        return bytearray(data)
+    return bytearray(buffer(data, start, count))
+
+def byte_sum(data, start=0, end=None):
+    """
+    Sum the unsigned bytes in a buffer
+    @param data buffer to sum
+    @param start index of the first byte to sum
+    @param end index after the last byte to sum, None for the end of the buffer
+    @retval the sum, not truncated
+    """
+    (start, count) = _range(data, start, end)
+    if numpy is not None and count >= NUMPY_MIN_BYTES:
+        return int(numpy.frombuffer(data, numpy.uint8, count, start).sum(dtype=numpy.uint64))
+    return sum(_bytes(data, start, count))
+
+def sum8(data, start=0, end=None):
+    """
+    8 bit additive checksum, the sum of the bytes modulo 256
+    """
+    return byte_sum(data, start, end) & 0xFF
+
+def sum16(data, start=0, end=None):
+    """
+    16 bit additive checksum, the sum of the bytes modulo 65536
+    """
+    return byte_sum(data, start, end) & 0xFFFF
+
+def word_sum16(data, start=0, end=None, seed=0, big_endian=False):
+    """
+    Sum the unsigned 16 bit words in a buffer modulo 65536.  A trailing odd byte is not summed.
+    @param data buffer to sum
+    @param start index of the first word
+    @param end index after the last word, None for the end of the buffer
+    @param seed initial value of the sum
+    @param big_endian True if the words are big endian, little endian by default
+    @retval the 16 bit sum
+    """
+    (start, count) = _range(data, start, end)
+    words = count / 2
+    if numpy is not None and count >= NUMPY_MIN_BYTES:
+        dtype = numpy.dtype('>u2' if big_endian else '<u2')
+        total = int(numpy.frombuffer(data, dtype, words, start).sum(dtype=numpy.uint64))
+    else:
+        total = sum(struct.unpack_from('%s%dH' % ('>' if big_endian else '<', words), data, start))
+    return (seed + total) & 0xFFFF
+
+def nortek_checksum(data, start=0, end=None):
+    """
+    Checksum of Nortek instrument records, the sum of the little endian 16 bit words
+    starting from NORTEK_SEED, modulo 65536
+    """
+    return word_sum16(data, start, end, NORTEK_SEED)
+
+def xor8(data, start=0, end=None):
+    """
+    XOR of the bytes in a buffer, as used by NMEA sentences
+    """
+    (start, count) = _range(data, start, end)
+    if numpy is not None and count >= NUMPY_MIN_BYTES:
+        return int(numpy.bitwise_xor.reduce(numpy.frombuffer(data, numpy.uint8, count, start)))
+    return reduce(operator.xor, _bytes(data, start, count), 0)
+
+def _reverse16(value):
+    """
+    Reverse the order of the bits in a 16 bit value
+    """
+    return (ord(_BIT_REVERSE[value & 0xFF]) << 8) | ord(_BIT_REVERSE[value >> 8])
+
+class Crc16(object):
+    """
+    A CRC-16 variant, described by its polynomial, initial value, final XOR and
+    bit order.
+    """
+    # the polynomial binascii.crc_hqx computes
+    CCITT_POLY = 0x1021
+
+    def __init__(self, poly, init=0, xor_out=0, reflected=False):
+        """
+        @param poly generator polynomial in MSB first form, without the x^16 term
+        @param init initial register value
+        @param xor_out value XORed with the register at the end
+        @param reflected True if bytes are processed LSB first, as in X.25 and Kermit
+        """
+        self.poly = poly
+        self.init = init
+        self.xor_out = xor_out
+        self.reflected = reflected
+        self._table = self._build_table()
+
+    def _build_table(self):
+        """
+        Build the 256 entry table of the register updates for each byte value
+        """
+        table = []
+        if self.reflected:
+            poly = _reverse16(self.poly)
+            for i in range(256):
+                crc = i
+                for bit in range(8):
+                    if crc & 1:
+                        crc = (crc >> 1) ^ poly
+                    else:
+                        crc >>= 1
+                table.append(crc)
+        else:
+            for i in range(256):
+                crc = i << 8
+                for bit in range(8):
+                    if crc & 0x8000:
+                        crc = ((crc << 1) ^ self.poly) & 0xFFFF
+                    else:
+                        crc = (crc << 1) & 0xFFFF
+                table.append(crc)
+        return table
+
+    def calculate(self, data, start=0, end=None):
+        """
+        Calculate the CRC of a buffer
+        @param data buffer to check
+        @param start index of the first byte
+        @param end index after the last byte, None for the end of the buffer
+        @retval the CRC as an integer
+        """
+        (start, count) = _range(data, start, end)
+        if start != 0 or count != len(data):
+            data = buffer(data, start, count)
+
+        if self.poly == self.CCITT_POLY:
+            if self.reflected:
+                # a reflected CRC is the reverse of the MSB first CRC of the bit reversed bytes
+                crc = _reverse16(binascii.crc_hqx(str(data).translate(_BIT_REVERSE), _reverse16(self.init)))
+            else:
+                crc = binascii.crc_hqx(data, self.init)
+        else:
+            table = self._table
+            crc = self.init
+            if self.reflected:
+                for byte in bytearray(data):
+                    crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+            else:
+                for byte in bytearray(data):
+                    crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ byte]
+        return crc ^ self.xor_out
+
+# CRC of SIO block data, also known as CRC-16/IBM-SDLC
+CRC16_X25 = Crc16(0x1021, init=0xFFFF, xor_out=0xFFFF, reflected=True)
+CRC16_KERMIT = Crc16(0x1021, reflected=True)
+CRC16_XMODEM = Crc16(0x1021)
+CRC16_CCITT_FALSE = Crc16(0x1021, init=0xFFFF)
+CRC16_ARC = Crc16(0x8005, reflected=True)
+CRC16_MODBUS = Crc16(0x8005, init=0xFFFF, reflected=True)
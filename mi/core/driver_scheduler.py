@@ -101,6 +101,10 @@ USAGE:
 
 scheduler = DriverScheduler(config)
 
+-or, to share one timer wheel thread with every other scheduler in the process-
+
+scheduler = DriverScheduler(config, SchedulerBackend.TIMER_WHEEL)
+
 -or-
 
 scheduler = DriverScheduler()
@@ -128,8 +132,29 @@ from mi.core.log import get_logger; log = get_logger()
 
 from mi.core.common import BaseEnum
 from mi.core.scheduler import PolledScheduler
+from mi.core.scheduler import TimerWheelScheduler
 from mi.core.exceptions import SchedulerException
 
+class SchedulerBackend(BaseEnum):
+    # An apscheduler PolledScheduler, with its own thread, per DriverScheduler
+    APSCHEDULER = 'apscheduler'
+    # One timer wheel thread shared by every DriverScheduler in the process
+    TIMER_WHEEL = 'timer_wheel'
+
+_default_backend = SchedulerBackend.APSCHEDULER
+
+def set_default_backend(backend):
+    """
+    Set the backend for DriverSchedulers created without an explicit one.
+    Processes hosting many drivers should use TIMER_WHEEL.
+    @param backend: a SchedulerBackend value
+    @raise SchedulerException if the backend is unknown
+    """
+    global _default_backend
+    if not SchedulerBackend.has(backend):
+        raise SchedulerException("unknown scheduler backend '%s'" % backend)
+    _default_backend = backend
+
 class TriggerType(BaseEnum):
     ABSOLUTE = 'absolute'
     INTERVAL = 'interval'
@@ -176,7 +201,7 @@ class DriverScheduler(object):
     jobs.
     """
 
-    def __init__(self, config = None):
+    def __init__(self, config = None, backend = None):
         """
         config structure:
         {
@@ -186,8 +211,18 @@ class DriverScheduler(object):
             }
         }
         @param config: job configuration structure.
+        @param backend: SchedulerBackend value, defaults to the value set
+                        with set_default_backend.
         """
-        self._scheduler = PolledScheduler()
+        if(backend == None):
+            backend = _default_backend
+
+        if(backend == SchedulerBackend.TIMER_WHEEL):
+            self._scheduler = TimerWheelScheduler()
+        elif(backend == SchedulerBackend.APSCHEDULER):
+            self._scheduler = PolledScheduler()
+        else:
+            raise SchedulerException("unknown scheduler backend '%s'" % backend)
         if(config):
             self.add_config(config)
 
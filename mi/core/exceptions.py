@@ -11,6 +11,8 @@ in the driver code.
 __author__ = 'Edward Hunter'
 __license__ = 'Apache 2.0'
 
+import copy_reg
+
 from mi.core.log import get_logger
 log = get_logger()
 
@@ -36,6 +38,16 @@ class InstrumentException(ApplicationException):
     def get_triple(self):
         """ get exception info without depending on MI exception classes """
         return ( self.error_code, "%s: %s" % (self.__class__.__name__, self.msg), self._stacks )
+
+    def __reduce__(self):
+        """
+        Pickle by attributes.  args holds (error_code, msg), which is not what the
+        constructors take, so the default of calling the class with args would
+        swap them, or fail for subclasses that only take msg.
+        """
+        state = dict(self.__dict__)
+        state['args'] = self.args
+        return (copy_reg.__newobj__, (self.__class__,), state)
     
 class InstrumentConnectionException(InstrumentException):
     """Exception related to connection with a physical instrument"""
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.inotify Minimal Linux inotify binding
+@file mi/core/inotify.py
+@brief ctypes wrapper around the libc inotify calls, used to watch
+directories without polling them. There is no third party dependency;
+on platforms without inotify, available() is False and callers fall back
+to polling.
+
+Usage:
+
+if inotify.available():
+    watcher = inotify.Inotify()
+    watcher.add_watch('/tmp/data', inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO)
+    for (wd, mask, cookie, name) in watcher.read_events(timeout=1):
+        ...
+    watcher.close()
+"""
+
+__license__ = 'Apache 2.0'
+
+import os
+import errno
+import select
+import struct
+import ctypes
+import threading
+import ctypes.util
+
+# Event masks, from <sys/inotify.h>
+IN_ACCESS = 0x00000001
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_CLOSE_NOWRITE = 0x00000010
+IN_OPEN = 0x00000020
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# inotify_init1 flags
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o0004000
+
+# struct inotify_event header: wd, mask, cookie, len
+EVENT_HEADER = struct.Struct('iIII')
+READ_SIZE = 64 * 1024
+
+def _load_libc():
+    """
+    Load libc and check it has the inotify calls.
+    @retval The libc CDLL, or None if inotify is not available.
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        for name in ('inotify_init1', 'inotify_add_watch', 'inotify_rm_watch'):
+            getattr(libc, name)
+    except (OSError, AttributeError):
+        return None
+
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+_libc = _load_libc()
+
+def available():
+    """
+    @retval True if this platform supports inotify.
+    """
+    return _libc is not None
+
+def _check(result):
+    """
+    Raise an OSError from errno if a libc call failed.
+    """
+    if result < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return result
+
+class Inotify(object):
+    """
+    One inotify instance. Read events from one thread; wake and close may
+    be called from any thread.
+    """
+
+    def __init__(self):
+        if _libc is None:
+            raise OSError(errno.ENOSYS, 'inotify is not available on this platform')
+        self.fd = _check(_libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC))
+        self._wake_read_fd, self._wake_write_fd = os.pipe()
+        # Keeps wake from writing to a pipe close has released
+        self._lock = threading.Lock()
+
+    def fileno(self):
+        return self.fd
+
+    def add_watch(self, path, mask):
+        """
+        Watch a path.
+        @param path File or directory to watch.
+        @param mask IN_* events to report.
+        @retval The watch descriptor.
+        """
+        return _check(_libc.inotify_add_watch(self.fd, path, mask))
+
+    def rm_watch(self, wd):
+        """
+        Stop watching a watch descriptor from add_watch.
+        """
+        _check(_libc.inotify_rm_watch(self.fd, wd))
+
+    def read_events(self, timeout=None):
+        """
+        Wait for and read the pending events.
+        @param timeout Seconds to wait for an event, None to block.
+        @retval List of (wd, mask, cookie, name) tuples, empty on timeout
+        or wake.
+        Name is the file name relative to a watched directory, or '' for
+        events on the watched path itself.
+        """
+        readable, _, _ = select.select([self.fd, self._wake_read_fd], [], [], timeout)
+        if self._wake_read_fd in readable:
+            os.read(self._wake_read_fd, 4096)
+        if self.fd not in readable:
+            return []
+        try:
+            buf = os.read(self.fd, READ_SIZE)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return []
+            raise
+
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buf):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(buf, offset)
+            offset += EVENT_HEADER.size
+            name = buf[offset:offset + length].rstrip('\0')
+            offset += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def wake(self):
+        """
+        Make a read_events call in another thread return now.
+        """
+        with self._lock:
+            if self.fd is not None:
+                os.write(self._wake_write_fd, 'x')
+
+    def close(self):
+        """
+        Release the inotify instance and all its watches.
+        """
+        with self._lock:
+            if self.fd is not None:
+                os.close(self.fd)
+                os.close(self._wake_read_fd)
+                os.close(self._wake_write_fd)
+                self.fd = None
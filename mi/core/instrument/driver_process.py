@@ -11,7 +11,9 @@ __author__ = 'Edward Hunter'
 __license__ = 'Apache 2.0'
 
 import logging
+from collections import deque
 from threading import Thread
+from threading import Condition
 from subprocess import Popen
 from subprocess import PIPE
 import signal
@@ -19,11 +21,69 @@ import os
 import sys
 import time
 import traceback
+from mi.core.common import BaseEnum
 from mi.core.exceptions import InstrumentException, InstrumentCommandException
 from mi.core.instrument.instrument_driver import DriverAsyncEvent
+from mi.core.instrument.data_particle import CommonDataParticleType
 
 from ooi.logging import log
 
+# Seconds a blocked producer or idle consumer waits before rechecking
+# the messaging state.
+EVENT_QUEUE_WAIT = 0.1
+
+# Commands that only read driver state without going through the driver
+# state machines, so are safe to run concurrently with each other and with
+# a command already in progress.
+CONCURRENT_COMMANDS = (
+    'process_echo',
+    'get_event_stats',
+    'get_resource_state',
+    'get_resource_capabilities',
+    'get_init_params',
+    'get_config_metadata',
+)
+
+RAW_STREAM_TAG = '"stream_name": "%s"' % CommonDataParticleType.RAW
+
+class EventOverflowPolicy(BaseEnum):
+    """
+    What send_event does when the event queue is at max_events.
+    BLOCK - block the producer until the event thread makes room.
+    DROP_OLDEST_RAW - discard the oldest raw data sample to make room,
+        falling back to the oldest event if no raw sample is queued.
+    DROP_NONE - never drop, the queue grows past max_events.
+    """
+    BLOCK = 'BLOCK'
+    DROP_OLDEST_RAW = 'DROP_OLDEST_RAW'
+    DROP_NONE = 'DROP_NONE'
+
+class EventQueueStat(BaseEnum):
+    """
+    Keys of the event queue statistics dict.
+    """
+    DEPTH = 'depth'
+    MAX_DEPTH = 'max_depth'
+    QUEUED = 'queued'
+    SENT = 'sent'
+    DROPPED = 'dropped'
+    BLOCKED = 'blocked'
+
+def is_raw_sample_event(evt):
+    """
+    Test whether an event carries a raw data particle.
+    @param evt A driver event.
+    @retval True if evt is a sample event for the raw stream.
+    """
+    if not isinstance(evt, dict) or evt.get('type') != DriverAsyncEvent.SAMPLE:
+        return False
+    value = evt.get('value')
+    if isinstance(value, dict):
+        return value.get('stream_name') == CommonDataParticleType.RAW
+    if isinstance(value, basestring):
+        return RAW_STREAM_TAG in value
+    return False
+
 class DriverProcess(object):
     """
     Base class for messaging enabled OS-level driver processes. Provides
@@ -32,31 +92,55 @@ class DriverProcess(object):
     """
     
     @staticmethod
-    def launch_process(cmd_str):
+    def launch_process(cmd_str, keep_fds=None):
         """
         Base class static constructor. Launch the calling class as a
         separate OS level process. This method combines the derived class
         command string with the common python interpreter command.
         @param cmd_string The python command sequence to import, create and
         run a derived class object.
+        @param keep_fds Descriptors to leave open in the child, all others
+        above stderr are closed.
         @retval a Popen object representing the dirver process.
         """
 
         # Launch a separate python interpreter, executing the calling
         # class command string.
         spawnargs = ['bin/python', '-c', cmd_str]
-        return Popen(spawnargs, close_fds=True)
+        if not keep_fds:
+            return Popen(spawnargs, close_fds=True)
+
+        max_fd = os.sysconf('SC_OPEN_MAX')
+        def close_fds():
+            low = 3
+            for fd in sorted(keep_fds):
+                os.closerange(low, fd)
+                low = fd + 1
+            os.closerange(low, max_fd)
+        return Popen(spawnargs, close_fds=False, preexec_fn=close_fds)
         
-    def __init__(self, driver_module, driver_class, ppid):
+    def __init__(self, driver_module, driver_class, ppid, max_events=None,
+                 overflow_policy=EventOverflowPolicy.DROP_NONE):
         """
         @param driver_module The python module containing the driver code.
         @param driver_class The python driver class.
+        @param ppid ID of the parent process.
+        @param max_events Event queue depth at which the overflow policy
+        applies, None for unbounded.
+        @param overflow_policy An EventOverflowPolicy value.
         """
+        if not EventOverflowPolicy.has(overflow_policy):
+            raise InstrumentException('Unknown event overflow policy %s' %
+                                      overflow_policy)
         self.driver_module = driver_module
         self.driver_class = driver_class
         self.ppid = ppid
         self.driver = None
-        self.events = []
+        self.events = deque()
+        self.events_cond = Condition()
+        self.max_events = max_events
+        self.overflow_policy = overflow_policy
+        self.event_stats = dict((key, 0) for key in EventQueueStat.list())
         self.messaging_started = False
         
     def construct_driver(self):
@@ -130,6 +214,7 @@ class DriverProcess(object):
         'stop_driver_process' - signal to close messaging and terminate.
         'test_events' - populate event queue with test data.
         'process_echo' - echos the message back.
+        'get_event_stats' - returns the event queue statistics.
         If the command is not found in the driver, an echo message is
         replied to the client.
         @param msg A driver command message.
@@ -145,8 +230,11 @@ class DriverProcess(object):
             return'stop_driver_process'
         elif cmd == 'test_events':
             events = kwargs['events']
-            self.events += events
+            for evt in events:
+                self.send_event(evt)
             reply = 'test_events'
+        elif cmd == 'get_event_stats':
+            reply = self.get_event_stats()
         elif cmd == 'process_echo':
             reply = 'ping from resource ppid:%s, resource:%s' % (str(self.ppid), str(self.driver))
             #try:
@@ -187,9 +275,81 @@ class DriverProcess(object):
             
     def send_event(self, evt):
         """
-        Append an event to the list to be sent by the event threaed.
+        Append an event to the queue to be sent by the event thread,
+        applying the overflow policy if the queue is full.
+        """
+        with self.events_cond:
+            if self.max_events is not None and len(self.events) >= self.max_events:
+                self._handle_overflow()
+            self.events.append(evt)
+            self.event_stats[EventQueueStat.QUEUED] += 1
+            depth = len(self.events)
+            if depth > self.event_stats[EventQueueStat.MAX_DEPTH]:
+                self.event_stats[EventQueueStat.MAX_DEPTH] = depth
+            self.events_cond.notify_all()
+
+    def _handle_overflow(self):
+        """
+        Make room in a full event queue according to the overflow policy.
+        Must be called with events_cond held.
+        """
+        if self.overflow_policy == EventOverflowPolicy.BLOCK:
+            self.event_stats[EventQueueStat.BLOCKED] += 1
+            while len(self.events) >= self.max_events and self.messaging_started:
+                self.events_cond.wait(EVENT_QUEUE_WAIT)
+
+        elif self.overflow_policy == EventOverflowPolicy.DROP_OLDEST_RAW:
+            for index, queued in enumerate(self.events):
+                if self.is_raw_event(queued):
+                    del self.events[index]
+                    break
+            else:
+                self.events.popleft()
+            self.event_stats[EventQueueStat.DROPPED] += 1
+
+    def is_raw_event(self, evt):
+        """
+        Test whether a queued event is a raw sample the DROP_OLDEST_RAW
+        policy may discard.
+        """
+        return is_raw_sample_event(evt)
+
+    def get_event_batch(self, max_count, linger=0, timeout=EVENT_QUEUE_WAIT):
+        """
+        Remove and return up to max_count queued events for sending.
+        @param max_count Maximum number of events to return.
+        @param linger Seconds to keep collecting once the first event is
+        available, for a batch of fewer than max_count events.
+        @param timeout Seconds to wait for the first event, None to wait
+        until an event is queued or the queue is notified.
+        @retval List of events, empty if none arrived before the timeout.
+        """
+        batch = []
+        with self.events_cond:
+            if not self.events:
+                self.events_cond.wait(timeout)
+            if self.events and linger and len(self.events) < max_count:
+                deadline = time.time() + linger
+                remaining = linger
+                while len(self.events) < max_count and remaining > 0:
+                    self.events_cond.wait(remaining)
+                    remaining = deadline - time.time()
+            while self.events and len(batch) < max_count:
+                batch.append(self.events.popleft())
+            if batch:
+                self.event_stats[EventQueueStat.SENT] += len(batch)
+                # Wake producers blocked on a full queue.
+                self.events_cond.notify_all()
+        return batch
+
+    def get_event_stats(self):
+        """
+        Return a copy of the event queue statistics with current depth.
         """
-        self.events.append(evt)
+        with self.events_cond:
+            stats = dict(self.event_stats)
+            stats[EventQueueStat.DEPTH] = len(self.events)
+        return stats
             
     def run(self):
         """
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.test_driver_process
+@file mi/core/instrument/test/test_driver_process.py
+@brief Test cases for the DriverProcess event queue.
+"""
+
+__license__ = 'Apache 2.0'
+
+import json
+
+from nose.plugins.attrib import attr
+
+from mi.core.log import get_logger ; log = get_logger()
+
+from mi.core.unit_test import MiUnitTest
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
+from mi.core.instrument.driver_process import DriverProcess
+from mi.core.instrument.driver_process import EventOverflowPolicy
+from mi.core.instrument.driver_process import EventQueueStat
+from mi.core.instrument.driver_process import is_raw_sample_event
+
+
+def sample_event(stream_name, value):
+    return {'type': DriverAsyncEvent.SAMPLE,
+            'value': json.dumps({'stream_name': stream_name, 'value': value}),
+            'time': 0}
+
+
+@attr('UNIT', group='mi')
+class TestDriverProcessEvents(MiUnitTest):
+    """
+    Unit tests for event queueing in the base driver process.
+    """
+    def test_raw_sample_event(self):
+        self.assertTrue(is_raw_sample_event(sample_event('raw', 1)))
+        self.assertFalse(is_raw_sample_event(sample_event('ctdpf_parsed', 1)))
+        self.assertFalse(is_raw_sample_event('not an event'))
+
+    def test_batch(self):
+        """
+        Events come out in order, in batches of at most max_count.
+        """
+        dp = DriverProcess('module', 'klass', None)
+        for i in range(5):
+            dp.send_event(i)
+        self.assertEqual(dp.get_event_batch(3), [0, 1, 2])
+        self.assertEqual(dp.get_event_batch(3), [3, 4])
+        self.assertEqual(dp.get_event_batch(3, timeout=0), [])
+
+        stats = dp.get_event_stats()
+        self.assertEqual(stats[EventQueueStat.QUEUED], 5)
+        self.assertEqual(stats[EventQueueStat.SENT], 5)
+        self.assertEqual(stats[EventQueueStat.MAX_DEPTH], 5)
+        self.assertEqual(stats[EventQueueStat.DEPTH], 0)
+
+    def test_drop_none(self):
+        dp = DriverProcess('module', 'klass', None, max_events=2)
+        for i in range(5):
+            dp.send_event(i)
+        self.assertEqual(dp.get_event_stats()[EventQueueStat.DEPTH], 5)
+        self.assertEqual(dp.get_event_stats()[EventQueueStat.DROPPED], 0)
+
+    def test_drop_oldest_raw(self):
+        dp = DriverProcess('module', 'klass', None, max_events=3,
+                           overflow_policy=EventOverflowPolicy.DROP_OLDEST_RAW)
+        parsed = sample_event('ctdpf_parsed', 1)
+        raw_1 = sample_event('raw', 1)
+        raw_2 = sample_event('raw', 2)
+        dp.send_event(parsed)
+        dp.send_event(raw_1)
+        dp.send_event(raw_2)
+        dp.send_event('state change')
+        self.assertEqual(dp.get_event_batch(10), [parsed, raw_2, 'state change'])
+
+        # With no raw samples queued the oldest event goes.
+        for i in range(4):
+            dp.send_event(i)
+        self.assertEqual(dp.get_event_batch(10), [1, 2, 3])
+        self.assertEqual(dp.get_event_stats()[EventQueueStat.DROPPED], 2)
+
+    def test_block_when_stopped(self):
+        """
+        A blocking producer does not hang when messaging is not running.
+        """
+        dp = DriverProcess('module', 'klass', None, max_events=1,
+                           overflow_policy=EventOverflowPolicy.BLOCK)
+        dp.send_event(1)
+        dp.send_event(2)
+        self.assertEqual(dp.get_event_stats()[EventQueueStat.BLOCKED], 1)
+        self.assertEqual(dp.get_event_batch(10), [1, 2])
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.test_zmq_driver_host
+@file mi/core/instrument/test/test_zmq_driver_host.py
+@brief Test cases for routing in the multi-driver host process.
+"""
+
+__license__ = 'Apache 2.0'
+
+import cPickle as pickle
+
+from nose.plugins.attrib import attr
+
+from mi.core.log import get_logger ; log = get_logger()
+
+from mi.core.unit_test import MiUnitTest
+from mi.core.exceptions import InstrumentCommandException
+from mi.core.instrument.zmq_driver_host import ZmqDriverHostProcess
+from mi.core.instrument.zmq_topics import event_topic
+
+
+class FakeDriver(object):
+    def __init__(self, name):
+        self.name = name
+
+    def whoami(self):
+        return self.name
+
+    def unpicklable(self):
+        return lambda: self.name
+
+
+@attr('UNIT', group='mi')
+class TestZmqDriverHost(MiUnitTest):
+    """
+    Unit tests for the driver host, without sockets.
+    """
+    def setUp(self):
+        self.host = ZmqDriverHostProcess({'d1': ('module', 'Driver'),
+                                          'd10': ('module', 'Driver')}, None)
+        for driver_id, hosted in self.host.drivers.items():
+            hosted.driver = FakeDriver(driver_id)
+
+    def test_route_commands(self):
+        msg = {'cmd': 'whoami', 'args': (), 'kwargs': {}}
+        msg['driver_id'] = 'd10'
+        self.assertEqual(self.host.cmd_driver(msg), 'd10')
+        msg['driver_id'] = 'd1'
+        self.assertEqual(self.host.cmd_driver(msg), 'd1')
+        msg['driver_id'] = 'd2'
+        self.assertIsInstance(self.host.cmd_driver(msg), Exception)
+
+    def test_run_cmd_errors(self):
+        """
+        Errors outside the driver command are replied as encoded exceptions.
+        """
+        reply = pickle.loads(self.host.run_cmd({'cmd': 'whoami', 'args': (), 'kwargs': {}, 'driver_id': 'd1'}))
+        self.assertEqual(reply, 'd1')
+        # args that are not a sequence fail before the driver is called
+        reply = pickle.loads(self.host.run_cmd({'cmd': 'whoami', 'args': 5, 'kwargs': {}, 'driver_id': 'd1'}))
+        self.assertEqual(len(reply), 3)
+        reply = pickle.loads(self.host.run_cmd({'cmd': 'unpicklable', 'args': (), 'kwargs': {},
+                                                'driver_id': 'd1'}))
+        self.assertEqual(len(reply), 3)
+        reply = pickle.loads(self.host.run_cmd(['not', 'a', 'dict']))
+        self.assertEqual(len(reply), 3)
+
+    def test_load_cmd_msg(self):
+        msg = {'cmd': 'whoami', 'driver_id': 'd1'}
+        self.assertEqual(self.host.load_cmd_msg([pickle.dumps(msg)]), msg)
+        self.assertRaises(InstrumentCommandException, self.host.load_cmd_msg, [])
+        self.assertRaises(InstrumentCommandException, self.host.load_cmd_msg, ['garbage'])
+        self.assertRaises(InstrumentCommandException, self.host.load_cmd_msg, [pickle.dumps('whoami')])
+
+    def test_serial_index(self):
+        self.assertNotEqual(self.host.serial_index({'driver_id': 'd1'}),
+                            self.host.serial_index({'driver_id': 'd10'}))
+
+    def test_event_messages(self):
+        self.host.drivers['d1'].send_event('a')
+        self.host.drivers['d1'].send_event('b')
+        self.host.drivers['d10'].send_event('c')
+        messages = self.host.event_messages(self.host.get_event_batch(10))
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(messages[0][0], event_topic('d1'))
+        self.assertEqual([pickle.loads(f) for f in messages[0][1:]], ['a', 'b'])
+        self.assertEqual(messages[1][0], event_topic('d10'))
+        self.assertFalse(messages[1][0].startswith(event_topic('d1')))
+
+    def test_stop_one_driver(self):
+        self.host.messaging_started = True
+        self.host.cmd_driver({'cmd': 'stop_driver_process', 'driver_id': 'd1'})
+        self.assertEqual(self.host.drivers.keys(), ['d10'])
+        self.assertTrue(self.host.messaging_started)
+        self.host.cmd_driver({'cmd': 'stop_driver_process', 'driver_id': 'd10'})
+        self.assertFalse(self.host.messaging_started)
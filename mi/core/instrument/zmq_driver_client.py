@@ -18,30 +18,126 @@ c = zdc.ZmqDriverClient('localhost', 5556, 5557)
 """
 
 import thread
+import threading
+import itertools
 import logging
 import time
+import cPickle as pickle
 
 # We import "regular" zmq, not the patched version because
 # we handle the nonblocking sockets directly as they need to work
 # with unpatched threads as well.
 import zmq
 
+from mi.core.exceptions import InstrumentTimeoutException
 from mi.core.instrument.driver_client import DriverClient
+from mi.core.instrument.zmq_topics import event_topic
 from mi.core.log import get_logger ; log = get_logger()
 
+# Poll slice schedule in milliseconds. Slices start short so a fast reply
+# is picked up as soon as it lands, and are capped so that a caller running
+# as a greenlet yields back to the hub between slices.
+POLL_SLICES_MS = (1, 2, 5, 10, 20, 50)
+
+
+def _poll_socket(poller, stop_check=None, timeout=None):
+    """
+    Block on a zmq poller until one of its sockets is ready, waiting in
+    escalating slices rather than fixed sleeps.
+    @param poller zmq.Poller with the socket(s) of interest registered.
+    @param stop_check Optional callable, polling is abandoned when it
+    returns True.
+    @param timeout Optional timeout in seconds, None waits indefinitely.
+    @retval True if a socket is ready, False on stop or timeout.
+    """
+    deadline = None
+    if timeout is not None:
+        deadline = time.time() + timeout
+    slice_index = 0
+    while True:
+        if stop_check and stop_check():
+            return False
+        wait_ms = POLL_SLICES_MS[slice_index]
+        if deadline is not None:
+            remaining_ms = int((deadline - time.time()) * 1000)
+            if remaining_ms <= 0:
+                return False
+            wait_ms = min(wait_ms, remaining_ms)
+        if poller.poll(wait_ms):
+            return True
+        if slice_index < len(POLL_SLICES_MS) - 1:
+            slice_index += 1
+        # Give cooperative schedulers a chance to run between slices.
+        time.sleep(0)
+
+
+class DriverCommandFuture(object):
+    """
+    The pending reply to a driver command sent with cmd_dvr_async.
+    """
+
+    def __init__(self, client=None):
+        """
+        @param client The ZmqDriverClient that will receive the reply.
+        """
+        self._client = client
+        self._done = False
+        self._reply = None
+
+    def ready(self):
+        """
+        @retval True if the reply has arrived.
+        """
+        return self._done
+
+    def set(self, reply):
+        """
+        Record the reply and mark the command done.
+        @param reply The driver reply.
+        """
+        self._reply = reply
+        self._done = True
+
+    def get(self, timeout=None):
+        """
+        Block until the reply arrives and return it.
+        @param timeout Seconds to wait, None to wait indefinitely.
+        @retval Command result.
+        @raises InstrumentTimeoutException if the reply does not arrive in time.
+        @raises The reply if the driver returned an exception.
+        """
+        if not self._done:
+            self._client._await_reply(self, timeout)
+        if not self._done:
+            raise InstrumentTimeoutException('No driver reply in %s seconds' % timeout)
+        if isinstance(self._reply, Exception):
+            raise self._reply
+        return self._reply
+
  
 class ZmqDriverClient(DriverClient):
     """
     A class for communicating with a ZMQ-based driver process using python
     thread for catching asynchronous driver events.
+
+    By default commands go over a REQ socket, one exchange at a time.
+    A pipelined client uses a DEALER socket instead and tags each request
+    with an id, so several commands can be in flight at once; replies are
+    matched back to their futures by whichever caller is waiting.
+
+    A client with a driver_id talks to one driver of a ZmqDriverHostProcess:
+    commands carry the id and only that driver's events are received.
     """
     
-    def __init__(self, host, cmd_port, event_port):
+    def __init__(self, host, cmd_port, event_port, pipelined=False, driver_id=None):
         """
         Initialize members.
         @param host Host string address of the driver process.
         @param cmd_port Port number for the driver process command port.
         @param event_port Port number for the driver process event port.
+        @param pipelined True to allow several commands in flight at once.
+        @param driver_id Id of the driver in a driver host process, or None
+        for a single driver process.
         """
         DriverClient.__init__(self)
         self.host = host
@@ -51,8 +147,14 @@ class ZmqDriverClient(DriverClient):
         self.event_host_string = 'tcp://%s:%i' % (self.host, self.event_port)
         self.zmq_context = None
         self.zmq_cmd_socket = None
+        self.zmq_cmd_poller = None
         self.event_thread = None
         self.stop_event_thread = True
+        self.pipelined = pipelined
+        self.driver_id = driver_id
+        self._cmd_lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self._pending = {}
         
     def start_messaging(self, evt_callback=None):
         """
@@ -62,8 +164,13 @@ class ZmqDriverClient(DriverClient):
         process independently of command request-reply.
         """
         self.zmq_context = zmq.Context()
-        self.zmq_cmd_socket = self.zmq_context.socket(zmq.REQ)
+        if self.pipelined:
+            self.zmq_cmd_socket = self.zmq_context.socket(zmq.DEALER)
+        else:
+            self.zmq_cmd_socket = self.zmq_context.socket(zmq.REQ)
         self.zmq_cmd_socket.connect(self.cmd_host_string)
+        self.zmq_cmd_poller = zmq.Poller()
+        self.zmq_cmd_poller.register(self.zmq_cmd_socket, zmq.POLLIN)
         log.info('Driver client cmd socket connected to %s.' %
                        self.cmd_host_string)        
         self.evt_callback = evt_callback
@@ -71,30 +178,39 @@ class ZmqDriverClient(DriverClient):
         def recv_evt_messages(driver_client):
             """
             A looping function that monitors a ZMQ SUB socket for asynchronous
-            driver events. Can be run as a thread or greenlet.
+            driver events. Each message is a batch of events, one pickled
+            event per frame. Can be run as a thread or greenlet.
             @param driver_client The client object that launches the thread.
             """
             context = zmq.Context()
             sock = context.socket(zmq.SUB)
             sock.connect(driver_client.event_host_string)
-            sock.setsockopt(zmq.SUBSCRIBE, '')
+            if driver_client.driver_id is None:
+                sock.setsockopt(zmq.SUBSCRIBE, '')
+                first_event_frame = 0
+            else:
+                sock.setsockopt(zmq.SUBSCRIBE, event_topic(driver_client.driver_id))
+                first_event_frame = 1
             log.info('Driver client event thread connected to %s.' %
                   driver_client.event_host_string)
 
+            poller = zmq.Poller()
+            poller.register(sock, zmq.POLLIN)
+            stop_check = lambda: driver_client.stop_event_thread
+
             driver_client.stop_event_thread = False
-            #last_time = time.time()
-            while not driver_client.stop_event_thread:
-                try:
-                    evt = sock.recv_pyobj(flags=zmq.NOBLOCK)
-                    log.debug('got event: %s' % str(evt))
-                    if driver_client.evt_callback:
-                        driver_client.evt_callback(evt)
-                except zmq.ZMQError:
-                    time.sleep(.5)
-                #cur_time = time.time()
-                #if cur_time - last_time > 5:
-                #    log.info('event thread listening')
-                #    last_time = cur_time
+            while _poll_socket(poller, stop_check):
+                # Drain everything that is queued before polling again.
+                while not driver_client.stop_event_thread:
+                    try:
+                        frames = sock.recv_multipart(flags=zmq.NOBLOCK)
+                    except zmq.ZMQError:
+                        break
+                    for frame in frames[first_event_frame:]:
+                        evt = pickle.loads(frame)
+                        log.debug('got event: %s' % str(evt))
+                        if driver_client.evt_callback:
+                            driver_client.evt_callback(evt)
             sock.close()
             context.term()
             log.info('Client event socket closed.')
@@ -109,10 +225,12 @@ class ZmqDriverClient(DriverClient):
         Await event thread completion and return.
         """
         
+        self.zmq_cmd_poller = None
         self.zmq_cmd_socket.close()
         self.zmq_cmd_socket = None
         self.zmq_context.term()
         self.zmq_context = None
+        self._pending = {}
         self.stop_event_thread = True                    
         #self.event_thread.join()
         self.event_thread = None
@@ -121,17 +239,91 @@ class ZmqDriverClient(DriverClient):
     
     def cmd_dvr(self, cmd, *args, **kwargs):
         """
-        Command a driver by request-reply messaging. Package command
-        message and send on blocking command socket. Block on same socket
-        to receive the reply. Return the driver reply.
+        Command a driver by request-reply messaging and block until
+        the driver replies. Return the driver reply.
         @param cmd The driver command identifier.
         @param args Positional arguments of the command.
         @param kwargs Keyword arguments of the command.
         @retval Command result.
         """
+        return self.cmd_dvr_async(cmd, *args, **kwargs).get()
+
+    def cmd_dvr_async(self, cmd, *args, **kwargs):
+        """
+        Send a driver command and return a future for its reply. On a
+        pipelined client this returns as soon as the command is sent;
+        otherwise the exchange completes before returning.
+        @param cmd The driver command identifier.
+        @param args Positional arguments of the command.
+        @param kwargs Keyword arguments of the command.
+        @retval DriverCommandFuture for the command result.
+        """
         # Package command dictionary.
         msg = {'cmd':cmd,'args':args,'kwargs':kwargs}
-        
+        if self.driver_id is not None:
+            msg['driver_id'] = self.driver_id
+        future = DriverCommandFuture(self)
+
+        if not self.pipelined:
+            future.set(self._cmd_req(msg))
+            return future
+
+        request_id = str(self._request_ids.next())
+        log.debug('Sending command %s as request %s.' % (str(msg), request_id))
+        with self._cmd_lock:
+            self._pending[request_id] = future
+            self.zmq_cmd_socket.send_multipart(
+                [request_id, '', pickle.dumps(msg, pickle.HIGHEST_PROTOCOL)])
+        return future
+
+    def _await_reply(self, future, timeout=None):
+        """
+        Receive pipelined replies, resolving their futures, until future
+        is resolved or the timeout expires. The socket is only touched with
+        the command lock held, and the lock is released between poll slices
+        so other callers can send or collect their own replies.
+        @param future The DriverCommandFuture to wait for.
+        @param timeout Seconds to wait, None to wait indefinitely.
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        slice_timeout = POLL_SLICES_MS[-1] / 1000.0
+        while not future.ready():
+            if deadline is not None:
+                slice_timeout = min(slice_timeout, deadline - time.time())
+                if slice_timeout <= 0:
+                    return
+            with self._cmd_lock:
+                if future.ready():
+                    return
+                if _poll_socket(self.zmq_cmd_poller, timeout=slice_timeout):
+                    self._dispatch_replies()
+            time.sleep(0)
+
+    def _dispatch_replies(self):
+        """
+        Read all queued pipelined replies and resolve their futures. Must be
+        called with the command lock held.
+        """
+        while True:
+            try:
+                frames = self.zmq_cmd_socket.recv_multipart(flags=zmq.NOBLOCK)
+            except zmq.ZMQError:
+                return
+            request_id, reply = frames[0], pickle.loads(frames[-1])
+            log.debug('Reply to request %s: %s.' % (request_id, str(reply)))
+            future = self._pending.pop(request_id, None)
+            if future:
+                future.set(reply)
+
+    def _cmd_req(self, msg):
+        """
+        Send a command message on the REQ socket and block on the same
+        socket to receive the reply, waking as soon as it arrives.
+        @param msg The packaged command message.
+        @retval The driver reply.
+        """
         log.debug('Sending command %s.' % str(msg))
         while True:
             try:
@@ -149,20 +341,17 @@ class ZmqDriverClient(DriverClient):
             
         log.debug('Awaiting reply.')
         while True:
+            # Wait for the reply to land, then read it.
+            _poll_socket(self.zmq_cmd_poller)
             try:
-                # Attempt reply recv. Retry if necessary.
                 reply = self.zmq_cmd_socket.recv_pyobj(flags=zmq.NOBLOCK)
                 # Reply recieved, break and return.
                 break
 
             except zmq.ZMQError:
-                # Socket not ready with the reply. Sleep and retry later.
-                time.sleep(.5)
+                # Spurious wakeup, poll again.
+                continue
                 
         log.debug('Reply: %s.' % str(reply))
-        
-        if isinstance(reply, Exception):
-            raise reply
-        else:
-            return reply
+        return reply
     
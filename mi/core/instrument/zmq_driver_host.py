@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.zmq_driver_host
+@file mi/core/instrument/zmq_driver_host.py
+@brief A driver process hosting several drivers behind one ZMQ endpoint pair.
+"""
+
+__license__ = 'Apache 2.0'
+
+"""
+To launch a host for two drivers:
+import mi.core.instrument.zmq_driver_host as zdh
+p, cmd_port, evt_port = zdh.ZmqDriverHostProcess.launch_process({
+    'ctd_1': ('mi.instrument.seabird.sbe37smb.ooicore.driver', 'SBE37Driver'),
+    'ctd_2': ('mi.instrument.seabird.sbe37smb.ooicore.driver', 'SBE37Driver')})
+
+and a client for one of them:
+import mi.core.instrument.zmq_driver_client as zdc
+c = zdc.ZmqDriverClient('localhost', cmd_port, evt_port, driver_id='ctd_1')
+"""
+
+from itertools import groupby
+from operator import itemgetter
+
+from mi.core.exceptions import InstrumentCommandException
+from mi.core.driver_scheduler import SchedulerBackend
+from mi.core.driver_scheduler import set_default_backend
+import mi.core.instrument.driver_process as driver_process
+from mi.core.instrument.zmq_driver_process import ZmqDriverProcess
+from mi.core.instrument.zmq_driver_process import LAUNCH_TIMEOUT
+from mi.core.instrument.zmq_driver_process import _pickle_event
+from mi.core.instrument.zmq_topics import event_topic
+from mi.core.log import get_logger
+log = get_logger()
+
+# Number of serial workers shared by the hosted drivers. Each driver is
+# pinned to one worker, so its commands still run in order.
+HOST_SERIAL_WORKER_COUNT = 4
+
+class HostedDriver(driver_process.DriverProcess):
+    """
+    One driver loaded in a ZmqDriverHostProcess. Reuses the DriverProcess
+    import and command handling, but hands its events to the host's shared
+    queue and has no messaging of its own.
+    """
+
+    def __init__(self, host, driver_id, driver_module, driver_class):
+        """
+        @param host The ZmqDriverHostProcess.
+        @param driver_id Id commands and events for this driver carry.
+        @param driver_module The python module containing the driver code.
+        @param driver_class The python driver class.
+        """
+        driver_process.DriverProcess.__init__(self, driver_module, driver_class, host.ppid)
+        self.host = host
+        self.driver_id = driver_id
+
+    def send_event(self, evt):
+        """
+        Queue an event on the host, tagged with this driver's id.
+        """
+        self.host.send_event((self.driver_id, evt))
+
+    def get_event_stats(self):
+        """
+        Return the host event queue statistics.
+        """
+        return self.host.get_event_stats()
+
+    def stop_messaging(self):
+        """
+        Unload this driver from the host.
+        """
+        self.host.remove_driver(self.driver_id)
+
+class ZmqDriverHostProcess(ZmqDriverProcess):
+    """
+    A driver process that loads several drivers and serves them all over
+    one command ROUTER socket and one event PUB socket. Commands carry a
+    driver_id that selects the driver, and each event message starts with
+    the event_topic of the driver that raised it. ZmqDriverClient with a
+    driver_id talks to one hosted driver as if it had the process to itself.
+    """
+
+    @classmethod
+    def launch_process(cls, drivers, ppid=None, max_events=None,
+                       overflow_policy=driver_process.EventOverflowPolicy.DROP_NONE,
+                       timeout=LAUNCH_TIMEOUT):
+        """
+        Class method constructor to launch a driver host as a separate OS
+        process, returning once all drivers are constructed and the
+        sockets are bound.
+        @param drivers Dict of driver id : (driver module, driver class).
+        @param ppid ID of the parent process, used to self destruct when
+        parent dies in test cases.
+        @param max_events Depth of the shared event queue at which
+        overflow_policy applies, None for unbounded.
+        @param overflow_policy An EventOverflowPolicy value.
+        @param timeout Seconds to wait for the host process to be ready.
+        @retval Tuple containing (Popen object for the process, cmd port,
+            evt_port)
+        """
+        ctor_args = '%r, %s, %s, "%s"' % (drivers, str(ppid), str(max_events),
+                                          overflow_policy)
+        return cls._launch_and_await_ready(ctor_args, timeout)
+
+    def __init__(self, drivers, ppid, max_events=None,
+                 overflow_policy=driver_process.EventOverflowPolicy.DROP_NONE,
+                 ready_fd=None):
+        """
+        Driver host process constructor.
+        @param drivers Dict of driver id : (driver module, driver class).
+        @param ppid ID of the parent process, used to self destruct when
+        parent dies in test cases.
+        @param max_events Depth of the shared event queue at which
+        overflow_policy applies, None for unbounded.
+        @param overflow_policy An EventOverflowPolicy value.
+        @param ready_fd Inherited pipe descriptor the bound ports are
+        written to once both sockets are bound, or None.
+        """
+        ZmqDriverProcess.__init__(self, None, None, None, None, ppid,
+                                  max_events, overflow_policy, ready_fd)
+        self.drivers = {}
+        for driver_id, (driver_module, driver_class) in drivers.items():
+            self.drivers[driver_id] = HostedDriver(self, driver_id,
+                                                   driver_module, driver_class)
+        self.serial_worker_count = min(HOST_SERIAL_WORKER_COUNT, max(len(drivers), 1))
+        self.serial_slots = dict((driver_id, index % self.serial_worker_count)
+                                 for index, driver_id in enumerate(sorted(drivers)))
+
+    def construct_driver(self):
+        """
+        Import and construct every hosted driver. Driver schedulers created
+        in the host share one timer wheel thread.
+        @retval True if all drivers were constructed, False otherwise.
+        """
+        set_default_backend(SchedulerBackend.TIMER_WHEEL)
+        for hosted in self.drivers.values():
+            if not hosted.construct_driver():
+                return False
+        return True
+
+    def remove_driver(self, driver_id):
+        """
+        Unload a hosted driver, stopping messaging once none remain.
+        @param driver_id The hosted driver id.
+        """
+        hosted = self.drivers.pop(driver_id, None)
+        if hosted:
+            driver_process.DriverProcess.shutdown(hosted)
+            log.info('Driver host unloaded driver %s', driver_id)
+        if not self.drivers:
+            ZmqDriverProcess.stop_messaging(self)
+
+    def cmd_driver(self, msg):
+        """
+        Route a command message to the hosted driver named by its driver_id.
+        A stop_driver_process without a driver_id stops the whole host.
+        @param msg A driver command message.
+        @retval The driver command result.
+        """
+        driver_id = msg.get('driver_id', None)
+        hosted = self.drivers.get(driver_id, None)
+        if hosted:
+            return hosted.cmd_driver(msg)
+        elif driver_id is None and msg.get('cmd', None) == 'stop_driver_process':
+            self.stop_messaging()
+            return 'stop_driver_process'
+        elif msg.get('cmd', None) == 'get_event_stats':
+            return self.get_event_stats()
+        else:
+            return InstrumentCommandException('Unknown driver id %s.' % driver_id)
+
+    def serial_index(self, msg):
+        """
+        Run commands for one driver on that driver's serial worker.
+        """
+        return self.serial_slots.get(msg.get('driver_id', None), 0)
+
+    def is_raw_event(self, evt):
+        """
+        Test a (driver id, event) pair from the shared queue for a raw sample.
+        """
+        return driver_process.is_raw_sample_event(evt[1])
+
+    def event_messages(self, batch):
+        """
+        Pack (driver id, event) pairs into one message per run of events
+        from the same driver, led by that driver's topic frame.
+        """
+        messages = []
+        for driver_id, tagged in groupby(batch, itemgetter(0)):
+            messages.append([event_topic(driver_id)] +
+                            [_pickle_event(evt) for _, evt in tagged])
+        return messages
+
+    def stop_messaging(self):
+        """
+        Close messaging resources and unload all hosted drivers.
+        """
+        for driver_id in self.drivers.keys():
+            self.remove_driver(driver_id)
+        ZmqDriverProcess.stop_messaging(self)
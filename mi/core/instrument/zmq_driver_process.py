@@ -18,22 +18,76 @@ p = zdp.ZmqDriverProcess.launch_process(5556, 5557, 'ion.services.mi.drivers.sbe
 """
 
 from threading import Thread
+from threading import Lock
 from subprocess import Popen
+import Queue
 import os
+import select
 import time
 import logging
 import sys
 import uuid
+import cPickle as pickle
 
 import zmq
 
 from ooi.exception import ApplicationException
 from mi.core.exceptions import InstrumentException, UnexpectedError
+from mi.core.exceptions import InstrumentTimeoutException
+from mi.core.exceptions import InstrumentCommandException
 
 import mi.core.instrument.driver_process as driver_process
 from mi.core.log import get_logger
 log = get_logger()
 
+# Default maximum number of events packed into one multipart message.
+EVENT_BATCH_SIZE = 100
+
+# Default seconds the event thread lingers to fill a partial batch.
+EVENT_BATCH_LINGER = 0.005
+
+# Number of worker threads serving concurrent-safe commands.
+CMD_WORKER_COUNT = 2
+
+# Milliseconds the command thread waits on its sockets before rechecking
+# the stop flag.
+CMD_POLL_TIMEOUT = 100
+
+# Seconds launch_process waits for the driver process to report ready.
+LAUNCH_TIMEOUT = 60
+
+def _await_ready(ready_fd, timeout):
+    """
+    Read the ready line a launched driver process writes to its pipe.
+    @param ready_fd Read end of the ready pipe.
+    @param timeout Seconds to wait.
+    @retval Tuple of (cmd port, evt port).
+    @raises InstrumentException if the pipe closes before the ready line.
+    @raises InstrumentTimeoutException if the ready line does not arrive in time.
+    """
+    data = ''
+    deadline = time.time() + timeout
+    while not data.endswith('\n'):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise InstrumentTimeoutException('Driver process not ready after %s seconds' % timeout)
+        readable, _, _ = select.select([ready_fd], [], [], remaining)
+        if readable:
+            chunk = os.read(ready_fd, 64)
+            if not chunk:
+                raise InstrumentException('Driver process exited before ready')
+            data += chunk
+    cmd_port, evt_port = data.split()
+    return (int(cmd_port), int(evt_port))
+
+def _pickle_event(evt):
+    """
+    Pickle an event for sending, encoding exceptions as triples.
+    """
+    if isinstance(evt, Exception):
+        evt = _encode_exception(evt)
+    return pickle.dumps(evt, pickle.HIGHEST_PROTOCOL)
+
 def _encode_exception(reply):
     if isinstance(reply, InstrumentException):
         # InstrumentExceptions have corresponding IonException error code built-in
@@ -43,75 +97,117 @@ def _encode_exception(reply):
         ex = UnexpectedError("%s('%s')" % (reply.__class__.__name__, reply.message))
         return ex.get_triple()
 
+def _pickle_reply(reply):
+    """
+    Pickle a command reply for sending, encoding exceptions as triples.
+    A reply that cannot be pickled is replaced by the encoded error, so the
+    requester always gets an answer.
+    """
+    if isinstance(reply, Exception):
+        reply = _encode_exception(reply)
+    try:
+        return pickle.dumps(reply, pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        log.error('Cannot pickle command reply %r: %s', reply, e)
+        return pickle.dumps(_encode_exception(e), pickle.HIGHEST_PROTOCOL)
+
 class ZmqDriverProcess(driver_process.DriverProcess):
     """
     A OS-level driver process that communicates with ZMQ sockets.
-    Command-REP and event-PUB sockets monitor and react to comms
+    Command-ROUTER and event-PUB sockets monitor and react to comms
     needs in separate threads, which can be signaled to end
     by setting boolean flags stop_cmd_thread and stop_evt_thread.
     """
     
     @classmethod
-    def launch_process(cls, driver_module, driver_class, workdir='/tmp/', ppid=None):
+    def launch_process(cls, driver_module, driver_class, workdir='/tmp/', ppid=None,
+                       max_events=None,
+                       overflow_policy=driver_process.EventOverflowPolicy.DROP_NONE,
+                       timeout=LAUNCH_TIMEOUT):
         """
         Class method constructor to launch ZmqDriverProcess as a
         separate OS process. Creates command string for this
-        class and pass to superclass static method. 
+        class and pass to superclass static method. The child reports its
+        bound ports over an inherited pipe once the driver is constructed
+        and both sockets are bound, so this returns as soon as the driver
+        is ready.
         @param driver_module The python module containing the driver code.
         @param driver_class The python driver class.
-        @param workdir The work directory when temporary port files are written.
+        @param workdir Unused, kept for compatibility with callers that
+        pass a port file directory.
         @param ppid ID of the parent process, used to self destruct when
         parent dies in test cases.
+        @param max_events Event queue depth at which overflow_policy applies,
+        None for unbounded.
+        @param overflow_policy An EventOverflowPolicy value.
+        @param timeout Seconds to wait for the driver process to be ready.
         @retval Tuple containing (Popen object for the process, cmd port,
             evt_port)
+        @raises InstrumentException if the process exits before it is ready.
+        @raises InstrumentTimeoutException if it is not ready in time.
         """
         
+        ctor_args = '"%s", "%s", None, None, %s, %s, "%s"' \
+            % (driver_module, driver_class, str(ppid), str(max_events),
+               overflow_policy)
+        return cls._launch_and_await_ready(ctor_args, timeout)
+
+    @classmethod
+    def _launch_and_await_ready(cls, ctor_args, timeout):
+        """
+        Launch a process running this class and wait for it to report its
+        ports over the ready pipe.
+        @param ctor_args Python source for the constructor arguments,
+        excluding ready_fd.
+        @param timeout Seconds to wait for the process to be ready.
+        @retval Tuple containing (Popen object for the process, cmd port,
+            evt_port)
+        """
+        ready_read_fd, ready_write_fd = os.pipe()
+
         # Construct the command string.
-        tag = str(uuid.uuid4())
-        cmd_port_fname = 'dvr_cmd_port_%s.txt' % tag
-        cmd_port_fname = workdir + cmd_port_fname
-        evt_port_fname = 'dvr_evt_port_%s.txt' % tag
-        evt_port_fname = workdir + evt_port_fname
-        cmd_str = 'from %s import %s; dp = %s("%s", "%s", "%s", "%s", %s);dp.run()' \
-            % (__name__, cls.__name__, cls.__name__, driver_module,
-               driver_class, cmd_port_fname, evt_port_fname, str(ppid))
+        cmd_str = 'from %s import %s; dp = %s(%s, ready_fd=%d);dp.run()' \
+            % (cls.__module__, cls.__name__, cls.__name__, ctor_args,
+               ready_write_fd)
                 
         # Call base class launch method.
-        dvr_proc = driver_process.DriverProcess.launch_process(cmd_str)
-        while True:
-            try:                
-                cmd_port_file = file(cmd_port_fname, 'r')
-                dvr_cmd_port = int(cmd_port_file.read().strip())
-                cmd_port_file.close()
-                os.remove(cmd_port_fname)
-                break
-            
-            except IOError:
-                time.sleep(.1)
-        while True:
-            try:                
-                evt_port_file = file(evt_port_fname, 'r')
-                dvr_evt_port = int(evt_port_file.read().strip())
-                evt_port_file.close()
-                os.remove(evt_port_fname)
-                break
-            
-            except IOError:
-                time.sleep(.1)
+        try:
+            dvr_proc = driver_process.DriverProcess.launch_process(cmd_str,
+                                                                  keep_fds=[ready_write_fd])
+        finally:
+            os.close(ready_write_fd)
+
+        try:
+            dvr_cmd_port, dvr_evt_port = _await_ready(ready_read_fd, timeout)
+        except InstrumentException:
+            if dvr_proc.poll() is None:
+                dvr_proc.kill()
+            raise
+        finally:
+            os.close(ready_read_fd)
 
         return (dvr_proc, dvr_cmd_port, dvr_evt_port)
         
-    def __init__(self, driver_module, driver_class, cmd_port_fname, evt_port_fname, ppid):
+    def __init__(self, driver_module, driver_class, cmd_port_fname, evt_port_fname, ppid,
+                 max_events=None,
+                 overflow_policy=driver_process.EventOverflowPolicy.DROP_NONE,
+                 ready_fd=None):
         """
         Zmq driver process constructor.
         @param driver_module The python module containing the driver code.
         @param driver_class The python driver class.
-        @param cmd_port_fname Filename for temp cmd port file.
-        @param evt_port_fname Filename for temp evt port file.
+        @param cmd_port_fname Filename for temp cmd port file, or None.
+        @param evt_port_fname Filename for temp evt port file, or None.
         @param ppid ID of the parent process, used to self destruct when
         parent dies in test cases.        
+        @param max_events Event queue depth at which overflow_policy applies,
+        None for unbounded.
+        @param overflow_policy An EventOverflowPolicy value.
+        @param ready_fd Inherited pipe descriptor the bound ports are
+        written to once both sockets are bound, or None.
         """
-        driver_process.DriverProcess.__init__(self, driver_module, driver_class, ppid)
+        driver_process.DriverProcess.__init__(self, driver_module, driver_class, ppid,
+                                              max_events, overflow_policy)
         self.cmd_port = None
         self.cmd_port_fname = cmd_port_fname
         self.evt_port = None
@@ -122,81 +218,154 @@ class ZmqDriverProcess(driver_process.DriverProcess):
         self.stop_evt_thread = True
         self.cmd_thread = None
         self.stop_cmd_thread = True
+        self.evt_batch_size = EVENT_BATCH_SIZE
+        self.evt_batch_linger = EVENT_BATCH_LINGER
+        self.cmd_worker_count = CMD_WORKER_COUNT
+        self.serial_worker_count = 1
+        self.ready_fd = ready_fd
+        self.ready_lock = Lock()
         
     def start_messaging(self):
         """
         Initialize and start messaging resources for the driver, blocking
         until messaging terminates. This ZMQ implementation starts and
         joins command and event threads, managing nonblocking send/recv calls
-        on REP and PUB sockets, respectively. Terminate loops and close
+        on ROUTER and PUB sockets, respectively. The ROUTER socket serves
+        both REQ clients and pipelining DEALER clients. Terminate loops and close
         sockets when stop flag is set in driver process.
         """
         def recv_cmd_msg(zmq_driver_process):
             """
-            Await commands on a ZMQ REP socket, forwaring them to the
-            driver for processing and returning the result.
+            Await commands on a ZMQ ROUTER socket, forwaring them to the
+            driver for processing and returning the result. Commands listed
+            in driver_process.CONCURRENT_COMMANDS run on a pool of worker
+            threads, all others run in arrival order on the serial worker
+            picked by serial_index, so a slow command does not hold up
+            concurrent-safe queries. Workers hand replies back over an inproc socket and
+            this thread routes them to the requester.
             """
             context = zmq.Context()
-            sock = context.socket(zmq.REP)
+            sock = context.socket(zmq.ROUTER)
             zmq_driver_process.cmd_port = sock.bind_to_random_port(zmq_driver_process.cmd_host_string)
             log.info('Driver process cmd socket bound to %i' %
                            zmq_driver_process.cmd_port)
-            file(zmq_driver_process.cmd_port_fname,'w+').write(str(zmq_driver_process.cmd_port)+'\n')
+            reply_sock = context.socket(zmq.PULL)
+            reply_endpoint = 'inproc://dvr_replies_%s' % uuid.uuid4()
+            reply_sock.bind(reply_endpoint)
 
             zmq_driver_process.stop_cmd_thread = False
+            serial_queues = [Queue.Queue() for i in
+                             range(zmq_driver_process.serial_worker_count)]
+            concurrent_queue = Queue.Queue()
+            workers = [Thread(target=cmd_worker, args=(zmq_driver_process,
+                context, reply_endpoint, serial_queue)) for serial_queue in serial_queues]
+            for i in range(zmq_driver_process.cmd_worker_count):
+                workers.append(Thread(target=cmd_worker, args=(zmq_driver_process,
+                    context, reply_endpoint, concurrent_queue)))
+            for worker in workers:
+                worker.start()
+            zmq_driver_process.port_bound()
+
+            poller = zmq.Poller()
+            poller.register(sock, zmq.POLLIN)
+            poller.register(reply_sock, zmq.POLLIN)
             while not zmq_driver_process.stop_cmd_thread:
-                try:
-                    msg = sock.recv_pyobj(flags=zmq.NOBLOCK)
-                    #log.trace('Processing message %s', msg)
-                    reply = zmq_driver_process.cmd_driver(msg)
-                    # if operation raised exception, encode as triple
-                    if isinstance(reply, Exception):
-                        reply = _encode_exception(reply)
-                    # send, send, and resend
+                ready = dict(poller.poll(CMD_POLL_TIMEOUT))
+
+                if ready.get(reply_sock) == zmq.POLLIN:
                     while True:
                         try:
-                            sock.send_pyobj(reply, flags=zmq.NOBLOCK)
+                            sock.send_multipart(reply_sock.recv_multipart(flags=zmq.NOBLOCK))
+                        except zmq.ZMQError:
                             break
+
+                if ready.get(sock) == zmq.POLLIN:
+                    while True:
+                        try:
+                            frames = sock.recv_multipart(flags=zmq.NOBLOCK)
                         except zmq.ZMQError:
-                            time.sleep(.1)
-                            if zmq_driver_process.stop_cmd_thread:
-                                break
-                except zmq.ZMQError:
-                    time.sleep(.1)
-                
+                            break
+                        try:
+                            split = frames.index('') + 1
+                        except ValueError:
+                            # Without an envelope there is no one to reply to.
+                            log.error('Dropping command message without an envelope %s', frames)
+                            continue
+                        envelope = frames[:split]
+                        try:
+                            msg = zmq_driver_process.load_cmd_msg(frames[split:])
+                            #log.trace('Processing message %s', msg)
+                            cmd = msg.get('cmd', None)
+                            if cmd == 'stop_driver_process':
+                                # Reply directly, the workers are about to go.
+                                sock.send_multipart(envelope + [zmq_driver_process.run_cmd(msg)])
+                            elif cmd in driver_process.CONCURRENT_COMMANDS:
+                                concurrent_queue.put((envelope, msg))
+                            else:
+                                index = zmq_driver_process.serial_index(msg)
+                                serial_queues[index].put((envelope, msg))
+                        except Exception as e:
+                            log.error('Malformed command message %s: %s', frames, e)
+                            sock.send_multipart(envelope + [_pickle_reply(e)])
+
+            # One None per worker tells it to exit.
+            for serial_queue in serial_queues:
+                serial_queue.put(None)
+            for i in range(zmq_driver_process.cmd_worker_count):
+                concurrent_queue.put(None)
+            for worker in workers:
+                worker.join()
+            reply_sock.close()
             sock.close()
             context.term()
             log.info('Driver process cmd socket closed.')
 
+        def cmd_worker(zmq_driver_process, context, reply_endpoint, work_queue):
+            """
+            Run queued commands against the driver and push the replies,
+            prefixed with the requester envelope, to the command thread.
+            """
+            push_sock = context.socket(zmq.PUSH)
+            push_sock.connect(reply_endpoint)
+            while True:
+                # Blocking get, a None item is queued on shutdown.
+                item = work_queue.get()
+                if item is None:
+                    break
+                envelope, msg = item
+                push_sock.send_multipart(envelope + [zmq_driver_process.run_cmd(msg)])
+            push_sock.close()
+
         def send_evt_msg(zmq_driver_process):
             """
             Await events on the driver process event queue and publish them
-            on a ZMQ PUB socket to the driver process client.
+            on a ZMQ PUB socket to the driver process client. Events are
+            sent in batches, one pickled event per frame of a multipart
+            message.
             """
             context = zmq.Context()
             sock = context.socket(zmq.PUB)
             zmq_driver_process.evt_port = sock.bind_to_random_port(zmq_driver_process.event_host_string)
             log.info('Driver process event socket bound to %i', zmq_driver_process.evt_port)
-            file(zmq_driver_process.evt_port_fname,'w+').write(str(zmq_driver_process.evt_port)+'\n')
+            zmq_driver_process.port_bound()
 
             zmq_driver_process.stop_evt_thread = False
             while not zmq_driver_process.stop_evt_thread:
-                try:
-                    evt = zmq_driver_process.events.pop(0)
-                    #log.trace('Event thread sending event %s',evt)
-                    while evt:
+                batch = zmq_driver_process.get_event_batch(
+                    zmq_driver_process.evt_batch_size,
+                    zmq_driver_process.evt_batch_linger, timeout=None)
+                if not batch:
+                    continue
+                for frames in zmq_driver_process.event_messages(batch):
+                    while frames:
                         try:
-                            if isinstance(evt, Exception):
-                                evt = _encode_exception(evt)
-                            sock.send_pyobj(evt, flags=zmq.NOBLOCK)
-                            evt = None
-                            log.trace('Event sent!')
+                            sock.send_multipart(frames, flags=zmq.NOBLOCK)
+                            frames = None
                         except zmq.ZMQError:
                             time.sleep(.1)
                             if zmq_driver_process.stop_evt_thread:
                                 break
-                except IndexError:
-                    time.sleep(.1)
+                log.trace('Sent batch of %d events', len(batch))
 
             sock.close()
             context.term()
@@ -208,6 +377,75 @@ class ZmqDriverProcess(driver_process.DriverProcess):
         self.evt_thread.start()
         self.messaging_started = True
     
+    def load_cmd_msg(self, frames):
+        """
+        Unpickle the body of a command message.
+        @param frames Frames of the message after the envelope.
+        @retval The driver command message.
+        @raises InstrumentCommandException if the body is not a single
+        pickled dict.
+        """
+        if len(frames) != 1:
+            raise InstrumentCommandException('Command message has %d body frames.' % len(frames))
+        try:
+            msg = pickle.loads(frames[0])
+        except Exception as e:
+            raise InstrumentCommandException('Cannot unpickle command message: %s' % e)
+        if not isinstance(msg, dict):
+            raise InstrumentCommandException('Command message is a %s, not a dict.' % type(msg).__name__)
+        return msg
+
+    def run_cmd(self, msg):
+        """
+        Run a command message against the driver and pickle the reply.
+        Exceptions raised while handling the message, not only by the driver
+        command itself, are encoded in the reply, so no command goes
+        unanswered.
+        @param msg A driver command message.
+        @retval The pickled reply.
+        """
+        try:
+            reply = self.cmd_driver(msg)
+        except Exception as e:
+            log.exception('Error handling command message %s', msg)
+            reply = e
+        return _pickle_reply(reply)
+
+    def serial_index(self, msg):
+        """
+        Pick the serial worker for a command that must run in order with
+        the other commands sent to the same worker.
+        @param msg A driver command message.
+        @retval Index of the serial worker, below serial_worker_count.
+        """
+        return 0
+
+    def event_messages(self, batch):
+        """
+        Pack a batch of events into multipart messages for the PUB socket.
+        @param batch List of events from the event queue.
+        @retval List of messages, each a list of frames.
+        """
+        return [[_pickle_event(evt) for evt in batch]]
+
+    def port_bound(self):
+        """
+        Called by the messaging threads once their socket is bound. Writes
+        the temp port files if configured, and once both ports are known
+        reports them to the launching process over the ready pipe.
+        """
+        with self.ready_lock:
+            if self.cmd_port is None or self.evt_port is None:
+                return
+            if self.cmd_port_fname:
+                file(self.cmd_port_fname,'w+').write(str(self.cmd_port)+'\n')
+            if self.evt_port_fname:
+                file(self.evt_port_fname,'w+').write(str(self.evt_port)+'\n')
+            if self.ready_fd is not None:
+                os.write(self.ready_fd, '%d %d\n' % (self.cmd_port, self.evt_port))
+                os.close(self.ready_fd)
+                self.ready_fd = None
+
     def stop_messaging(self):
         """
         Close messaging resource for the driver. Set flags to cause
@@ -216,6 +454,9 @@ class ZmqDriverProcess(driver_process.DriverProcess):
         self.stop_cmd_thread = True
         self.stop_evt_thread = True
         self.messaging_started = False
+        # Wake the event thread and any blocked producers.
+        with self.events_cond:
+            self.events_cond.notify_all()
     
     def shutdown(self):
         """
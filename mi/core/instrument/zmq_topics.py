@@ -0,0 +1,19 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.zmq_topics
+@file mi/core/instrument/zmq_topics.py
+@brief Event topic frames shared by the ZMQ driver host and its clients.
+"""
+
+__license__ = 'Apache 2.0'
+
+
+def event_topic(driver_id):
+    """
+    Topic frame prefixed to event messages of a hosted driver. The
+    terminator keeps one driver id from prefix-matching another.
+    @param driver_id The hosted driver id.
+    @retval The topic frame.
+    """
+    return '%s\0' % driver_id
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.pd0 PD0 ensemble decoding shared by parsers and drivers
+@file mi/core/pd0.py
+@brief Decode the sections of Teledyne RDI PD0 ensembles with numpy
+
+A PD0 ensemble is a header, a table of offsets of its data types, and the
+data types themselves: the fixed and variable leaders, the per cell
+velocity, correlation magnitude, echo intensity and percent good blocks, and
+optionally bottom track data.  The leaders and bottom track are fixed size
+records, decoded through a packed numpy structured dtype built from the
+struct format of the record.  The per cell blocks are read with a single
+numpy.frombuffer call and reshaped into one row per depth cell, instead of
+unpacking each cell in python.
+
+Values are returned as python ints and lists, ready to be put in particles.
+
+Usage:
+
+from mi.core import pd0
+offsets = pd0.data_type_offsets(ensemble)
+fixed_leader = pd0.unpack_record(pd0.FIXED_LEADER_FORMAT, ensemble, offsets[0])
+(east, north, up, error) = pd0.unpack_cells(ensemble, offsets[2] + pd0.ID_BYTES, num_cells, '<i2')
+"""
+
+__license__ = 'Apache 2.0'
+
+import numpy
+
+# ensemble header, and the number of bytes in the ID at the start of each data type
+HEADER_FORMAT = '<BBHBB'
+HEADER_BYTES = 6
+ID_BYTES = 2
+
+# IDs of the data types, as little endian words
+FIXED_LEADER_ID = 0
+VARIABLE_LEADER_ID = 128
+VELOCITY_ID = 256
+CORRELATION_ID = 512
+ECHO_INTENSITY_ID = 768
+PERCENT_GOOD_ID = 1024
+BOTTOM_TRACK_ID = 1536
+
+# little endian layouts of the fixed size data types, up to the fields that all instruments send
+FIXED_LEADER_FORMAT = '<H8B3H4BH4B2h2B2H4BHQH2BI'
+VARIABLE_LEADER_FORMAT = '<2H10B3H2hHh18BH2II'
+BOTTOM_TRACK_FORMAT = '<3H4BHL4H4h12B3H4h12BH9B'
+
+# numpy types of struct format characters, with the standard sizes struct uses with an explicit byte order
+_STRUCT_TYPES = {
+    'b': 'i1', 'B': 'u1',
+    'h': 'i2', 'H': 'u2', 'i': 'i4', 'I': 'u4', 'l': 'i4', 'L': 'u4',
+    'q': 'i8', 'Q': 'u8', 'f': 'f4', 'd': 'f8'
+}
+
+_BYTE_ORDERS = {'<': '<', '>': '>', '!': '>', '=': '=', '@': '='}
+
+# dtypes already built, struct format : dtype
+_dtypes = {}
+
+
+def struct_dtype(fmt):
+    """
+    Build the packed numpy structured dtype equivalent to a struct format
+    @param fmt struct format, such as '<H8B3H'
+    @retval numpy dtype with a field for each value, named f0, f1, ...
+    @throws ValueError if the format contains a character that is not a fixed size value
+    """
+    dtype = _dtypes.get(fmt)
+    if dtype is not None:
+        return dtype
+
+    byte_order = '='
+    codes = fmt
+    if codes and codes[0] in _BYTE_ORDERS:
+        byte_order = _BYTE_ORDERS[codes[0]]
+        codes = codes[1:]
+
+    fields = []
+    count = ''
+    for char in codes:
+        if char.isdigit():
+            count += char
+            continue
+        if char not in _STRUCT_TYPES:
+            raise ValueError("Unsupported struct format character %r" % char)
+        for i in range(int(count or 1)):
+            fields.append(('f%d' % len(fields), byte_order + _STRUCT_TYPES[char]))
+        count = ''
+
+    dtype = numpy.dtype(fields)
+    _dtypes[fmt] = dtype
+    return dtype
+
+
+def unpack_record(fmt, data, offset=0):
+    """
+    Decode a fixed size record, like struct.unpack_from
+    @param fmt struct format of the record
+    @param data buffer containing the record
+    @param offset index of the record in data
+    @retval tuple of the values in the record
+    @throws ValueError if data is too short to contain the record
+    """
+    return numpy.frombuffer(data, struct_dtype(fmt), 1, offset)[0].item()
+
+
+def data_type_offsets(data):
+    """
+    Read the table of data type offsets following the ensemble header
+    @param data buffer starting with the ensemble header
+    @retval list of the offsets of the data types, from the start of the ensemble
+    """
+    num_data_types = ord(data[HEADER_BYTES - 1])
+    return numpy.frombuffer(data, '<u2', num_data_types, HEADER_BYTES).tolist()
+
+
+def cell_array(data, offset, num_cells, dtype='<i2', num_beams=4):
+    """
+    Read a per cell block of values into an array with a row for each beam
+    @param data buffer containing the block
+    @param offset index of the first value of the first cell in data, after the data type ID
+    @param num_cells number of depth cells
+    @param dtype numpy type of each value, such as '<i2' for velocities or 'u1' for echo intensities
+    @param num_beams number of values in each cell
+    @retval numpy array of shape (num_beams, num_cells)
+    @throws ValueError if data is too short to contain the block
+    """
+    num_cells = max(num_cells, 0)
+    values = numpy.frombuffer(data, dtype, num_cells * num_beams, offset)
+    return values.reshape(num_cells, num_beams).T
+
+
+def unpack_cells(data, offset, num_cells, dtype='<i2', num_beams=4):
+    """
+    Read a per cell block of values into a list for each beam
+    @param data buffer containing the block
+    @param offset index of the first value of the first cell in data, after the data type ID
+    @param num_cells number of depth cells
+    @param dtype numpy type of each value
+    @param num_beams number of values in each cell
+    @retval list of num_beams lists of num_cells ints
+    """
+    return cell_array(data, offset, num_cells, dtype, num_beams).tolist()
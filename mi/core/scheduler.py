@@ -46,25 +46,36 @@ job = scheduler.add_polled_job(some_callback, test_name, min_interval, max_inter
 
 scheduler.run_polled_job(test_name)
 
+TimerWheelScheduler offers the same job methods but keeps its jobs on the
+process wide timer wheel in mi.core.timer_wheel, so any number of them share
+one thread that only wakes when a job is due.
+
 This module extends the Advanced Python Scheduler:
 @see http://packages.python.org/APScheduler
 """
 
+# Needed so the time import below gets the standard module, not mi.core.time.
+from __future__ import absolute_import
+
 __author__ = 'Bill French'
 __license__ = 'Apache 2.0'
 
 from datetime import timedelta
 from datetime import datetime
 from math import ceil
+from time import mktime
+from threading import Lock
 
 from apscheduler.scheduler import Scheduler
 from apscheduler.scheduler import JobStoreEvent
 from apscheduler.scheduler import EVENT_JOBSTORE_JOB_ADDED
 from apscheduler.job import Job
+from apscheduler.triggers import SimpleTrigger, IntervalTrigger, CronTrigger
 
 from apscheduler.util import convert_to_datetime, timedelta_seconds
 
 from mi.core.log import get_logger; log = get_logger()
+from mi.core.timer_wheel import TimerWheelRunner
 
 class PolledScheduler(Scheduler):
     """
@@ -423,6 +434,243 @@ class PolledIntervalTrigger(object):
         return "<%s (min_interval=%s, max_interval=%s)>" % (
             self.__class__.__name__, repr(self.min_interval), repr(self.max_interval))
 
+class TimerWheelJob(object):
+    """
+    A job scheduled on a TimerWheelScheduler.
+    :param trigger: apscheduler style trigger that determines the execution times
+    :param func: callable to call when the trigger is triggered
+    :param args: list of positional arguments to call func with
+    :param kwargs: dict of keyword arguments to call func with
+    :param name: name of the job (optional)
+    """
+    def __init__(self, trigger, func, args, kwargs, name=None):
+        self.trigger = trigger
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.name = name
+        self.runs = 0
+        self.next_run_time = None
+        self.timer = None
+
+    def compute_next_run_time(self, now):
+        self.next_run_time = self.trigger.get_next_fire_time(now)
+        return self.next_run_time
 
+    def __repr__(self):
+        return '<%s (name=%s, trigger=%s)>' % (self.__class__.__name__, self.name, repr(self.trigger))
 
+class TimerWheelScheduler(object):
+    """
+    Scheduler with the job API of PolledScheduler, backed by the shared
+    process wide timer wheel instead of a scheduler thread of its own.
+    Jobs become wheel timers at their next run time and are run on the
+    runner's thread pool when they fire.
+    """
+    interval = staticmethod(PolledScheduler.interval)
 
+    def __init__(self, runner=None):
+        """
+        @param runner TimerWheelRunner to use, defaults to the process wide one.
+        """
+        self._runner = runner
+        self._jobs = []
+        self._lock = Lock()
+        self.running = False
+
+    def start(self):
+        """
+        Start scheduling the jobs added so far.
+        """
+        if self._runner is None:
+            self._runner = TimerWheelRunner.instance()
+        with self._lock:
+            self.running = True
+            now = datetime.now()
+            for job in self._jobs:
+                job.compute_next_run_time(now)
+                self._schedule(job)
+
+    def shutdown(self, wait=True):
+        """
+        Cancel all jobs. The shared runner keeps going for other schedulers.
+        """
+        with self._lock:
+            self.running = False
+            for job in self._jobs:
+                self._cancel(job)
+            self._jobs = []
+
+    def add_date_job(self, func, date, args=None, kwargs=None, **options):
+        """
+        Schedules a job to be completed once at the given date.
+        """
+        return self._add_job(SimpleTrigger(date), func, args, kwargs, options.get('name'))
+
+    def add_interval_job(self, func, weeks=0, days=0, hours=0, minutes=0,
+                         seconds=0, start_date=None, args=None, kwargs=None,
+                         **options):
+        """
+        Schedules a job to be completed on specified intervals.
+        """
+        interval = timedelta(weeks=weeks, days=days, hours=hours,
+                             minutes=minutes, seconds=seconds)
+        trigger = IntervalTrigger(interval, start_date)
+        return self._add_job(trigger, func, args, kwargs, options.get('name'))
+
+    def add_cron_job(self, func, year=None, month=None, day=None, week=None,
+                     day_of_week=None, hour=None, minute=None, second=None,
+                     start_date=None, args=None, kwargs=None, **options):
+        """
+        Schedules a job to be completed on times that match the given
+        expressions.
+        """
+        trigger = CronTrigger(year=year, month=month, day=day, week=week,
+                              day_of_week=day_of_week, hour=hour,
+                              minute=minute, second=second,
+                              start_date=start_date)
+        return self._add_job(trigger, func, args, kwargs, options.get('name'))
+
+    def add_polled_job(self, func, name, min_interval, max_interval=None,
+                       start_date=None, args=None, kwargs=None, **options):
+        """
+        Schedules a polled interval job, see PolledScheduler.add_polled_job.
+        @raise ValueError if a polled job with this name already exists.
+        """
+        if self.get_polled_job(name):
+            raise ValueError("Not adding job since a job named '%s' already exists" % name)
+        trigger = PolledIntervalTrigger(min_interval, max_interval, start_date)
+        return self._add_job(trigger, func, args, kwargs, name)
+
+    def run_polled_job(self, name):
+        """
+        Pull the trigger on a polled job, running it if the minimum interval
+        has passed.
+        @param name: name of the job we are looking for
+        @return: True if the job is run, false otherwise
+        @raise LookupError if the job name isn't found
+        """
+        with self._lock:
+            job = self.get_polled_job(name)
+            if not job:
+                raise LookupError("no PolledIntervalJob found named '%s'" % name)
+
+            if not job.trigger.pull_trigger():
+                log.debug("Job '%s' is *NOT* ready to run" % job.name)
+                return False
+
+            log.debug("Job '%s' is ready to run" % job.name)
+            self._cancel(job)
+            self._submit(job)
+            job.compute_next_run_time(datetime.now())
+            self._schedule(job)
+            return True
+
+    def get_polled_job(self, name):
+        """
+        @param name: name of the job we are looking for
+        @return: polled job with the matching name or None if not found.
+        """
+        for job in tuple(self._jobs):
+            if isinstance(job.trigger, PolledIntervalTrigger) and job.name == name:
+                return job
+        return None
+
+    def get_jobs(self):
+        """
+        @return: list of scheduled jobs
+        """
+        return list(self._jobs)
+
+    def unschedule_job(self, job):
+        """
+        Removes a job, preventing it from being run any more.
+        """
+        with self._lock:
+            if job not in self._jobs:
+                raise KeyError('Job "%s" is not scheduled in any job store' % job)
+            self._cancel(job)
+            self._jobs.remove(job)
+
+    def unschedule_func(self, func):
+        """
+        Removes all jobs that would execute the given function.
+        """
+        with self._lock:
+            found = [job for job in self._jobs if job.func == func]
+            for job in found:
+                self._cancel(job)
+                self._jobs.remove(job)
+
+        if not found:
+            raise KeyError('The given function is not scheduled in this scheduler')
+
+    def _add_job(self, trigger, func, args, kwargs, name):
+        """
+        Create a job and schedule it if the scheduler is running.
+        @raise ValueError if the job would never run.
+        """
+        job = TimerWheelJob(trigger, func, args or [], kwargs or {}, name)
+        job.compute_next_run_time(datetime.now())
+        if job.next_run_time is None and not isinstance(trigger, PolledIntervalTrigger):
+            raise ValueError('Not adding job since it would never be run')
+        with self._lock:
+            self._jobs.append(job)
+            if self.running:
+                self._schedule(job)
+        log.info('Added job "%s" to timer wheel scheduler', job)
+        return job
+
+    def _schedule(self, job):
+        """
+        Put a job on the wheel at its next run time. Called with the lock held.
+        """
+        if job.next_run_time is None:
+            return
+        when = mktime(job.next_run_time.timetuple()) + job.next_run_time.microsecond / 1e6
+        job.timer = self._runner.schedule(when, lambda: self._fire(job))
+
+    def _cancel(self, job):
+        """
+        Take a job off the wheel. Called with the lock held.
+        """
+        if job.timer:
+            self._runner.cancel(job.timer)
+            job.timer = None
+
+    def _fire(self, job):
+        """
+        Timer callback, runs on the wheel thread: submit the job and
+        reschedule it, dropping jobs that will not run again.
+        """
+        with self._lock:
+            if job.timer is None or job not in self._jobs:
+                return
+            job.timer = None
+            now = datetime.now()
+            self._submit(job)
+            if isinstance(job.trigger, PolledIntervalTrigger):
+                job.trigger.pull_trigger()
+                job.compute_next_run_time(now)
+            else:
+                job.compute_next_run_time(now + timedelta(microseconds=1))
+            if job.next_run_time is None and not isinstance(job.trigger, PolledIntervalTrigger):
+                self._jobs.remove(job)
+            else:
+                self._schedule(job)
+
+    def _submit(self, job):
+        """
+        Run a job on the runner's thread pool.
+        """
+        job.runs += 1
+        self._runner.pool.submit(self._run_job, job)
+
+    def _run_job(self, job):
+        """
+        Thread pool entry point for a job.
+        """
+        try:
+            job.func(*job.args, **job.kwargs)
+        except Exception:
+            log.exception('Job "%s" raised an exception', job)
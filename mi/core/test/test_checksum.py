@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.test.test_checksum
+@file mi/core/test/test_checksum.py
+@brief Test the shared checksums against the byte at a time implementations they replace
+"""
+
+__license__ = 'Apache 2.0'
+
+import random
+import struct
+import itertools
+
+from nose.plugins.attrib import attr
+from mock import patch
+
+from mi.core.unit_test import MiUnitTest
+from mi.core import checksum
+
+# byte at a time implementations the checksums were taken from
+
+def reference_sum16(data):
+    total = 0
+    for c in data:
+        total += ord(c)
+    return total & 0xFFFF
+
+def reference_xor8(data):
+    xor = 0
+    for c in data:
+        xor ^= ord(c)
+    return xor
+
+def reference_nortek(data, length):
+    total = 0xB58C
+    for word_index in range(0, length - 2, 2):
+        total = (total + ord(data[word_index]) + 0x100 * ord(data[word_index + 1])) % 0x10000
+    return total
+
+def reference_sio(data):
+    crc = 65535
+    for c in data:
+        crc ^= ord(c)
+        for i in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 33800
+            else:
+                crc >>= 1
+    return crc ^ 0xFFFF
+
+def reference_kermit(buf):
+    crcta = [0, 4225, 8450, 12675, 16900, 21125, 25350, 29575,
+             33800, 38025, 42250, 46475, 50700, 54925, 59150, 63375]
+    crctb = [0, 4489, 8978, 12955, 17956, 22445, 25910, 29887,
+             35912, 40385, 44890, 48851, 51820, 56293, 59774, 63735]
+    crc = 0
+    for c in buf:
+        c = crc ^ ord(c)
+        crc = (crc >> 8) ^ (crcta[(c & 240) >> 4] ^ crctb[c & 15])
+    return crc
+
+def reference_crc16(data, poly, init, xor_out, reflected):
+    """
+    Bitwise CRC-16
+    """
+    crc = init
+    for c in data:
+        byte = ord(c)
+        if reflected:
+            byte = int('{0:08b}'.format(byte)[::-1], 2)
+        crc ^= byte << 8
+        for i in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ poly) & 0xFFFF
+            else:
+                crc = (crc << 1) & 0xFFFF
+    if reflected:
+        crc = int('{0:016b}'.format(crc)[::-1], 2)
+    return crc ^ xor_out
+
+def random_buffers():
+    """
+    Random buffers of every length up to a few hundred bytes, either side of the numpy threshold
+    """
+    generator = random.Random(44)
+    for length in range(300):
+        yield ''.join(chr(generator.randint(0, 255)) for i in range(length))
+    yield '\xff' * 100000
+
+@attr('UNIT', group='mi')
+class TestChecksum(MiUnitTest):
+    """
+    Test the checksum functions
+    """
+    def check_sums(self):
+        for data in itertools.chain((chr(i) for i in range(256)), random_buffers()):
+            self.assertEqual(checksum.sum16(data), reference_sum16(data))
+            self.assertEqual(checksum.sum8(data), reference_sum16(data) & 0xFF)
+            self.assertEqual(checksum.xor8(data), reference_xor8(data))
+            self.assertEqual(checksum.nortek_checksum(data, 0, 2 * ((len(data) - 1) / 2)),
+                             reference_nortek(data, len(data)))
+            self.assertEqual(checksum.word_sum16(data, big_endian=True),
+                             sum(struct.unpack('>%dH' % (len(data) / 2), data[:len(data) & ~1])) & 0xFFFF)
+            if len(data) > 4:
+                self.assertEqual(checksum.sum16(data, 2, len(data) - 1), reference_sum16(data[2:-1]))
+                self.assertEqual(checksum.xor8(data, 3), reference_xor8(data[3:]))
+                self.assertEqual(checksum.nortek_checksum(data, 1, 3), reference_nortek(data[1:], 4))
+
+    def test_sums(self):
+        """
+        Test the sums and XOR match byte by byte sums, with and without numpy
+        """
+        self.check_sums()
+        with patch.object(checksum, 'numpy', None):
+            self.check_sums()
+
+    def test_all_words(self):
+        """
+        Test the word sum of every pair of bytes
+        """
+        for (low, high) in itertools.product(range(256), repeat=2):
+            data = chr(low) + chr(high) + '\x00\x00'
+            self.assertEqual(checksum.nortek_checksum(data), (0xB58C + low + (high << 8)) & 0xFFFF)
+
+    def test_check_values(self):
+        """
+        Test each CRC variant against its published check value
+        """
+        for (crc, check) in [(checksum.CRC16_X25, 0x906E), (checksum.CRC16_KERMIT, 0x2189),
+                             (checksum.CRC16_XMODEM, 0x31C3), (checksum.CRC16_CCITT_FALSE, 0x29B1),
+                             (checksum.CRC16_ARC, 0xBB3D), (checksum.CRC16_MODBUS, 0x4B37)]:
+            self.assertEqual(crc.calculate('123456789'), check)
+            self.assertEqual(crc.calculate('xx123456789x', 2, 11), check)
+
+    def test_crc(self):
+        """
+        Test the CRCs match the bitwise and nibble table implementations for every byte and pair of bytes,
+        and random buffers
+        """
+        buffers = itertools.chain((chr(i) for i in range(256)),
+                                  (chr(i) + chr(j) for (i, j) in itertools.product(range(256), range(0, 256, 3))),
+                                  itertools.islice(random_buffers(), 300))
+        for data in buffers:
+            self.assertEqual(checksum.CRC16_X25.calculate(data), reference_sio(data))
+            self.assertEqual(checksum.CRC16_KERMIT.calculate(data), reference_kermit(data))
+
+        for data in itertools.islice(random_buffers(), 100):
+            for crc in [checksum.CRC16_X25, checksum.CRC16_XMODEM, checksum.CRC16_CCITT_FALSE,
+                        checksum.CRC16_ARC, checksum.CRC16_MODBUS]:
+                self.assertEqual(crc.calculate(data),
+                                 reference_crc16(data, crc.poly, crc.init, crc.xor_out, crc.reflected))
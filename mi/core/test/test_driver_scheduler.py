@@ -22,6 +22,7 @@ from mi.core.unit_test import MiUnitTest
 from mi.core.driver_scheduler import DriverScheduler
 from mi.core.driver_scheduler import DriverSchedulerConfigKey
 from mi.core.driver_scheduler import TriggerType
+from mi.core.driver_scheduler import SchedulerBackend
 from mi.core.exceptions import SchedulerException
 
 @attr('UNIT', group='mi')
@@ -423,3 +424,15 @@ class TestDriverScheduler(MiUnitTest):
 
 
 
+
+@attr('UNIT', group='mi')
+class TestDriverSchedulerTimerWheel(TestDriverScheduler):
+    """
+    Run the driver scheduler tests against the shared timer wheel backend
+    """
+    def setUp(self):
+        """
+        Setup the test case
+        """
+        self._scheduler = DriverScheduler(backend=SchedulerBackend.TIMER_WHEEL)
+        self._triggered = []
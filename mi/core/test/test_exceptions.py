@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.test.test_exceptions
+@file mi/core/test/test_exceptions.py
+@brief Test that instrument exceptions survive pickling, as they do when returned from a parse worker
+"""
+
+__license__ = 'Apache 2.0'
+
+import pickle
+import cPickle
+
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTest
+from mi.core.exceptions import InstrumentException, RecoverableSampleException, \
+    InstrumentTimeoutException, InstrumentParameterExpirationException
+
+
+@attr('UNIT', group='mi')
+class TestExceptionPickle(MiUnitTest):
+
+    def test_round_trip(self):
+        """
+        Test the message and error code are not swapped, including for subclasses
+        with their own constructors
+        """
+        exceptions = [InstrumentException('bad', error_code=123),
+                      RecoverableSampleException('bad line'),
+                      InstrumentTimeoutException('timed out'),
+                      InstrumentParameterExpirationException('expired', value=4)]
+        for module in (pickle, cPickle):
+            for protocol in (0, 2):
+                for exception in exceptions:
+                    copy = module.loads(module.dumps(exception, protocol))
+                    self.assertEqual(type(copy), type(exception))
+                    self.assertEqual(copy.args, exception.args)
+                    self.assertEqual(copy.msg, exception.msg)
+                    self.assertEqual(copy.error_code, exception.error_code)
+                    self.assertEqual(str(copy), str(exception))
+        self.assertEqual(copy.expired_value, 4)
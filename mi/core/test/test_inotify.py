@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.test.test_inotify
+@file mi/core/test/test_inotify.py
+@brief Test the inotify wake and close calls from several threads
+"""
+
+__license__ = 'Apache 2.0'
+
+import threading
+
+from nose.plugins.attrib import attr
+from nose.plugins.skip import SkipTest
+
+from mi.core import inotify
+from mi.core.unit_test import MiUnitTest
+
+
+@attr('UNIT', group='mi')
+class TestInotify(MiUnitTest):
+
+    def setUp(self):
+        if not inotify.available():
+            raise SkipTest("inotify is not available")
+
+    def test_wake(self):
+        """
+        Test a wake returns a blocked read_events with no events
+        """
+        watcher = inotify.Inotify()
+        timer = threading.Timer(0.1, watcher.wake)
+        timer.start()
+        self.assertEqual(watcher.read_events(timeout=10), [])
+        timer.join()
+        watcher.close()
+
+    def test_wake_close(self):
+        """
+        Test wake never writes to a pipe that close has released and
+        another file has reused
+        """
+        errors = []
+
+        def wake(watcher):
+            try:
+                for i in xrange(100):
+                    watcher.wake()
+            except OSError as e:
+                errors.append(e)
+
+        for i in xrange(50):
+            watcher = inotify.Inotify()
+            thread = threading.Thread(target=wake, args=(watcher,))
+            thread.start()
+            watcher.close()
+            thread.join()
+            watcher.wake()
+
+        self.assertEqual(errors, [])
+        self.assertIsNone(watcher.fd)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.test.test_pd0
+@file mi/core/test/test_pd0.py
+@brief Test the PD0 decoding against unpacking with struct
+"""
+
+__license__ = 'Apache 2.0'
+
+import random
+import struct
+
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTest
+from mi.core import pd0
+
+
+def random_buffer(length, seed=49):
+    generator = random.Random(seed)
+    return ''.join(chr(generator.randint(0, 255)) for i in range(length))
+
+
+@attr('UNIT', group='mi')
+class TestPd0(MiUnitTest):
+    """
+    Test the PD0 decoding functions
+    """
+    def test_unpack_record(self):
+        """
+        Test records are decoded the same as by struct, for little and big endian layouts
+        """
+        data = random_buffer(200)
+        for fmt in [pd0.FIXED_LEADER_FORMAT, pd0.VARIABLE_LEADER_FORMAT, pd0.BOTTOM_TRACK_FORMAT,
+                    '!HBBHbBBBHHHBBBBHBBBBhhBBHHBBBBHQHBBIB', '>4h2q', '<iIlLf']:
+            self.assertEqual(pd0.struct_dtype(fmt).itemsize, struct.calcsize(fmt))
+            for offset in [0, 1, 7, 200 - struct.calcsize(fmt)]:
+                self.assertEqual(pd0.unpack_record(fmt, data, offset), struct.unpack_from(fmt, data, offset))
+
+        self.assertRaises(ValueError, pd0.unpack_record, pd0.FIXED_LEADER_FORMAT, data[:50])
+        self.assertRaises(ValueError, pd0.struct_dtype, '<H5s')
+
+    def test_unpack_cells(self):
+        """
+        Test per cell blocks are decoded the same as unpacking each cell
+        """
+        data = random_buffer(2 + 8 * 100)
+        for (dtype, fmt, size) in [('<i2', '<4h', 8), ('u1', '<4B', 4), ('>u2', '>4H', 8)]:
+            expected = [[], [], [], []]
+            for cell in range(100):
+                for (beam, value) in enumerate(struct.unpack_from(fmt, data, pd0.ID_BYTES + cell * size)):
+                    expected[beam].append(value)
+            self.assertEqual(pd0.unpack_cells(data, pd0.ID_BYTES, 100, dtype), expected)
+            self.assertEqual(pd0.cell_array(data, pd0.ID_BYTES, 100, dtype).shape, (4, 100))
+
+        self.assertEqual(pd0.unpack_cells(data, pd0.ID_BYTES, 0), [[], [], [], []])
+        self.assertEqual(pd0.unpack_cells(data, pd0.ID_BYTES, -1, 'u1'), [[], [], [], []])
+        self.assertRaises(ValueError, pd0.unpack_cells, data, pd0.ID_BYTES, 101)
+
+    def test_data_type_offsets(self):
+        """
+        Test the offsets of the data types are read from the header
+        """
+        offsets = [18, 77, 142, 560, 770, 980]
+        header = struct.pack('<BBHBB6H', 0x7f, 0x7f, 1000, 0, len(offsets), *offsets)
+        self.assertEqual(pd0.data_type_offsets(header), offsets)
+        self.assertEqual(pd0.data_type_offsets(header[:5] + '\x00'), [])
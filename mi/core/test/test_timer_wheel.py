@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.test.test_timer_wheel Timer wheel tests
+@file mi/core/test/test_timer_wheel.py
+@brief Unit tests for the hierarchical timer wheel
+"""
+
+__license__ = 'Apache 2.0'
+
+import random
+
+from mi.core.log import get_logger ; log = get_logger()
+
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTest
+from mi.core.timer_wheel import TimerWheel
+from mi.core.timer_wheel import SLOTS
+
+@attr('UNIT', group='mi')
+class TestTimerWheel(MiUnitTest):
+    """
+    Test the timer wheel with a manual clock
+    """
+    def setUp(self):
+        self.wheel = TimerWheel(origin=0, tick_length=1)
+
+    def test_fire_in_order(self):
+        """
+        Timers on every level fire on their tick and not before.
+        """
+        due = [3, SLOTS + 5, SLOTS * SLOTS + 7, 2 * SLOTS * SLOTS * SLOTS + 1]
+        for when in due:
+            self.wheel.insert(when, when)
+
+        for when in due:
+            self.assertEqual(self.wheel.advance(when - 1), [])
+            self.assertEqual(self.wheel.advance(when), [when])
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_random(self):
+        """
+        Random timers fire exactly on their tick with large clock jumps.
+        """
+        rnd = random.Random(42)
+        due = [rnd.randint(1, SLOTS ** 3) for i in range(500)]
+        for when in due:
+            self.wheel.insert(when, when)
+
+        fired = []
+        now = 0
+        while len(self.wheel):
+            next_time = self.wheel.next_due_time()
+            self.assertGreater(next_time, now)
+            now = next_time
+            for callback in self.wheel.advance(now):
+                self.assertEqual(callback, now)
+                fired.append(callback)
+        self.assertEqual(sorted(fired), sorted(due))
+
+    def test_cancel(self):
+        keep = self.wheel.insert(10, 'keep')
+        drop = self.wheel.insert(10, 'drop')
+        far = self.wheel.insert(SLOTS * 10, 'far')
+        self.wheel.cancel(drop)
+        self.wheel.cancel(far)
+        self.assertFalse(drop.active())
+        self.assertTrue(keep.active())
+        self.assertEqual(self.wheel.advance(SLOTS * 20), ['keep'])
+        self.assertEqual(self.wheel.next_due_time(), None)
+
+    def test_past_due(self):
+        """
+        Timers inserted in the past fire on the next tick.
+        """
+        self.wheel.advance(100)
+        self.wheel.insert(50, 'late')
+        self.assertEqual(self.wheel.next_due_time(), 101)
+        self.assertEqual(self.wheel.advance(101), ['late'])
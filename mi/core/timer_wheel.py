@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.timer_wheel Shared timer wheel for MI schedulers
+@file mi/core/timer_wheel.py
+@brief Hierarchical timing wheel and a process wide runner thread.
+
+TimerWheel is the data structure: timers are hashed into slots by due
+tick, with coarser levels for timers further out, so insert and cancel are
+O(1). TimerWheelRunner drives one wheel per process from a single thread
+that sleeps until the next occupied slot, so wakeups scale with due timers
+rather than with the number of jobs or schedulers.
+
+Usage:
+
+runner = TimerWheelRunner.instance()
+timer = runner.schedule(time.time() + 5, some_callback)
+...
+runner.cancel(timer)
+
+Callbacks run on the runner thread and must be short; hand real work to
+runner.pool.
+"""
+
+# Needed so the time import below gets the standard module, not mi.core.time.
+from __future__ import absolute_import
+
+__license__ = 'Apache 2.0'
+
+import os
+import math
+import time
+import select
+import threading
+
+from apscheduler.threadpool import ThreadPool
+
+from mi.core.log import get_logger; log = get_logger()
+
+# Wheel resolution in seconds.
+TICK_LENGTH = 0.01
+
+# Each level has 2**SLOT_BITS slots; level n slots span SLOTS**n ticks.
+SLOT_BITS = 8
+SLOTS = 1 << SLOT_BITS
+SLOT_MASK = SLOTS - 1
+LEVELS = 4
+
+class Timer(object):
+    """
+    A callback registered on a TimerWheel.
+    """
+    __slots__ = ('due_tick', 'callback', 'slot', 'level')
+
+    def __init__(self, due_tick, callback):
+        self.due_tick = due_tick
+        self.callback = callback
+        self.slot = None
+        self.level = None
+
+    def active(self):
+        """
+        @retval True if the timer is waiting to fire.
+        """
+        return self.slot is not None
+
+class TimerWheel(object):
+    """
+    Hierarchical timing wheel. Not thread safe, and has no clock of its
+    own: time only moves when advance is called.
+    """
+
+    def __init__(self, origin=None, tick_length=TICK_LENGTH):
+        """
+        @param origin Time of tick 0, defaults to now.
+        @param tick_length Seconds per tick.
+        """
+        if origin is None:
+            origin = time.time()
+        self.origin = origin
+        self.tick_length = tick_length
+        self.current = 0
+        self.levels = [[set() for i in range(SLOTS)] for level in range(LEVELS)]
+        self.level_counts = [0] * LEVELS
+
+    def __len__(self):
+        return sum(self.level_counts)
+
+    def tick_at(self, when):
+        """
+        @retval The last tick at or before time when.
+        """
+        return int(math.floor((when - self.origin) / self.tick_length))
+
+    def time_of(self, tick):
+        """
+        @retval The time tick starts.
+        """
+        return self.origin + tick * self.tick_length
+
+    def insert(self, when, callback):
+        """
+        Add a timer. Timers due now or in the past fire on the next tick.
+        @param when Time the callback is due.
+        @param callback Callable returned by advance once due.
+        @retval The Timer, for cancel.
+        """
+        due_tick = int(math.ceil((when - self.origin) / self.tick_length))
+        timer = Timer(max(due_tick, self.current + 1), callback)
+        self._place(timer)
+        return timer
+
+    def cancel(self, timer):
+        """
+        Remove a timer if it has not fired yet.
+        @param timer A Timer returned by insert.
+        """
+        if timer.slot is not None:
+            timer.slot.discard(timer)
+            self.level_counts[timer.level] -= 1
+            timer.slot = None
+            timer.level = None
+
+    def advance(self, now):
+        """
+        Move the wheel up to time now and collect the timers that came due.
+        @param now The current time.
+        @retval List of due callbacks, in tick order.
+        """
+        target = self.tick_at(now)
+        due = []
+        while self.current < target:
+            if not any(self.level_counts):
+                self.current = target
+                break
+            if not self.level_counts[0]:
+                # Nothing on level 0, skip straight to the next cascade.
+                next_wrap = (self.current | SLOT_MASK) + 1
+                if next_wrap > target:
+                    self.current = target
+                    break
+                self.current = next_wrap - 1
+
+            self.current += 1
+            if not self.current & SLOT_MASK:
+                self._cascade(1)
+            slot = self.levels[0][self.current & SLOT_MASK]
+            if slot:
+                for timer in slot:
+                    timer.slot = None
+                    timer.level = None
+                    due.append(timer.callback)
+                self.level_counts[0] -= len(slot)
+                slot.clear()
+        return due
+
+    def next_due_time(self):
+        """
+        Time of the next tick that has work to do: an occupied level 0 slot
+        or the cascade of an occupied higher level slot.
+        @retval The time, or None if the wheel is empty.
+        """
+        candidates = []
+        if self.level_counts[0]:
+            slots = self.levels[0]
+            for offset in range(1, SLOTS + 1):
+                tick = self.current + offset
+                if slots[tick & SLOT_MASK]:
+                    candidates.append(tick)
+                    break
+        for level in range(1, LEVELS):
+            if not self.level_counts[level]:
+                continue
+            shift = SLOT_BITS * level
+            slots = self.levels[level]
+            base = (self.current >> shift) + 1
+            for offset in range(SLOTS):
+                if slots[(base + offset) & SLOT_MASK]:
+                    candidates.append((base + offset) << shift)
+                    break
+        if not candidates:
+            return None
+        return self.time_of(min(candidates))
+
+    def _place(self, timer):
+        """
+        Put a timer in the finest level whose slot index for the due tick
+        is less than a full revolution ahead of the current tick.
+        """
+        for level in range(LEVELS):
+            shift = SLOT_BITS * level
+            if (timer.due_tick >> shift) - (self.current >> shift) < SLOTS:
+                break
+        else:
+            # Further out than the wheel spans, park it in the furthest
+            # top level slot and let cascading bring it back.
+            shift = SLOT_BITS * level
+            timer_index = (self.current >> shift) + SLOT_MASK
+            timer.slot = self.levels[level][timer_index & SLOT_MASK]
+            timer.level = level
+            timer.slot.add(timer)
+            self.level_counts[level] += 1
+            return
+        timer.slot = self.levels[level][(timer.due_tick >> shift) & SLOT_MASK]
+        timer.level = level
+        timer.slot.add(timer)
+        self.level_counts[level] += 1
+
+    def _cascade(self, level):
+        """
+        Redistribute the level slot reached at the current tick into the
+        finer levels, cascading the next level too when this one wraps.
+        """
+        if level >= LEVELS:
+            return
+        index = (self.current >> (SLOT_BITS * level)) & SLOT_MASK
+        if not index:
+            self._cascade(level + 1)
+        slot = self.levels[level][index]
+        if not slot:
+            return
+        timers = list(slot)
+        slot.clear()
+        self.level_counts[level] -= len(timers)
+        for timer in timers:
+            self._place(timer)
+
+class TimerWheelRunner(object):
+    """
+    Drives a TimerWheel from one daemon thread that sleeps until the next
+    occupied slot. Use instance() to share one runner per process.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        """
+        @retval The process wide runner, started on first use.
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                cls._instance.start()
+            return cls._instance
+
+    def __init__(self, tick_length=TICK_LENGTH):
+        """
+        @param tick_length Wheel resolution in seconds.
+        """
+        self.wheel = TimerWheel(tick_length=tick_length)
+        self.pool = ThreadPool()
+        self._lock = threading.Lock()
+        self._wake_time = None
+        self._wake_read_fd, self._wake_write_fd = os.pipe()
+        self._thread = None
+
+    def start(self):
+        """
+        Start the runner thread.
+        """
+        self._thread = threading.Thread(target=self._run, name='TimerWheelRunner')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def schedule(self, when, callback):
+        """
+        Call callback on the runner thread at time when.
+        @retval The Timer, for cancel.
+        """
+        with self._lock:
+            timer = self.wheel.insert(when, callback)
+            wake = self._wake_time is None or when < self._wake_time
+            if wake:
+                self._wake_time = when
+        if wake:
+            os.write(self._wake_write_fd, 'x')
+        return timer
+
+    def cancel(self, timer):
+        """
+        Cancel a timer from schedule. Cancelling does not wake the thread;
+        it just finds nothing to do if it wakes for this timer.
+        """
+        with self._lock:
+            self.wheel.cancel(timer)
+
+    def _run(self):
+        """
+        Runner thread loop.
+        """
+        while True:
+            with self._lock:
+                due = self.wheel.advance(time.time())
+                self._wake_time = self.wheel.next_due_time()
+                wake_time = self._wake_time
+
+            for callback in due:
+                try:
+                    callback()
+                except Exception:
+                    log.exception('Timer callback %s failed', callback)
+
+            timeout = None
+            if wake_time is not None:
+                timeout = max(wake_time - time.time(), 0)
+            readable, _, _ = select.select([self._wake_read_fd], [], [], timeout)
+            if readable:
+                os.read(self._wake_read_fd, 4096)
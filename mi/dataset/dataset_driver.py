@@ -11,11 +11,13 @@ __author__ = 'Steve Foley'
 __license__ = 'Apache 2.0'
 
 import os
+import time
 import gevent
 import shutil
-import hashlib
 import copy
 import traceback
+import multiprocessing
+from itertools import islice
 
 from mi.core.log import get_logger ; log = get_logger()
 from mi.core.exceptions import InstrumentParameterException
@@ -35,12 +37,15 @@ from mi.core.instrument.driver_dict import DriverDict
 from mi.core.instrument.protocol_param_dict import ParameterDictType
 from mi.core.instrument.protocol_param_dict import Parameter
 from mi.core.common import BaseEnum
+from mi.dataset.file_identity import get_file_identity
 
 class DataSourceConfigKey(BaseEnum):
     HARVESTER = 'harvester'
     PARSER = 'parser'
     DRIVER = 'driver'
     RESOURCE_ID = 'resource_id'
+    STATE_STORE = 'state_store'
+    STATE_STORE_ONLY = 'state_store_only'
 
 class DriverStateKey(BaseEnum):
     VERSION = 'version'
@@ -51,6 +56,7 @@ class DriverStateKey(BaseEnum):
     INGESTED = 'ingested'
     PARSER_STATE = 'parser_state'
     MODIFIED_STATE = 'modified_state'
+    TAIL_OFFSET = 'tail_offset'
 
 # Driver parameters.
 class DriverParameter(BaseEnum):
@@ -58,6 +64,10 @@ class DriverParameter(BaseEnum):
     RECORDS_PER_SECOND = 'records_per_second'
     PUBLISHER_POLLING_INTERVAL = 'publisher_polling_interval'
     BATCHED_PARTICLE_COUNT = 'batched_particle_count'
+    RECOVERED_BATCH_COUNT = 'recovered_batch_count'
+    CHECKPOINT_RECORD_COUNT = 'checkpoint_record_count'
+    CHECKPOINT_INTERVAL = 'checkpoint_interval'
+    PARSE_WORKERS = 'parse_workers'
 
 class HarvesterType(BaseEnum):
     SINGLE_DIRECTORY = 'single_directory'
@@ -100,6 +110,108 @@ class DataSourceLocation(object):
             self.parser_position = parser_position
             return
 
+# key of the byte position after the last published record in the state of append safe parsers
+PARSER_POSITION = 'position'
+
+# seconds between checks for parse pool results, so other greenlets run while waiting
+PARSE_POOL_WAIT = 0.05
+
+# drivers using a parse pool, id : driver.  Pool workers are forked from the driver process, so they find
+# their driver here and build parsers with it.
+_parse_pool_drivers = {}
+
+def _parse_file_in_worker(driver_id, directory, file_name, file_state, data_key):
+    """
+    Parse a whole file in a parse pool worker process.  The parser is built the same way as in the
+    driver process, so the other errors it raises are left to reach the driver through the pool.
+    @param driver_id id of the driver in _parse_pool_drivers
+    @param directory directory of the file to parse
+    @param file_name name of the file to parse
+    @param file_state driver state of the file
+    @param data_key data key of the harvester and parser, None for single harvester drivers
+    @retval tuple of the particles, the last parser state, the new tail offset or None, True if the parser
+    reported the file ingested, the exceptions the parser sent to the driver's exception callback, in
+    order, and the SampleException that stopped the parser or None
+    """
+    driver = _parse_pool_drivers[driver_id]
+    particles = []
+    states = []
+    exceptions = []
+    # this is the worker's copy of the driver, send what the parser publishes back to the driver process
+    driver._data_callback = particles.extend
+    driver._save_parser_state = lambda state, *args, **kwargs: states.append(
+        (driver._tail_parser_state(state, data_key), kwargs.get('file_ingested', args[-1] if args else False)))
+    driver._sample_exception_callback = exceptions.append
+    driver._tail_offsets = {}
+    if data_key is None:
+        driver._file_in_process = file_name
+    else:
+        driver._file_in_process[data_key] = file_name
+
+    parser_state = file_state[DriverStateKey.PARSER_STATE]
+    error = None
+    with open(os.path.join(directory, file_name)) as handle:
+        try:
+            parser = driver._build_file_parser(file_state, parser_state, handle, data_key)
+            while parser.get_records(driver._recovered_batch_count):
+                pass
+        except SampleException as e:
+            error = e
+
+    ((state, tail_offset), ingested) = states[-1] if states else ((parser_state, None), False)
+    return (particles, state, tail_offset, bool(ingested), exceptions, error)
+
+def apply_state_delta(state, delta):
+    """
+    Merge a state delta sent to a driver's state delta callback into the full driver state
+    @param state full driver state to update in place
+    @param delta list of (key path, value) pairs from the driver
+    @retval the updated state
+    """
+    for (path, value) in delta:
+        node = state
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    return state
+
+class TailFile(object):
+    """
+    Read only view of an open file that starts at a byte offset, so the data
+    appended to a file since it was last parsed looks like a file of its own
+    """
+    def __init__(self, stream_handle, offset):
+        """
+        @param stream_handle open file
+        @param offset byte offset in stream_handle of position 0 in this view
+        """
+        self._stream_handle = stream_handle
+        self.offset = offset
+        stream_handle.seek(offset)
+
+    def read(self, size=-1):
+        return self._stream_handle.read(size)
+
+    def readline(self, size=-1):
+        return self._stream_handle.readline(size)
+
+    def __iter__(self):
+        return iter(self.readline, '')
+
+    def tell(self):
+        return self._stream_handle.tell() - self.offset
+
+    def seek(self, position, whence=0):
+        if whence == 0:
+            position += self.offset
+        self._stream_handle.seek(position, whence)
+        if self._stream_handle.tell() < self.offset:
+            self._stream_handle.seek(self.offset)
+            raise IOError("Seek before the start of the tail at %d" % self.offset)
+
+    def close(self):
+        self._stream_handle.close()
+
 class DataSetDriverConfigKeys(BaseEnum):
     PARTICLE_MODULE = "particle_module"
     PARTICLE_CLASS = "particle_class"
@@ -109,6 +221,10 @@ class DataSetDriverConfigKeys(BaseEnum):
     PATTERN = "pattern"
     FREQUENCY = "frequency"
     FILE_MOD_WAIT_TIME = "file_mod_wait_time"
+    USE_INOTIFY = "use_inotify"
+    TAIL_MODE = "tail_mode"
+    RECOVERED = "recovered"
+    USE_MMAP = "use_mmap"
     HARVESTER = "harvester"
     PARSER = "parser"
     MODULE = "module"
@@ -139,12 +255,18 @@ class DataSetDriver(object):
             'pattern': '*.txt',
             'frequency': 1,
             'file_mod_wait_time': 30,
+            'recovered': False,
         },
         'parser': {}
+        'state_store': '/tmp/dsatest_state.db',
         'driver': {
             'records_per_second'
             'harvester_polling_interval'
             'batched_particle_count'
+            'recovered_batch_count'
+            'checkpoint_record_count'
+            'checkpoint_interval'
+            'parse_workers'
         }
     }
     """
@@ -163,6 +285,10 @@ class DataSetDriver(object):
         self._polling_interval = None
         self._generate_particle_count = None
         self._particle_count_per_second = None
+        self._recovered_batch_count = None
+        self._checkpoint_record_count = None
+        self._checkpoint_interval = None
+        self._parse_workers = None
         self._resource_id = None
 
         self._param_dict = ProtocolParameterDict()
@@ -278,9 +404,11 @@ class DataSetDriver(object):
 
         log.trace("set_resource: iterate through params: %s", params)
         for (key, val) in params.iteritems():
-            if key in [DriverParameter.BATCHED_PARTICLE_COUNT, DriverParameter.RECORDS_PER_SECOND]:
+            if key in [DriverParameter.BATCHED_PARTICLE_COUNT, DriverParameter.RECORDS_PER_SECOND,
+                       DriverParameter.RECOVERED_BATCH_COUNT, DriverParameter.CHECKPOINT_RECORD_COUNT,
+                       DriverParameter.PARSE_WORKERS]:
                 if not isinstance(val, int): raise InstrumentParameterException("%s must be an integer" % key)
-            if key in [DriverParameter.PUBLISHER_POLLING_INTERVAL]:
+            if key in [DriverParameter.PUBLISHER_POLLING_INTERVAL, DriverParameter.CHECKPOINT_INTERVAL]:
                 if not isinstance(val, (int, float)): raise InstrumentParameterException("%s must be an float" % key)
 
             if val <= 0:
@@ -292,8 +420,13 @@ class DataSetDriver(object):
         self._generate_particle_count = self._param_dict.get(DriverParameter.BATCHED_PARTICLE_COUNT)
         self._particle_count_per_second = self._param_dict.get(DriverParameter.RECORDS_PER_SECOND)
         self._polling_interval = self._param_dict.get(DriverParameter.PUBLISHER_POLLING_INTERVAL)
-        log.trace("Driver Parameters: %s, %s, %s", self._polling_interval, self._particle_count_per_second,
-                  self._generate_particle_count)
+        self._recovered_batch_count = self._param_dict.get(DriverParameter.RECOVERED_BATCH_COUNT)
+        self._checkpoint_record_count = self._param_dict.get(DriverParameter.CHECKPOINT_RECORD_COUNT)
+        self._checkpoint_interval = self._param_dict.get(DriverParameter.CHECKPOINT_INTERVAL)
+        self._parse_workers = self._param_dict.get(DriverParameter.PARSE_WORKERS)
+        log.trace("Driver Parameters: %s, %s, %s, %s, %s, %s, %s", self._polling_interval,
+                  self._particle_count_per_second, self._generate_particle_count, self._recovered_batch_count,
+                  self._checkpoint_record_count, self._checkpoint_interval, self._parse_workers)
 
 
     def get_resource(self, *args, **kwargs):
@@ -368,7 +501,7 @@ class DataSetDriver(object):
 
     def _build_param_dict(self):
         """
-        Setup three common driver parameters
+        Setup the common driver parameters
         """
         self._param_dict.add_parameter(
             Parameter(
@@ -403,6 +536,50 @@ class DataSetDriver(object):
                 description="Number of particles to batch before sending to the agent")
         )
 
+        self._param_dict.add_parameter(
+            Parameter(
+                DriverParameter.RECOVERED_BATCH_COUNT,
+                int,
+                value=1000,
+                type=ParameterDictType.INT,
+                visibility=ParameterDictVisibility.IMMUTABLE,
+                display_name="Recovered Batch Count",
+                description="Number of recovered particles to send to the agent at a time, without pacing")
+        )
+
+        self._param_dict.add_parameter(
+            Parameter(
+                DriverParameter.CHECKPOINT_RECORD_COUNT,
+                int,
+                value=1,
+                type=ParameterDictType.INT,
+                visibility=ParameterDictVisibility.IMMUTABLE,
+                display_name="Checkpoint Record Count",
+                description="Number of parsed particles to hold before sending them to the agent with the driver state")
+        )
+
+        self._param_dict.add_parameter(
+            Parameter(
+                DriverParameter.CHECKPOINT_INTERVAL,
+                float,
+                value=1,
+                type=ParameterDictType.FLOAT,
+                visibility=ParameterDictVisibility.IMMUTABLE,
+                display_name="Checkpoint Interval",
+                description="Maximum seconds to hold parsed particles before sending them to the agent with the driver state")
+        )
+
+        self._param_dict.add_parameter(
+            Parameter(
+                DriverParameter.PARSE_WORKERS,
+                int,
+                value=1,
+                type=ParameterDictType.INT,
+                visibility=ParameterDictVisibility.IMMUTABLE,
+                display_name="Parse Workers",
+                description="Number of processes parsing recovered files at once, 1 parses in the driver")
+        )
+
         config = self._config.get(DataSourceConfigKey.DRIVER, {})
         log.debug("set_resource on startup with: %s", config)
         self.set_resource(config)
@@ -452,16 +629,13 @@ class DataSetDriver(object):
         Raise a ResourceAgentIOEvent when a new file is detected.  Add file stats
         to the payload of the event.
         """
-        s = os.stat(name)
-        checksum = ""
-        with open(name, 'rb') as filehandle:
-            checksum = hashlib.md5(filehandle.read()).hexdigest()
+        identity = get_file_identity(name)
 
         stats = {
             'name': name,
-            'size': s.st_size,
-            'mod': s.st_mtime,
-            'md5_checksum': checksum
+            'size': identity.size,
+            'mod': identity.mod_time,
+            'md5_checksum': identity.checksum
         }
 
         self._event_callback(event_type="ResourceAgentIOEvent", source_type="new file", stats=stats)
@@ -475,12 +649,37 @@ class SimpleDataSetDriver(DataSetDriver):
     """
     def __init__(self, config, memento, data_callback, state_callback, event_callback, exception_callback):
         self._new_file_queue = []
+        # offsets in the files being parsed that parsers in tail mode were started at, data key : offset,
+        # and data keys whose parsers turned out not to be append safe, data key : False
+        self._tail_offsets = {}
+        self._tail_safe = {}
 
         super(SimpleDataSetDriver, self).__init__(config, memento, data_callback, state_callback, event_callback, exception_callback)
         self._harvester = None
         self._driver_state = None
 
+        # parsers publish into a buffer, which is sent to the agent together with the driver state at
+        # each checkpoint so the agent never has a state that is ahead of the data it has received
+        self._publish_data_callback = self._data_callback
+        self._data_callback = self._buffer_data
+        self._pending_data = []
+        # key paths in the driver state of the file states changed since the last checkpoint
+        self._changed_state_paths = set()
+        self._last_checkpoint = time.time()
+        self._state_delta_callback = None
+        self._parse_pool = None
+
+        self._state_store = None
+        self._state_store_only = False
+        store_path = self._config.get(DataSourceConfigKey.STATE_STORE)
+        if store_path:
+            memento = self._open_state_store(store_path, memento,
+                                             bool(self._config.get(DataSourceConfigKey.STATE_STORE_ONLY)))
+
         self._init_state(memento)
+        if self._state_store is not None and self._state_store.is_empty():
+            # seed a new store with the whole state
+            self._state_store.save_state(self._driver_state)
 
         self._ingest_directory = self._harvester_config.get(DataSetDriverConfigKeys.DIRECTORY)
 
@@ -496,6 +695,190 @@ class SimpleDataSetDriver(DataSetDriver):
         else:
             return False
 
+    def stop_sampling(self):
+        """
+        Stop the sampling thread, then checkpoint anything parsed before it stopped
+        """
+        super(SimpleDataSetDriver, self).stop_sampling()
+        self._close_parse_pool()
+        self._flush_checkpoint()
+
+    def shutdown(self):
+        super(SimpleDataSetDriver, self).shutdown()
+        if self._state_store is not None:
+            self._state_store.close()
+            self._state_store = None
+
+    def _open_state_store(self, path, memento, store_only=False):
+        """
+        Keep the driver state in a local sqlite store as well.  Each checkpoint writes only the changed file
+        states to the store, then sends the state to the state callback as usual, so the store mirrors the
+        agent's memento.  With store_only the driver state is only kept in the store: checkpoints no longer
+        call the state callback, so the agent's memento stops being updated, and the driver starts from
+        the store, only using the memento to seed a new store.
+        @param path path of the store's database file
+        @param memento agent persisted memento
+        @param store_only True to keep the driver state only in the store
+        @retval the driver state to start from
+        """
+        # the state store module uses the state keys defined here
+        from mi.dataset.state_store import SqliteStateStore
+
+        self._state_store = SqliteStateStore(path, getattr(self, '_data_keys', None))
+        self._state_store_only = store_only
+        if not store_only:
+            return memento
+
+        log.warn("driver state is only kept in state store %s, the agent's memento is not updated", path)
+        if self._state_store.is_empty():
+            log.info("starting state store %s from the memento", path)
+            return memento
+        log.debug("loading driver state from state store %s", path)
+        return self._state_store.load()
+
+    def set_state_delta_callback(self, callback):
+        """
+        Send checkpoints as a list of (key path, file state) pairs for only the file states that changed,
+        rather than sending the whole driver state to the state callback.  The receiver merges them into
+        the state it holds with apply_state_delta.
+        @param callback method to call with the state delta, None to go back to the state callback
+        """
+        self._state_delta_callback = callback
+
+    def _buffer_data(self, particles):
+        """
+        Data callback given to parsers, holds particles until the next checkpoint
+        @param particles list of particles
+        """
+        self._pending_data.extend(particles)
+
+    def _checkpoint(self, path=None, force=True):
+        """
+        Record a change to the driver state and send the held particles followed by the state to the agent,
+        unless this is a routine parser state update and checkpoint_record_count particles or
+        checkpoint_interval seconds have not yet been reached.
+        @param path key path in the driver state of the file state that changed
+        @param force send now regardless of the checkpoint interval
+        """
+        if path is not None:
+            self._changed_state_paths.add(path)
+        if not force and len(self._pending_data) < self._checkpoint_record_count and \
+           time.time() - self._last_checkpoint < self._checkpoint_interval:
+            return
+
+        self._last_checkpoint = time.time()
+        (data, self._pending_data) = (self._pending_data, [])
+        (paths, self._changed_state_paths) = (self._changed_state_paths, set())
+        if data:
+            self._publish_data_callback(data)
+
+        delta = []
+        if self._state_store is not None or self._state_delta_callback is not None:
+            for path in paths:
+                node = self._driver_state
+                for key in path:
+                    node = node[key]
+                delta.append((path, copy.deepcopy(node)))
+        if self._state_store is not None and delta:
+            self._state_store.apply_delta(delta)
+
+        if self._state_delta_callback is not None:
+            if delta:
+                self._state_delta_callback(delta)
+        elif not self._state_store_only:
+            self._state_callback(self._driver_state)
+
+    def _flush_checkpoint(self):
+        """
+        Checkpoint if there are held particles or state changes that have not been sent
+        """
+        if self._pending_data or self._changed_state_paths:
+            self._checkpoint()
+
+    def _use_parse_pool(self, data_key=None):
+        """
+        Check if files should be parsed in the parse pool, which is only used for recovered data
+        @param data_key data key of the harvester, None for single harvester drivers
+        """
+        return self._parse_workers > 1 and self._is_recovered(data_key)
+
+    def _close_parse_pool(self):
+        """
+        Stop the parse pool workers, any files they are parsing are parsed again next time
+        """
+        if self._parse_pool is not None:
+            self._parse_pool.terminate()
+            self._parse_pool = None
+            _parse_pool_drivers.pop(id(self), None)
+
+    def _parse_files_in_pool(self, file_names, data_key=None):
+        """
+        Parse files in parallel in a pool of worker processes, then publish each file's particles in
+        the order of file_names, with one checkpoint per file.  A file is only checkpointed with all
+        its particles, so after a restart it is parsed again from the start or not at all.  The
+        exceptions the parser reported while parsing are sent to the exception callback as each file is
+        published, in the order they were reported.
+
+        Each file stays in the new file queue until its result is in.  If its worker failed with
+        anything other than a SampleException, such as an IOError or particles that could not be
+        pickled, the file is parsed again in the driver process exactly as it would be without the pool.
+        @param file_names names of the files to parse, at the front of the new file queue in the order to
+        publish them
+        @param data_key data key of the harvester and parser, None for single harvester drivers
+        """
+        if self._parse_pool is None:
+            _parse_pool_drivers[id(self)] = self
+            self._parse_pool = multiprocessing.Pool(self._parse_workers)
+
+        if data_key is None:
+            directory = self._harvester_config.get(DataSetDriverConfigKeys.DIRECTORY)
+            files_state = self._driver_state
+            file_queue = self._new_file_queue
+        else:
+            directory = self._harvester_config[data_key].get(DataSetDriverConfigKeys.DIRECTORY)
+            files_state = self._driver_state[data_key]
+            file_queue = self._new_file_queue[data_key]
+
+        results = []
+        for file_name in file_names:
+            log.debug("Parse data source file %s in pool", os.path.join(directory, file_name))
+            results.append((file_name, self._parse_pool.apply_async(
+                _parse_file_in_worker, (id(self), directory, file_name, files_state[file_name], data_key))))
+
+        for (file_name, result) in results:
+            while not result.ready():
+                gevent.sleep(PARSE_POOL_WAIT)
+            file_queue.remove(file_name)
+            try:
+                (particles, state, tail_offset, ingested, exceptions, error) = result.get()
+            except Exception as e:
+                # anything other than a SampleException, raised by the parser or sending the result back
+                log.warn("Parse pool failed on file %s, parsing it in the driver: %s", file_name, e)
+                if data_key is None:
+                    self._got_file(file_name)
+                else:
+                    # pre_parse was done before the file went to the pool
+                    self._got_file(file_name, data_key, pre_parse=False)
+                continue
+
+            self._raise_new_file_event(os.path.join(directory, file_name))
+            self._buffer_data(particles)
+            for exception in exceptions:
+                self._sample_exception_callback(exception)
+            file_state = files_state[file_name]
+            file_state[DriverStateKey.PARSER_STATE] = state
+            if tail_offset is not None:
+                file_state[DriverStateKey.TAIL_OFFSET] = tail_offset
+            if ingested or error is not None:
+                log.debug("File %s fully parsed", file_name)
+                file_state[DriverStateKey.INGESTED] = True
+            if data_key is None:
+                self._checkpoint((file_name,))
+            else:
+                self._checkpoint((data_key, file_name))
+            if error is not None:
+                self._sample_exception_callback(error)
+
     def _start_sampling(self):
         # just a little nap before we start working.  Giving the agent time
         # to respond.
@@ -524,6 +907,130 @@ class SimpleDataSetDriver(DataSetDriver):
     def _build_harvester(self, memento):
         raise NotImplementedException('virtual method needs to be specialized')
 
+    def _build_file_parser(self, file_state, parser_state, handle, data_key=None):
+        """
+        Build the parser for a file.  If the harvester is configured for tail mode and the parser is
+        append safe, the parser is started fresh on a view of the file beginning at the committed tail
+        offset, so it only reads the data appended since the last records were published.  Otherwise
+        the parser is built from its saved state as usual.
+        @param file_state driver state for the file
+        @param parser_state parser state to build the parser with outside tail mode
+        @param handle open file to parse
+        @param data_key data key of the harvester and parser, None for single harvester drivers
+        @retval the parser
+        """
+        if data_key is None:
+            harvester_config = self._harvester_config
+            args = ()
+        else:
+            harvester_config = self._harvester_config[data_key]
+            args = (data_key,)
+
+        self._tail_offsets.pop(data_key, None)
+        if harvester_config.get(DataSetDriverConfigKeys.TAIL_MODE) and self._tail_safe.get(data_key, True):
+            offset = file_state.get(DriverStateKey.TAIL_OFFSET)
+            if offset is None:
+                # the file was started outside tail mode, continue from the parser position
+                offset = 0
+                if isinstance(parser_state, dict):
+                    offset = parser_state.get(PARSER_POSITION, 0)
+            if offset > os.fstat(handle.fileno()).st_size:
+                log.warn("File is shorter than its tail offset %d, parsing from the start", offset)
+                offset = 0
+
+            parser = self._build_parser(None, TailFile(handle, offset), *args)
+            if parser.append_safe:
+                log.debug("Parsing from tail offset %d", offset)
+                self._tail_offsets[data_key] = offset
+                return parser
+
+            log.warn("Ignoring tail mode, parser %s is not append safe", parser.__class__.__name__)
+            self._tail_safe[data_key] = False
+            handle.seek(0)
+
+        return self._build_parser(parser_state, handle, *args)
+
+    def _tail_parser_state(self, state, data_key=None):
+        """
+        Convert a state published by a parser started at a tail offset into the state for the whole file.
+        @param state parser state
+        @param data_key data key of the harvester and parser, None for single harvester drivers
+        @retval tuple of the state and the new committed tail offset, or None if not in tail mode
+        """
+        offset = self._tail_offsets.get(data_key)
+        if offset is None or not isinstance(state, dict):
+            return (state, None)
+        state = dict(state)
+        state[PARSER_POSITION] += offset
+        return (state, state[PARSER_POSITION])
+
+    def _is_recovered(self, data_key=None):
+        """
+        Check if a harvester is configured as collecting recovered data, which is not paced
+        @param data_key data key of the harvester, None for single harvester drivers
+        @retval True if the data is recovered
+        """
+        if data_key is None:
+            harvester_config = self._harvester_config
+        else:
+            harvester_config = self._harvester_config[data_key]
+        return bool(harvester_config.get(DataSetDriverConfigKeys.RECOVERED))
+
+    def _parse_records(self, parser, data_key=None):
+        """
+        Get all the records available from a parser.  Live data is paced to records_per_second in
+        batches of batched_particle_count.  Recovered data is historical, so it is pulled in batches of
+        recovered_batch_count, each published in one callback, only yielding to other greenlets between
+        batches.
+        @param parser parser to get records from
+        @param data_key data key of the harvester and parser, None for single harvester drivers
+        """
+        try:
+            records = parser.iter_records()
+        except NotImplementedException:
+            # this parser only hands out records through get_records
+            records = None
+
+        if self._is_recovered(data_key):
+            count = self._recovered_batch_count
+            delay = 0
+        else:
+            count = self._generate_particle_count
+            # Calculate the delay between grabbing records to publish.
+            delay = float(count) / float(self._particle_count_per_second)
+
+        total = 0
+        while(True):
+            if records is None:
+                result = parser.get_records(count)
+            else:
+                result = self._take_records(parser, records, count)
+            if not result:
+                break
+            total += len(result)
+            log.trace("Records parsed: %d delay: %f", len(result), delay)
+            gevent.sleep(delay)
+
+        # the parser has nothing more, don't leave the last records waiting for the checkpoint interval
+        self._flush_checkpoint()
+        log.debug("Parsed %d records in batches of %d", total, count)
+
+    def _take_records(self, parser, records, count):
+        """
+        Take a batch of records from a parser's record generator and have the parser publish them
+        @param parser parser the records are from
+        @param records generator from the parser's iter_records
+        @param count maximum number of records in the batch
+        @retval list of the particles published
+        """
+        particles = []
+        state = None
+        for (particle, state) in islice(records, count):
+            particles.append(particle)
+        if particles:
+            parser.publish_records(particles, state)
+        return particles
+
     def _verify_config(self):
         """
         Verify we have good configurations for the parser and harvester.
@@ -557,7 +1064,10 @@ class SimpleDataSetDriver(DataSetDriver):
         # If we have files, grab the first and process it.
         count = len(self._new_file_queue)
         log.trace("Checking for new files in queue, count: %d", count)
-        if(count > 0):
+        if count > 1 and self._use_parse_pool():
+            # keep all the workers busy while earlier files are published
+            self._parse_files_in_pool(self._new_file_queue[:self._parse_workers * 2])
+        elif(count > 0):
             log.debug("New file detected, resource_id: %s, array addr: %s", self._resource_id, id(self._new_file_queue))
             self._got_file(self._new_file_queue.pop(0))
 
@@ -620,14 +1130,6 @@ class SimpleDataSetDriver(DataSetDriver):
             # Removed this for the time being to get new driver code out.  May bring this back in the future
             #self._stage_input_file(os.path.join(directory, file_name))
 
-            count = 1
-            delay = None
-
-            if self._generate_particle_count:
-                # Calculate the delay between grabbing records to publish.
-                delay = float(1) / float(self._particle_count_per_second) * float(self._generate_particle_count)
-                count = self._generate_particle_count
-
             self._file_in_process = file_name
 
             # Open the copied file in the storage directory so we know the file won't be
@@ -639,16 +1141,9 @@ class SimpleDataSetDriver(DataSetDriver):
             handle = open(path)
 
             # the file directory is initialized in the harvester, so it will exist by this point
-            parser = self._build_parser(self._driver_state[file_name][DriverStateKey.PARSER_STATE], handle)
-
-            while(True):
-                result = parser.get_records(count)
-                if result:
-                    log.trace("Record parsed: %r delay: %f", result, delay)
-                    if delay:
-                        gevent.sleep(delay)
-                else:
-                    break
+            file_state = self._driver_state[file_name]
+            parser = self._build_file_parser(file_state, file_state[DriverStateKey.PARSER_STATE], handle)
+            self._parse_records(parser)
 
         except SampleException as e:
             # need to mark the bad file as ingested so we don't re-ingest it
@@ -664,13 +1159,16 @@ class SimpleDataSetDriver(DataSetDriver):
         @param state: Object used by the parser to indicate position
         """
         log.trace("saving parser state: %r", state)
+        (state, tail_offset) = self._tail_parser_state(state)
         # this is for the directory harvester which uses file name keys
         self._driver_state[self._file_in_process][DriverStateKey.PARSER_STATE] = state
+        if tail_offset is not None:
+            self._driver_state[self._file_in_process][DriverStateKey.TAIL_OFFSET] = tail_offset
         # check if file has been completely parsed by comparing the parsed position and file size
         if file_ingested:
             log.debug("File %s fully parsed", self._file_in_process)
             self._driver_state[self._file_in_process][DriverStateKey.INGESTED] = True
-        self._state_callback(self._driver_state)
+        self._checkpoint((self._file_in_process,), force=file_ingested)
 
     def _save_parser_state_after_error(self):
         """
@@ -679,7 +1177,7 @@ class SimpleDataSetDriver(DataSetDriver):
         """
         log.debug("File %s fully parsed", self._file_in_process)
         self._driver_state[self._file_in_process][DriverStateKey.INGESTED] = True
-        self._state_callback(self._driver_state)
+        self._checkpoint((self._file_in_process,))
 
     def _init_state(self, memento):
         """
@@ -708,14 +1206,11 @@ class SimpleDataSetDriver(DataSetDriver):
         if file_name not in self._driver_state:
             # initialize the driver state for this file
             full_file_path = os.path.join(self._harvester_config[DataSetDriverConfigKeys.DIRECTORY], file_name)
-            mod_time = os.path.getmtime(full_file_path)
-            file_size = os.path.getsize(full_file_path)
-            with open(full_file_path, 'rb') as filehandle:
-                md5_checksum = hashlib.md5(filehandle.read()).hexdigest()
+            identity = get_file_identity(full_file_path)
             self._driver_state[file_name] = {
-                DriverStateKey.FILE_SIZE: file_size,
-                DriverStateKey.FILE_MOD_DATE: mod_time,
-                DriverStateKey.FILE_CHECKSUM: md5_checksum,
+                DriverStateKey.FILE_SIZE: identity.size,
+                DriverStateKey.FILE_MOD_DATE: identity.mod_time,
+                DriverStateKey.FILE_CHECKSUM: identity.checksum,
                 DriverStateKey.INGESTED: False,
                 DriverStateKey.PARSER_STATE: None
             }
@@ -727,7 +1222,7 @@ class SimpleDataSetDriver(DataSetDriver):
             count = len(self._new_file_queue)
             log.trace("Current new file queue length: %d", count)
         # the harvester updates the driver state, make sure we save the newly found file state info
-        self._state_callback(self._driver_state)
+        self._checkpoint((file_name,))
 
     def _modified_file_callback(self, modified_state):
         """
@@ -737,7 +1232,8 @@ class SimpleDataSetDriver(DataSetDriver):
         log.debug('got modified file callback, modified state %s', modified_state)
         for filename in modified_state:
             self._driver_state[filename][DriverStateKey.MODIFIED_STATE] = modified_state[filename]
-        self._state_callback(self._driver_state)
+            self._changed_state_paths.add((filename,))
+        self._checkpoint()
 
 class SingleFileDataSetDriver(SimpleDataSetDriver):
     """
@@ -810,14 +1306,6 @@ class SingleFileDataSetDriver(SimpleDataSetDriver):
             #shutil.copy2(os.path.join(directory, self._filename), storage_directory)
             #log.info("Copied file %s from %s to %s" % (self._filename, directory, storage_directory))
 
-            count = 1
-            delay = None
-
-            if self._generate_particle_count:
-                # Calculate the delay between grabbing records to publish.
-                delay = float(1) / float(self._particle_count_per_second) * float(self._generate_particle_count)
-                count = self._generate_particle_count
-
             # Open the copied file in the storage directory so we know the file won't be
             # changed while we are reading it
             path = os.path.join(directory, self._filename)
@@ -834,16 +1322,8 @@ class SingleFileDataSetDriver(SimpleDataSetDriver):
 
             # the directory harvester uses file_name keys, the single file harvester does not
             # the file directory is initialized in the harvester, so it will exist by this point
-            parser = self._build_parser(parser_state, handle)
-
-            while(True):
-                result = parser.get_records(count)
-                if result:
-                    log.trace("Record parsed: %r delay: %f", result, delay)
-                    if delay:
-                        gevent.sleep(delay)
-                else:
-                    break
+            parser = self._build_file_parser(self._driver_state[self._filename], parser_state, handle)
+            self._parse_records(parser)
 
             self._save_ingested_file_state()
         except SampleException as e:
@@ -862,9 +1342,12 @@ class SingleFileDataSetDriver(SimpleDataSetDriver):
         @param state: Object used by the parser to indicate position
         """
         log.trace("saving parser state: %r", state)
+        (state, tail_offset) = self._tail_parser_state(state)
         # this is for the single file harvester, which does not use file name keys
         self._driver_state[self._filename][DriverStateKey.PARSER_STATE] = state
-        self._state_callback(self._driver_state)
+        if tail_offset is not None:
+            self._driver_state[self._filename][DriverStateKey.TAIL_OFFSET] = tail_offset
+        self._checkpoint((self._filename,), force=False)
 
     def _file_changed_callback(self, new_state):
         """
@@ -889,7 +1372,7 @@ class SingleFileDataSetDriver(SimpleDataSetDriver):
                 log.debug('clearing next driver state')
             self._in_process_state = None
         log.debug('saving driver state %s', self._driver_state)
-        self._state_callback(self._driver_state)
+        self._checkpoint((self._filename,))
 
     def _driver_and_next_state_equal(self):
         if self._next_driver_state == None and self._driver_state == None:
@@ -1055,7 +1538,12 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
         # If we have files, grab the first and process it.
         count = len(self._new_file_queue[data_key])
         log.trace("Checking for new files in %s queue, count: %d", data_key, count)
-        if(count > 0):
+        if count > 1 and self._use_parse_pool(data_key):
+            file_names = self._new_file_queue[data_key][:self._parse_workers * 2]
+            for file_name in file_names:
+                self.pre_parse(filename=file_name, data_key=data_key)
+            self._parse_files_in_pool(file_names, data_key)
+        elif(count > 0):
             log.debug("New file detected, resource_id: %s, array addr: %s", self._resource_id,
                       id(self._new_file_queue[data_key]))
             self._got_file(self._new_file_queue[data_key].pop(0), data_key)
@@ -1099,24 +1587,26 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
         else:
             log.debug("poller not running. no need to shutdown")
 
-    def _got_file(self, file_name, data_key):
+    def _got_file(self, file_name, data_key, pre_parse=True):
         """
         We have a file from the single directory harvester that we want to parse.  Do any optional
         pre-parsing, then build the parser and get records
         @param file_name name of the file to parse
         @param data_key The key to index into the harvester and parser
+        @param pre_parse False if pre_parse has already been done for this file
         """
         log.debug('got file, resource_id: %s, driver state %s', self._resource_id, self._driver_state)
         try:
             self._file_in_process[data_key] = file_name
             # pre_parse can be overloaded if there is anything needed to be done prior to parsing
-            self.pre_parse(filename=file_name, data_key=data_key)
+            if pre_parse:
+                self.pre_parse(filename=file_name, data_key=data_key)
             self._get_parser_results(file_name, data_key)
         except SampleException as e:
             # need to mark the bad file as ingested so we don't re-ingest it
             log.debug("File %s fully parsed", file_name)
             self._driver_state[data_key][file_name][DriverStateKey.INGESTED] = True
-            self._state_callback(self._driver_state)
+            self._checkpoint((data_key, file_name))
             self._sample_exception_callback(e)
         finally:
             self._file_in_process[data_key] = None
@@ -1139,7 +1629,7 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
             # make sure we have initialized the file name dictionary with the parser state
             if file_name not in self._driver_state[data_key]:
                 self._driver_state[data_key][file_name] = {DriverStateKey.PARSER_STATE: None}
-                self._state_callback(self._driver_state)
+                self._checkpoint((data_key, file_name))
 
             # pre_parse can be overloaded if there is anything needed to be done prior to parsing
             self.pre_parse_single(filename=file_name, data_key=data_key)
@@ -1158,16 +1648,8 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
         @param file_name name of the file to parse
         @param data_key The key to index into the harvester and parser
         """
-        count = 1
-        delay = None
-
         directory = self._harvester_config[data_key].get(DataSetDriverConfigKeys.DIRECTORY)
 
-        if self._generate_particle_count:
-            # Calculate the delay between grabbing records to publish.
-            delay = float(1) / float(self._particle_count_per_second) * float(self._generate_particle_count)
-            count = self._generate_particle_count
-
         # Open the copied file in the storage directory so we know the file won't be
         # changed while we are reading it
         path = os.path.join(directory, file_name)
@@ -1179,16 +1661,9 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
         self._file_in_process[data_key] = file_name
 
         # the file directory is initialized in the harvester, so it will exist by this point
-        parser = self._build_parser(self._driver_state[data_key][file_name][DriverStateKey.PARSER_STATE], handle, data_key)
-
-        while(True):
-            result = parser.get_records(count)
-            if result:
-                log.trace("Record parsed: %r delay: %f", result, delay)
-                if delay:
-                    gevent.sleep(delay)
-            else:
-                break
+        file_state = self._driver_state[data_key][file_name]
+        parser = self._build_file_parser(file_state, file_state[DriverStateKey.PARSER_STATE], handle, data_key)
+        self._parse_records(parser, data_key)
 
     def pre_parse(self, filename=None, data_key=None):
         """
@@ -1219,13 +1694,16 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
         """
         file_name = self._file_in_process[data_key]
         log.trace("saving parser state: %r for file %s", state, file_name)
+        (state, tail_offset) = self._tail_parser_state(state, data_key)
         # this is for the directory harvester which uses file name keys
         self._driver_state[data_key][file_name][DriverStateKey.PARSER_STATE] = state
+        if tail_offset is not None:
+            self._driver_state[data_key][file_name][DriverStateKey.TAIL_OFFSET] = tail_offset
         # check if file has been completely parsed by comparing the parsed position and file size
         if file_ingested:
             log.debug("File %s fully parsed", file_name)
             self._driver_state[data_key][file_name][DriverStateKey.INGESTED] = True
-        self._state_callback(self._driver_state)
+        self._checkpoint((data_key, file_name), force=bool(file_ingested))
 
     def _file_changed_callback(self, new_state, data_key):
         """
@@ -1250,14 +1728,11 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
         if file_name not in self._driver_state[data_key]:
             # initialize the driver state for this file
             full_file_path = os.path.join(self._harvester_config[data_key][DataSetDriverConfigKeys.DIRECTORY], file_name)
-            mod_time = os.path.getmtime(full_file_path)
-            file_size = os.path.getsize(full_file_path)
-            with open(full_file_path, 'rb') as filehandle:
-                md5_checksum = hashlib.md5(filehandle.read()).hexdigest()
+            identity = get_file_identity(full_file_path)
             self._driver_state[data_key][file_name] = {
-                DriverStateKey.FILE_SIZE: file_size,
-                DriverStateKey.FILE_MOD_DATE: mod_time,
-                DriverStateKey.FILE_CHECKSUM: md5_checksum,
+                DriverStateKey.FILE_SIZE: identity.size,
+                DriverStateKey.FILE_MOD_DATE: identity.mod_time,
+                DriverStateKey.FILE_CHECKSUM: identity.checksum,
                 DriverStateKey.INGESTED: False,
                 DriverStateKey.PARSER_STATE: None
             }
@@ -1271,7 +1746,7 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
             count = len(self._new_file_queue[data_key])
             log.trace("Current new file queue length: %d", count)
         # the harvester updates the driver state, make sure we save the newly found file state info
-        self._state_callback(self._driver_state)
+        self._checkpoint((data_key, file_name))
 
     def _modified_file_callback(self, modified_state, data_key):
         """
@@ -1281,7 +1756,8 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
         log.debug('got modified file callback, modified state %s', modified_state)
         for filename in modified_state:
             self._driver_state[data_key][filename][DriverStateKey.MODIFIED_STATE] = modified_state[filename]
-        self._state_callback(self._driver_state)
+            self._changed_state_paths.add((data_key, filename))
+        self._checkpoint()
 
     def _verify_config(self):
         """
@@ -1339,6 +1815,6 @@ class MultipleHarvesterDataSetDriver(SimpleDataSetDriver):
 
             self._in_process_queue[data_key] = None
         log.debug('saving driver state %s', self._driver_state)
-        self._state_callback(self._driver_state)
+        self._checkpoint((data_key, file_name))
 
 
@@ -11,8 +11,11 @@ out of files and feed them into the system.
 __author__ = 'Steve Foley'
 __license__ = 'Apache 2.0'
 
+import os
+import mmap
 import time
 import ntplib
+from itertools import islice
 
 from mi.core.log import get_logger
 log = get_logger()
@@ -22,10 +25,55 @@ from mi.core.exceptions import RecoverableSampleException, SampleEncodingExcepti
 from mi.core.exceptions import NotImplementedException, UnexpectedDataException
 from mi.dataset.dataset_driver import DataSetDriverConfigKeys
 
+# bytes get_block reads at first, doubled after each read that fills the block up to the maximum
+MIN_BLOCK_SIZE = 64 * 1024
+MAX_BLOCK_SIZE = 1024 * 1024
+
+def find_sync(buffer, sync_words, start=0, end=None):
+    """
+    Find the first place in a buffer where one of several sync words starts,
+    without copying any of the buffer.  Sieves use this to jump between the
+    positions where a record could start instead of trying to match at every
+    byte.
+    @param buffer The buffer to search
+    @param sync_words Sequence of the strings that records can start with
+    @param start Index to start searching from
+    @param end Index to stop searching at, None for the end of the buffer
+    @retval Index of the first sync word at or after start, -1 if there is none
+    """
+    if end is None:
+        end = len(buffer)
+    found = -1
+    for sync_word in sync_words:
+        index = buffer.find(sync_word, start, end)
+        if index != -1 and (found == -1 or index < found):
+            found = index
+    return found
+
+def next_sync(buffer, sync_words, position):
+    """
+    Skip a position in a buffer where no record matched to the next place a
+    record could start
+    @param buffer The buffer being scanned
+    @param sync_words Sequence of the strings that records can start with
+    @param position Index where no record matched
+    @retval Index of the next sync word after position, or the length of the
+       buffer if there is none
+    """
+    index = find_sync(buffer, sync_words, position + 1)
+    if index == -1:
+        return len(buffer)
+    return index
 
 class Parser(object):
     """ abstract class to show API needed for plugin poller objects """
 
+    # An append safe parser reads its stream front to back, needs nothing from before the point it is
+    # started at, and keeps the byte position after the last published record in its state under
+    # 'position'.  Drivers in tail mode start these parsers with no state on just the data appended
+    # since that position, see SimpleDataSetDriver._build_file_parser.
+    append_safe = False
+
     def __init__(self, config, stream_handle, state, sieve_fn,
                  state_callback, publish_callback, exception_callback=None):
         """
@@ -85,6 +133,15 @@ class Parser(object):
         """
         raise NotImplementedException("get_records() not overridden!")
 
+    def iter_records(self):
+        """
+        Generate the records in the stream as (particle, state) tuples, where state is
+        the parser state after the particle.  Records are not published and the state
+        callback is not called, the caller does that for the records it takes.  Parsers
+        that only support get_records raise NotImplementedException.
+        """
+        raise NotImplementedException("iter_records() not overridden!")
+
     def set_state(self, state):
         """
         Set the state of the last published data block.
@@ -151,6 +208,12 @@ class BufferLoadingParser(Parser):
     to operate this way, but it can keep memory in check and smooth out
     stream inputs if they dont all come at once.
     """
+    # defaults for parsers that skip this class's __init__
+    _block_size = MIN_BLOCK_SIZE
+    _use_mmap = False
+    _mmap = None
+    _record_index = 0
+    _indexed_buffer = None
 
     def __init__(self, config, stream_handle, state, sieve_fn,
                  state_callback, publish_callback, exception_callback=None):
@@ -172,8 +235,16 @@ class BufferLoadingParser(Parser):
            be published into ION
         """
         self._record_buffer = []
+        # index of the next record to take from the record buffer, which is only
+        # cleared once all its records are taken rather than sliced on every take
+        self._record_index = 0
+        self._indexed_buffer = self._record_buffer
         self._timestamp = 0.0
         self.file_complete = False
+        self._block_size = MIN_BLOCK_SIZE
+        # with use_mmap in the config, blocks are sliced out of a read only map of the file instead of read
+        self._use_mmap = config.get(DataSetDriverConfigKeys.USE_MMAP, False)
+        self._mmap = None
 
         super(BufferLoadingParser, self).__init__(config, stream_handle, state,
                                                   sieve_fn, state_callback,
@@ -190,12 +261,73 @@ class BufferLoadingParser(Parser):
         """
         if num_records <= 0:
             return []
+        self._fill_record_buffer(num_records)
+        return self._yank_particles(num_records)
+
+    def iter_records(self):
+        """
+        Generate the records in the stream, loading more data whenever the record
+        buffer runs out.  Records are taken off the record buffer as they are
+        generated, but are not published and the state callback is not called, pass
+        the records taken to publish_records for that.
+        @retval generator of (particle, state) tuples, state is the parser state after the particle
+        """
+        while True:
+            self._fill_record_buffer(1)
+            record = self._take_record()
+            if record is None:
+                return
+            yield record
+
+    def publish_records(self, particles, state):
+        """
+        Publish particles taken from iter_records and send the state after the last
+        of them to the driver
+        @param particles The particles to publish
+        @param state The parser state after the last particle
+        """
+        self._state = state
+        self._publish_sample(particles)
+        log.trace("Sending parser state [%s] to driver", self._state)
+        # file has been read completely and all records pulled out of the record buffer
+        file_ingested = self.file_complete and self._buffered_record_count() == 0
+        self._state_callback(self._state, file_ingested)  # push new state to driver
+
+    def _fill_record_buffer(self, num_records):
+        """
+        Load the record buffer until it holds num_records records that have not been
+        taken, or the end of the file is reached
+        @param num_records The number of records to have in the buffer
+        """
         try:
-            while len(self._record_buffer) < num_records:
-                self._load_particle_buffer()        
+            while self._buffered_record_count() < num_records:
+                self._load_particle_buffer()
         except EOFError:
             self._process_end_of_file()
-        return self._yank_particles(num_records)
+
+    def _buffered_record_count(self):
+        """
+        @retval The number of records in the record buffer that have not been taken
+        """
+        if self._record_buffer is not self._indexed_buffer:
+            # the buffer was replaced, which most parsers do in set_state
+            self._indexed_buffer = self._record_buffer
+            self._record_index = 0
+        return len(self._record_buffer) - self._record_index
+
+    def _take_record(self):
+        """
+        Take the next record off the record buffer
+        @retval (particle, state) tuple, or None if the buffer is empty
+        """
+        if self._buffered_record_count() == 0:
+            return None
+        record = self._record_buffer[self._record_index]
+        self._record_index += 1
+        if self._record_index == len(self._record_buffer):
+            del self._record_buffer[:]
+            self._record_index = 0
+        return record
 
     def _process_end_of_file(self):
         """
@@ -219,30 +351,19 @@ class BufferLoadingParser(Parser):
         cannot be collected (perhaps due to an EOF), the list will have the
         elements it was able to collect.
         """
-        if len(self._record_buffer) < num_records:
-            num_to_fetch = len(self._record_buffer)
-        else:
-            num_to_fetch = num_records
+        num_to_fetch = min(self._buffered_record_count(), num_records)
         log.trace("Yanking %s records of %s requested",
                   num_to_fetch,
                   num_records)
 
         return_list = []
-        records_to_return = self._record_buffer[:num_to_fetch]
-        self._record_buffer = self._record_buffer[num_to_fetch:]
-        if len(records_to_return) > 0:
-            self._state = records_to_return[-1][1]  # state side of tuple of last entry
-            # strip the state info off of them now that we have what we need
-            for item in records_to_return:
-                log.debug("Record to return: %s", item)
-                return_list.append(item[0])
-            self._publish_sample(return_list)
-            log.trace("Sending parser state [%s] to driver", self._state)
-            file_ingested = False
-            if self.file_complete and len(self._record_buffer) == 0:
-                # file has been read completely and all records pulled out of the record buffer
-                file_ingested = True
-            self._state_callback(self._state, file_ingested)  # push new state to driver
+        state = None
+        # strip the state info off of them, keeping the state of the last entry
+        for (particle, state) in islice(iter(self._take_record, None), num_to_fetch):
+            log.debug("Record to return: %s", (particle, state))
+            return_list.append(particle)
+        if return_list:
+            self.publish_records(return_list, state)
 
         return return_list
 
@@ -255,22 +376,66 @@ class BufferLoadingParser(Parser):
             result = self.parse_chunks()
             self._record_buffer.extend(result)
 
-    def get_block(self, size=1024):
+    def get_block(self, size=None):
         """
         Get a block of characters for processing
-        @param size The size of the block to try to read
+        @param size The size of the block to try to read, by default the block
+           size starts at MIN_BLOCK_SIZE and grows to MAX_BLOCK_SIZE
         @retval The length of data retreived
         @throws EOFError when the end of the file is reached
         """
+        block_size = size
+        if block_size is None:
+            block_size = self._block_size
+
         # read in some more data
-        data = self._stream_handle.read(size)
+        data = self._read_block(block_size)
         if data:
+            if size is None and len(data) == block_size:
+                self._block_size = min(block_size * 2, MAX_BLOCK_SIZE)
             self._chunker.add_chunk(data, ntplib.system_to_ntp_time(time.time()))
             return len(data)
         else:  # EOF
+            self._close_mmap()
             self.file_complete = True
             raise EOFError
 
+    def _read_block(self, size):
+        """
+        Read up to size bytes from the current position of the stream handle, from the
+        file map if using mmap
+        @param size The number of bytes to read
+        @retval The data read, empty at the end of the file
+        """
+        if self._use_mmap and self._mmap is None:
+            try:
+                self._mmap = mmap.mmap(self._stream_handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except (AttributeError, ValueError, EnvironmentError) as e:
+                # not a real file, or an empty one, which can't be mapped
+                log.debug("Unable to map file, reading it instead: %s", e)
+                return self._stream_handle.read(size)
+
+        if self._mmap is None:
+            return self._stream_handle.read(size)
+
+        position = self._stream_handle.tell()
+        data = self._mmap[position:position + size]
+        # keep the stream handle in step so set_state and tell work as they do without the map
+        self._stream_handle.seek(position + len(data))
+        if not data and os.fstat(self._stream_handle.fileno()).st_size > len(self._mmap):
+            # the file has grown since it was mapped
+            self._close_mmap()
+            return self._read_block(size)
+        return data
+
+    def _close_mmap(self):
+        """
+        Release the file map, the file is mapped again if more is read
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
     def parse_chunks(self):
         """
         Parse out any pending data chunks in the chunker. If
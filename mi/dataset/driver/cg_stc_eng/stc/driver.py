@@ -11,9 +11,6 @@ initial release
 __author__ = 'Emily Hahn'
 __license__ = 'Apache 2.0'
 
-import os
-import gevent
-
 from mi.core.log import get_logger
 log = get_logger()
 
@@ -21,7 +18,6 @@ from mi.core.exceptions import ConfigurationException
 from mi.core.common import BaseEnum
 
 from mi.dataset.dataset_driver import MultipleHarvesterDataSetDriver, DataSetDriverConfigKeys
-from mi.dataset.dataset_driver import DriverStateKey
 
 from mi.dataset.parser.cg_stc_eng_stc import \
     CgStcEngStcParser, \
@@ -79,15 +75,17 @@ class CgStcEngStcDataSetDriver(MultipleHarvesterDataSetDriver):
         super(CgStcEngStcDataSetDriver, self).__init__(config, memento, data_callback, state_callback, event_callback,
                                                        exception_callback, data_keys)
 
-    def _build_parser(self, parser_state, stream_in, data_key, file_in):
+    def _build_parser(self, parser_state, stream_in, data_key, file_in=None):
         """
         Build the parser based on which data_key is input.  The file name is only
         needed for mopak, and it just not passed in to the other parser builders
         @param parser_state previous parser state to initialize parser with
         @param stream_in handle of the opened file to parse
         @param data_key harvester / parser key 
-        @param file_in file name
+        @param file_in file name, defaults to the file in process for this data key
         """
+        if file_in is None:
+            file_in = self._file_in_process[data_key]
 
         # get the config for the correct parser instance
         config = self._parser_config.get(data_key)
@@ -255,48 +253,3 @@ class CgStcEngStcDataSetDriver(MultipleHarvesterDataSetDriver):
             harvester = None
 
         return harvester
-
-    def _get_parser_results(self, file_name, data_key):
-
-        """
-        Build the parser and get all the records until there are no more available
-        Need to override this from the base parser class to pass in the filename for mopak
-        @param file_name name of the file to parse
-        @param data_key The key to index into the harvester and parser
-
-        Overloaded inherited method to pass filename into _build_parser
-        filename is needed by the MOPAK parser constructor
-        """
-
-        count = 1
-        delay = None
-
-        directory = self._harvester_config[data_key].get(DataSetDriverConfigKeys.DIRECTORY)
-
-        if self._generate_particle_count:
-            # Calculate the delay between grabbing records to publish.
-            delay = float(1) / float(self._particle_count_per_second) * float(self._generate_particle_count)
-            count = self._generate_particle_count
-
-        # Open the copied file in the storage directory so we know the file won't be
-        # changed while we are reading it
-        path = os.path.join(directory, file_name)
-
-        self._raise_new_file_event(path)
-        log.debug("Open new data source file: %s", path)
-        handle = open(path)
-
-        self._file_in_process[data_key] = file_name
-
-        # the file directory is initialized in the harvester, so it will exist by this point
-        parser = self._build_parser(self._driver_state[data_key][file_name][DriverStateKey.PARSER_STATE],
-                                    handle, data_key, file_name)
-
-        while True:
-            result = parser.get_records(count)
-            if result:
-                log.trace("Record parsed: %r delay: %f", result, delay)
-                if delay:
-                    gevent.sleep(delay)
-            else:
-                break
\ No newline at end of file
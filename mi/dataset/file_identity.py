@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+
+"""
+@package mi.dataset.file_identity File identity service for data set drivers
+@file mi/dataset/file_identity.py
+@brief Computes the size, modification time and md5 checksum of data files
+once and shares them between the harvester and the dataset driver.
+
+Checksums are cached by (path, size, mod time, inode), so a file that has
+not changed since it was last hashed is not read again no matter how many
+places ask for its checksum. Files are hashed in large blocks rather than
+read into memory whole.
+
+By default any change hashes the whole file again, so the checksum is
+always the md5 of the file's contents.
+
+Telemetered files mostly grow by appending. A caller that knows its files
+are only ever appended to, such as a harvester in tail mode, can ask for
+append_only identities. Then, when a cached file keeps its inode and gets
+bigger, the first and last blocks of the previously hashed prefix are
+checked against digests taken when it was hashed, and if they still match
+the running md5 is extended over only the new bytes. This is a heuristic:
+nothing between those blocks is read again, so if the file was also
+rewritten in the middle the checksum is no longer the md5 of the file.
+
+Usage:
+
+identity = get_file_identity('/tmp/dsatest/node59p1.dat')
+identity.checksum
+"""
+
+__license__ = 'Apache 2.0'
+
+import os
+import hashlib
+from collections import namedtuple
+from collections import OrderedDict
+from threading import Lock
+
+from mi.core.log import get_logger ; log = get_logger()
+
+# bytes read at a time while hashing
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# bytes at each end of a hashed prefix that are checked before extending its hash
+PREFIX_CHECK_SIZE = 64 * 1024
+
+# number of files the shared cache remembers
+DEFAULT_CACHE_SIZE = 4096
+
+FileIdentity = namedtuple('FileIdentity', ['path', 'size', 'mod_time', 'inode', 'checksum'])
+
+def _prefix_digests(filehandle, size, check_size=PREFIX_CHECK_SIZE):
+    """
+    Digest the first and last check_size bytes of the first size bytes of a file
+    @retval (head digest, tail digest)
+    """
+    filehandle.seek(0)
+    head = hashlib.md5(filehandle.read(min(check_size, size))).digest()
+    filehandle.seek(max(size - check_size, 0))
+    tail = hashlib.md5(filehandle.read(min(check_size, size))).digest()
+    return head, tail
+
+class _HashState(object):
+    """
+    What the cache keeps for one file: its identity, the md5 state after
+    hashing it and digests of the ends of the hashed data.
+    """
+    __slots__ = ('identity', 'md5', 'prefix_digests')
+
+    def __init__(self, identity, md5, prefix_digests):
+        self.identity = identity
+        self.md5 = md5
+        self.prefix_digests = prefix_digests
+
+class FileIdentityCache(object):
+    """
+    Cache of file checksums keyed by the file's path, size, modification
+    time and inode. Safe to share between the harvester thread and the
+    driver.
+    """
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE, block_size=HASH_BLOCK_SIZE):
+        """
+        @param max_entries number of paths to remember, least recently used are dropped first
+        @param block_size bytes to read at a time while hashing
+        """
+        self._max_entries = max_entries
+        self._block_size = block_size
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        # number of times a whole file was read to compute a checksum
+        self.hash_count = 0
+        # number of times a checksum was extended over data appended to a file
+        self.extend_count = 0
+
+    def get(self, path, append_only=False):
+        """
+        Get the identity of a file, hashing it only if it changed since it was last hashed
+        @param path path to the file
+        @param append_only True if the file is only ever appended to, to extend the cached checksum over
+        the new data when the ends of the previously hashed data are unchanged, rather than hash it all
+        @retval FileIdentity
+        @raise OSError if the file does not exist or can't be read
+        """
+        stat = os.stat(path)
+        with self._lock:
+            state = self._entries.pop(path, None)
+            if state is not None and self._matches(state.identity, stat):
+                self._entries[path] = state
+                return state.identity
+
+        with open(path, 'rb') as filehandle:
+            # hash the file as of this stat, data appended while hashing is picked up next time
+            size = stat.st_size
+            md5 = None
+            if append_only and state is not None and self._appended(state, stat, filehandle):
+                md5 = state.md5.copy()
+                filehandle.seek(state.identity.size)
+                log.trace("extending hash of %s from %d bytes", path, state.identity.size)
+                self.extend_count += 1
+            else:
+                filehandle.seek(0)
+                md5 = hashlib.md5()
+                self.hash_count += 1
+            self._hash_to(filehandle, md5, size)
+            # less than the stat size if the file was truncated while hashing
+            size = filehandle.tell()
+            prefix_digests = _prefix_digests(filehandle, size)
+
+        identity = FileIdentity(path, size, stat.st_mtime, stat.st_ino, md5.hexdigest())
+        log.trace("hashed file %s: %s", path, identity)
+
+        with self._lock:
+            self._entries[path] = _HashState(identity, md5, prefix_digests)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return identity
+
+    def _hash_to(self, filehandle, md5, end):
+        """
+        Update md5 with the file from its current position up to offset end
+        """
+        remaining = end - filehandle.tell()
+        while remaining > 0:
+            block = filehandle.read(min(self._block_size, remaining))
+            if not block:
+                break
+            md5.update(block)
+            remaining -= len(block)
+
+    @staticmethod
+    def _appended(state, stat, filehandle):
+        """
+        Check if a file has only been appended to since state was cached, by
+        comparing the ends of the previously hashed data
+        """
+        identity = state.identity
+        if identity.inode != stat.st_ino or identity.size >= stat.st_size:
+            return False
+        return _prefix_digests(filehandle, identity.size) == state.prefix_digests
+
+    def invalidate(self, path=None):
+        """
+        Forget the cached identity of a file
+        @param path path to forget, or None to forget all files
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+    @staticmethod
+    def _matches(identity, stat):
+        """
+        Check if a cached identity is still valid for the current stat of its file
+        """
+        return identity.size == stat.st_size and identity.mod_time == stat.st_mtime and \
+            identity.inode == stat.st_ino
+
+# the cache shared by all harvesters and drivers in the process
+_shared_cache = FileIdentityCache()
+
+def get_file_identity(path, append_only=False):
+    """
+    Get the identity of a file from the shared cache
+    @param path path to the file
+    @param append_only True if the file is only ever appended to, see FileIdentityCache.get
+    @retval FileIdentity with the size, modification time, inode and md5 checksum
+    """
+    return _shared_cache.get(path, append_only)
+
+def get_file_checksum(path, append_only=False):
+    """
+    Get the md5 checksum of a file from the shared cache
+    @param path path to the file
+    @param append_only True if the file is only ever appended to, see FileIdentityCache.get
+    @retval hex digest string
+    """
+    return _shared_cache.get(path, append_only).checksum
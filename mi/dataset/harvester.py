@@ -14,17 +14,20 @@ __license__ = 'Apache 2.0'
 
 import os
 import glob
-import hashlib
+import fnmatch
 import time
 import re
 
 from threading import Thread
+from collections import OrderedDict
 from gevent.event import Event
 
 from mi.core.log import get_logger ; log = get_logger()
+from mi.core import inotify
 from mi.core.poller import DirectoryPoller, ConditionPoller
 from mi.core.common import BaseEnum
 from mi.dataset.dataset_driver import DriverStateKey
+from mi.dataset.file_identity import get_file_checksum
 
 
 class Harvester(object):
@@ -51,6 +54,12 @@ class Harvester(object):
 # used to determine if we should do integer sorting of the files
 NUMBER_UNDERSCORE_MATCHER = re.compile(r'_\d')
 
+# inotify events that mean a file in a watched directory may be new or changed
+INOTIFY_MASK = inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO | inotify.IN_MODIFY
+
+# inotify events that mean a file has left a watched directory
+INOTIFY_REMOVED_MASK = inotify.IN_DELETE | inotify.IN_MOVED_FROM
+
 class SingleDirectoryPoller(ConditionPoller):
     """
     Monitor a single directory to see if new files have appeared or if files have changed.
@@ -61,8 +70,11 @@ class SingleDirectoryPoller(ConditionPoller):
     @param callback - function to callback when a change in files has occured
     @param exception_callback - function to callback when an exception occurs
     @param interval - polling interval for checking this directory
+    @param use_inotify - watch the directory with Linux inotify rather than globbing it every interval.
+    Falls back to globbing where inotify is not available.
     """
-    def __init__(self, config, memento, callback, exception_callback=None, interval=1, file_mod_wait=30):
+    def __init__(self, config, memento, callback, exception_callback=None, interval=1, file_mod_wait=30,
+                 use_inotify=False):
         log.debug("Initialize harvester with config: %s", config)
         directory = config.get('directory')
         wildcard = config.get('pattern')
@@ -71,6 +83,8 @@ class SingleDirectoryPoller(ConditionPoller):
         self.file_mod_wait = file_mod_wait
         if not isinstance(self.file_mod_wait, int) or self.file_mod_wait < 0:
             raise TypeError("File modification wait time must be an integer 0 or greater")
+        # in tail mode files are only appended to, so their checksums can be extended over new data
+        self._append_only = bool(config.get('tail_mode', False))
         log.debug("Start directory poller path: %s, pattern: %s", directory, wildcard)
         self._found_file_state = memento
         # driver state is not a new instance of memento, it is the same here as in the driver
@@ -80,18 +94,115 @@ class SingleDirectoryPoller(ConditionPoller):
         # this queue holds the names of the files that have been sent to the driver.  Each time the harvester
         # restarts, the queue is emptied so all files that have not been ingested can be added and sent again,
         # but this keeps the harvester from sending the same files over and over to not be put in the driver queue
-        self.sent_to_driver_queue = []
+        # it is an ordered set, file name : True, so membership checks don't depend on the number of files
+        self.sent_to_driver_queue = OrderedDict()
+        # integer sort keys of the files found in the last check, file path : key
+        self._sort_keys = {}
+
+        # with inotify, only files the kernel reports as changed are checked after the first scan. Files
+        # still inside the modification wait are kept here, path : last seen mod time, until they settle
+        self._directory = directory
+        self._wildcard = wildcard
+        self._watcher = None
+        self._rescan = True
+        self._pending = {}
+        if use_inotify:
+            self._start_watching()
         super(SingleDirectoryPoller,self).__init__(self._check_for_files, callback,
                                                    exception_callback, interval)
 
-    def _check_for_files(self):
+    def _start_watching(self):
         """
-        Find any new or modified files and update the harvester state
+        Watch the directory with inotify, leaving the glob poller in place if that is not possible
+        """
+        if not inotify.available():
+            log.warn("inotify is not available, polling %s", self._path)
+            return
+        try:
+            self._watcher = inotify.Inotify()
+            self._watcher.add_watch(self._directory, INOTIFY_MASK | INOTIFY_REMOVED_MASK)
+            log.debug("Watching %s with inotify", self._directory)
+        except OSError as e:
+            log.warn("Unable to watch %s with inotify, polling instead: %s", self._directory, e)
+            self._stop_watching()
+
+    def _stop_watching(self):
+        """
+        Release the inotify watch, further checks glob the directory
         """
-        filenames = []
+        if self._watcher:
+            self._watcher.close()
+            self._watcher = None
+        self._rescan = True
+        self._pending = {}
 
-        if os.path.exists(os.path.dirname(self._path)):
-            filenames = glob.glob(self._path)
+    def shutdown(self):
+        super(SingleDirectoryPoller, self).shutdown()
+        watcher = self._watcher
+        if watcher:
+            watcher.wake()
+
+    def run(self):
+        try:
+            super(SingleDirectoryPoller, self).run()
+        finally:
+            self._stop_watching()
+
+    def _wait(self):
+        """
+        Without inotify, sleep for the polling interval.  With inotify, sleep until a matching file
+        changes, a pending file leaves the modification wait, or the interval is up.
+        """
+        if not self._watcher:
+            return super(SingleDirectoryPoller, self)._wait()
+
+        timeout = self.polling_interval
+        if self._pending:
+            # strictly greater than the wait time is required, so sleep a little past it
+            settle_time = min(mod_time for mod_time in self._pending.values()) + self.file_mod_wait
+            timeout = max(0, min(timeout, settle_time - time.time() + 0.01))
+
+        for (wd, mask, cookie, name) in self._watcher.read_events(timeout):
+            if mask & (inotify.IN_IGNORED | inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF | inotify.IN_UNMOUNT):
+                log.warn("Lost inotify watch on %s, polling instead", self._directory)
+                self._stop_watching()
+                return
+            if mask & inotify.IN_Q_OVERFLOW:
+                # events were lost, look at everything again
+                log.debug("inotify queue overflow, rescanning %s", self._directory)
+                self._rescan = True
+            elif name and mask & INOTIFY_REMOVED_MASK:
+                path = os.path.join(self._directory, name)
+                self._pending.pop(path, None)
+                self._sort_keys.pop(path, None)
+            elif name and not mask & inotify.IN_ISDIR and self._name_matches(name):
+                # mod time is unknown until the next check stats the file, files already pending
+                # are rechecked when their current wait is up
+                self._pending.setdefault(os.path.join(self._directory, name), 0)
+
+    def _name_matches(self, name):
+        """
+        Match a file name to the wildcard the way glob would, so hidden files are skipped
+        """
+        if name.startswith('.') and not self._wildcard.startswith('.'):
+            return False
+        return fnmatch.fnmatch(name, self._wildcard)
+
+    def _find_files(self):
+        """
+        Get the paths of the files that need to be checked, sorted in ingestion order
+        """
+        if self._watcher and not self._rescan:
+            filenames = self._pending.keys()
+        else:
+            filenames = []
+            if os.path.exists(os.path.dirname(self._path)):
+                filenames = glob.glob(self._path)
+            self._rescan = False
+            # every file is listed, forget the sort keys of files that are gone
+            existing = set(filenames)
+            for path in [path for path in self._sort_keys if path not in existing]:
+                del self._sort_keys[path]
 
         # if there are underscores in the filename, sort by ascii rather than 
         if len(filenames) > 0:
@@ -99,14 +210,33 @@ class SingleDirectoryPoller(ConditionPoller):
                 filenames = self.sort_files(filenames)
             else:
                 filenames.sort()
+        return filenames
+
+    def _check_for_files(self):
+        """
+        Find any new or modified files and update the harvester state
+        """
+        filenames = self._find_files()
 
         new_files = []
         modified_state = {}
         # loop over all files in the directory and compare their state to that in the harvester state dictionary
         for i_file in filenames:
-            mod_time = os.path.getmtime(i_file)
+            try:
+                mod_time = os.path.getmtime(i_file)
+            except OSError:
+                if not self._watcher:
+                    raise
+                # removed since inotify reported it
+                self._pending.pop(i_file, None)
+                self._sort_keys.pop(i_file, None)
+                continue
             # check if the file has not been modified in the last X seconds
-            if (mod_time + self.file_mod_wait) < time.time():
+            if (mod_time + self.file_mod_wait) >= time.time():
+                if self._watcher:
+                    self._pending[i_file] = mod_time
+            else:
+                self._pending.pop(i_file, None)
                 file_name = os.path.basename(i_file)
                 # find if this file already exists in the found files
                 if file_name in self._found_file_state and self._found_file_state[file_name][DriverStateKey.INGESTED]:
@@ -116,8 +246,7 @@ class SingleDirectoryPoller(ConditionPoller):
                     self._found_file_state[file_name][DriverStateKey.FILE_MOD_DATE] != mod_time:
                        # this file has been ingested, but the file size and times don't match, confirm that
                        # the checksum is different
-                        with open(i_file, 'rb') as filehandle:
-                            md5_checksum = hashlib.md5(filehandle.read()).hexdigest()
+                        md5_checksum = get_file_checksum(i_file, self._append_only)
                         if self._found_file_state[file_name][DriverStateKey.FILE_CHECKSUM] != md5_checksum:
                             # ingested file has been modified!
                             if DriverStateKey.MODIFIED_STATE in self._found_file_state[file_name]:
@@ -145,7 +274,7 @@ class SingleDirectoryPoller(ConditionPoller):
                     # duplicates are not sent
                     if file_name not in self.sent_to_driver_queue:
                         # only send this file once
-                        self.sent_to_driver_queue.append(file_name)
+                        self.sent_to_driver_queue[file_name] = True
                         new_files.append(file_name)
 
         log.debug('found new files: %r, modified_files: %r', new_files, modified_state)
@@ -155,29 +284,20 @@ class SingleDirectoryPoller(ConditionPoller):
         """
         Sorts files which have multiple indices separated by underscores in a file name.
         Ascii sorting will sort '16' less than '6', so separate by underscores, turn into
-        integers, then sort
+        integers, then sort.  The integer keys are computed once per file and kept until
+        the file is no longer in the directory, so sorting a subset of the files does not
+        drop the keys of the others.
         """
         # no sorting needed if 0 or 1 files
         if not filenames or len(filenames) < 2:
             return filenames
 
-        # this assumes all files have the same extension
-        file_extension = filenames[0].split('.')
-        split_names = ()
+        sort_keys = self._sort_keys
         for fn in filenames:
-            split_name = self.ascii_to_int_list(fn)
-            # append this split up name as a tuple
-            split_names = split_names + (split_name, ) 
-        # now sort all the int formatted names
-        sorted_tuple = sorted(split_names)
-        # put the filenames back to string format
-        sorted_filenames = []
-        
-        for fn in sorted_tuple:
-            # Retrieve original name from end of sorted component list
-            sorted_filenames.append(fn[len(fn) - 1])
-
-        return sorted_filenames
+            if fn not in sort_keys:
+                sort_keys[fn] = self.ascii_to_int_list(fn)
+
+        return sorted(filenames, key=sort_keys.__getitem__)
 
     @staticmethod
     def ascii_to_int_list(filename):
@@ -221,7 +341,8 @@ class SingleDirectoryHarvester(SingleDirectoryPoller, Harvester):
                                     self.on_new_files,
                                     exception_callback,
                                     config.get('frequency', 1),
-                                    config.get('file_mod_wait_time', 30))
+                                    config.get('file_mod_wait_time', 30),
+                                    config.get('use_inotify', False))
 
     def on_new_files(self, file_tuple):
         """
@@ -258,6 +379,8 @@ class SingleFilePoller(ConditionPoller):
         self.file_mod_wait = file_mod_wait
         if not isinstance(self.file_mod_wait, int) or self.file_mod_wait < 0:
             raise TypeError("File modification wait time must be an integer 0 or greater")
+        # in tail mode the file is only appended to, so its checksum can be extended over new data
+        self._append_only = bool(config.get('tail_mode', False))
         if self._filename in memento and DriverStateKey.FILE_SIZE in memento[self._filename]:
             # since _found_file_state is internal to harvester, don't need to match driver state
             # with indexing by filename
@@ -288,8 +411,7 @@ class SingleFilePoller(ConditionPoller):
                     if self._found_file_state[DriverStateKey.FILE_SIZE] != file_size or \
                         self._found_file_state[DriverStateKey.FILE_MOD_DATE] != mod_time:
                         # size or time is different, confirm with checksum
-                        with open(self._path, 'rb') as filehandle:
-                            md5_checksum = hashlib.md5(filehandle.read()).hexdigest()
+                        md5_checksum = get_file_checksum(self._path, self._append_only)
                         if self._found_file_state[DriverStateKey.FILE_CHECKSUM] != md5_checksum:
                             # file is different, update the state
                             self._found_file_state[DriverStateKey.FILE_SIZE] = file_size
@@ -305,8 +427,7 @@ class SingleFilePoller(ConditionPoller):
                             }
                 else:
                     # no driver state yet, first time opening this file
-                    with open(self._path, 'rb') as filehandle:
-                        md5_checksum = hashlib.md5(filehandle.read()).hexdigest()
+                    md5_checksum = get_file_checksum(self._path)
 
                     self._found_file_state[DriverStateKey.FILE_SIZE] = file_size
                     self._found_file_state[DriverStateKey.FILE_MOD_DATE] = mod_time
@@ -25,21 +25,23 @@ from mi.core.log import get_logger
 
 log = get_logger()
 from mi.core.common import BaseEnum
+from mi.core.checksum import sum16
+from mi.core import pd0
 from mi.core.instrument.data_particle import \
     DataParticle, DataParticleKey, DataParticleValue
 from mi.core.exceptions import SampleException, RecoverableSampleException, \
     DatasetParserException, UnexpectedDataException
-from mi.dataset.dataset_parser import BufferLoadingParser
+from mi.dataset.dataset_parser import BufferLoadingParser, MAX_BLOCK_SIZE
 
 ADCPS_PD0_HEADER_REGEX = b'\x7f\x7f'  # header bytes in PD0 files flagged by 7F7F
 
 ADCPS_PD0_HEADER_MATCHER = re.compile(ADCPS_PD0_HEADER_REGEX)
 
 #define the lengths of ensemble parts
-FIXED_HEADER_BYTES = 6
+FIXED_HEADER_BYTES = pd0.HEADER_BYTES
 NUM_BYTES_BYTES = 2  # The number of bytes for the number of bytes field.
 OFFSET_BYTES = 2
-ID_BYTES = 2
+ID_BYTES = pd0.ID_BYTES
 ADCPS_FIXED_LEADER_BYTES = 59
 ADCPA_FIXED_LEADER_BYTES = 58
 ADCPS_VARIABLE_LEADER_BYTES = 65
@@ -55,14 +57,17 @@ CHECKSUM_BYTES = 2
 #used to verify 16 bit checksum
 CHECKSUM_MODULO = 65535
 
+# the most bytes an ensemble can take, the largest length field plus the checksum
+MAX_ENSEMBLE_BYTES = 0xFFFF + CHECKSUM_BYTES
+
 #IDs of the different parts of the ensemble.
-FIXED_LEADER_ID = 0
-VARIABLE_LEADER_ID = 128
-VELOCITY_ID = 256
-CORRELATION_ID = 512
-ECHO_INTENSITY_ID = 768
-PERCENT_GOOD_ID = 1024
-BOTTOM_TRACK_ID = 1536
+FIXED_LEADER_ID = pd0.FIXED_LEADER_ID
+VARIABLE_LEADER_ID = pd0.VARIABLE_LEADER_ID
+VELOCITY_ID = pd0.VELOCITY_ID
+CORRELATION_ID = pd0.CORRELATION_ID
+ECHO_INTENSITY_ID = pd0.ECHO_INTENSITY_ID
+PERCENT_GOOD_ID = pd0.PERCENT_GOOD_ID
+BOTTOM_TRACK_ID = pd0.BOTTOM_TRACK_ID
 
 
 class AdcpPd0ParserDataParticleKey(BaseEnum):
@@ -284,6 +289,75 @@ class StateKey(BaseEnum):
     POSITION = 'position'  # number of bytes read
 
 
+class ParserConfigKey(BaseEnum):
+    # record the position of every ensemble parsed in the parser's ensemble_index
+    INDEX_ENSEMBLES = 'index_ensembles'
+
+
+def find_ensembles(input_buffer):
+    """
+    Find the complete ensembles in a buffer.  Each ensemble found is checked
+    against its checksum and the search jumps past it using the number of
+    bytes in its header, so headers that happen to appear inside ensembles are
+    never looked at.  After data that is not a valid ensemble, the search
+    resumes at the next header with str.find.
+    @param input_buffer the buffer to search
+    @retval list of (start, end) tuples of the ensembles, including their checksums
+    """
+    indices_list = []
+    # don't look in the last 2 bytes because you will not have num bytes
+    limit = len(input_buffer) - CHECKSUM_BYTES
+    record_start = input_buffer.find(ADCPS_PD0_HEADER_REGEX, 0, limit)
+
+    while record_start != -1:
+        # get the number of bytes in the record, does not include the 2 checksum bytes
+        num_bytes = struct.unpack_from('<H', input_buffer, record_start + 2)[0]
+        record_end = record_start + num_bytes
+
+        #if there is enough in the buffer, including the checksum bytes, check the record
+        if record_end <= limit and \
+                sum16(input_buffer, record_start, record_end) == \
+                struct.unpack_from('<H', input_buffer, record_end)[0]:
+            #include the 2 checksum bytes in the chunk
+            indices_list.append((record_start, record_end + CHECKSUM_BYTES))
+            next_start = record_end + CHECKSUM_BYTES
+        else:
+            next_start = record_start + 1
+
+        record_start = input_buffer.find(ADCPS_PD0_HEADER_REGEX, next_start, limit)
+
+    return indices_list
+
+
+def read_ensemble_index(stream_handle):
+    """
+    Scan a PD0 file for its ensembles without decoding them.  The position of
+    an ensemble can be used to seek straight to it, or as the parser state
+    position to start parsing from it.
+    @param stream_handle open file, scanned from its current position to the end
+    @retval list of the positions of the ensembles in the file
+    """
+    index = []
+    buffer_position = stream_handle.tell()
+    input_buffer = ''
+
+    while True:
+        data = stream_handle.read(MAX_BLOCK_SIZE)
+        input_buffer += data
+        ensembles = find_ensembles(input_buffer)
+        index.extend(buffer_position + start for (start, end) in ensembles)
+        if not data:
+            return index
+
+        # keep anything that could still be the start of an ensemble
+        keep = len(input_buffer) - MAX_ENSEMBLE_BYTES
+        if ensembles:
+            keep = max(keep, ensembles[-1][1])
+        if keep > 0:
+            input_buffer = input_buffer[keep:]
+            buffer_position += keep
+
+
 class AdcpFileType(BaseEnum):
     #enumeration of the different PD0 file formats
     ADCPA_FILE = 'adcpa_file'  # ADCPA PD0 files are used by the ExplorerDVL instruments
@@ -338,25 +412,10 @@ class AdcpPd0DataParticle(DataParticle):
         else:
             raise SampleException('invalid file type')
 
-        #parse the file header
-        (header_id, data_source_id, num_bytes, spare, num_data_types) = \
-            struct.unpack_from('<BBHBB', self.raw_data)
-
-        #log.debug("_build_parsed_values Number of data types = %d", num_data_types )
-
-        offsets = []  # create list for offsets
-        start = FIXED_HEADER_BYTES  # offsets start at byte 6 (using 0 indexing)
-        data_types_idx = 1  # counter for n data types
+        #parse the file header, the offsets of the data types start at byte 6
+        offsets = pd0.data_type_offsets(self.raw_data)
         fixed_leader_found = False
 
-        while data_types_idx <= num_data_types:
-            value = struct.unpack_from('<H', self.raw_data, start)[0]
-
-            #log.debug("_build_parsed_values Offset for data type %d is %d ", num_data_types, value )
-            offsets.append(value)
-            start += NUM_BYTES_BYTES
-            data_types_idx += 1
-
         for offset in offsets:
             # for each offset, using the starting byte, determine the data type
             # and then parse accordingly.
@@ -450,7 +509,7 @@ class AdcpPd0DataParticle(DataParticle):
          reference_layer_stop, false_target_threshold, low_latency_trigger,
          transmit_lag_distance, cpu_serial_num, system_bandwidth,
          system_power, SPARE2, serial_number) = \
-            struct.unpack_from('<H8B3H4BH4B2h2B2H4BHQH2BI', data)
+            pd0.unpack_record(pd0.FIXED_LEADER_FORMAT, data)
 
         # store the number of depth cells for use elsewhere
         self.num_depth_cells = num_cells
@@ -594,7 +653,7 @@ class AdcpPd0DataParticle(DataParticle):
                                                         cpu_serial_num, int))
             self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.SYSTEM_POWER,
                                                         system_power, int))
-            beam_angle = struct.unpack('<B', data[-1:])[0]  # beam angle is last byte
+            beam_angle = ord(data[-1])  # beam angle is last byte
             self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.BEAM_ANGLE,
                                                         beam_angle, int))
 
@@ -616,7 +675,7 @@ class AdcpPd0DataParticle(DataParticle):
          adc_attitiude, adc_contamination_sensor, error_status_word_1,
          error_status_word_2, error_status_word_3, error_status_word_4,
          SPARE1, pressure, pressure_variance, SPARE2) = \
-            struct.unpack_from('<2H10B3H2hHh18BH2II', data)
+            pd0.unpack_record(pd0.VARIABLE_LEADER_FORMAT, data)
             #Note: the ADCPS leader has extra bytes at end, handled lower in method
 
         self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.ENSEMBLE_NUMBER,
@@ -767,20 +826,8 @@ class AdcpPd0DataParticle(DataParticle):
         """
         Parse the velocity portion of the particle
         """
-        num_cells = self.num_depth_cells
-        offset = ID_BYTES
-
-        water_velocity_east = []
-        water_velocity_north = []
-        water_velocity_up = []
-        error_velocity = []
-        for row in range(0, num_cells):
-            (a, b, c, d) = struct.unpack_from('<4h', data, offset)
-            water_velocity_east.append(a)
-            water_velocity_north.append(b)
-            water_velocity_up.append(c)
-            error_velocity.append(d)
-            offset += VELOCITY_BYTES_PER_CELL
+        (water_velocity_east, water_velocity_north, water_velocity_up, error_velocity) = \
+            pd0.unpack_cells(data, ID_BYTES, self.num_depth_cells, '<i2')
 
         self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.WATER_VELOCITY_EAST,
                                                     water_velocity_east, list))
@@ -795,20 +842,8 @@ class AdcpPd0DataParticle(DataParticle):
         """
         Parse the correlation magnitude portion of the particle
         """
-        num_cells = self.num_depth_cells
-        offset = ID_BYTES
-
-        correlation_magnitude_beam1 = []
-        correlation_magnitude_beam2 = []
-        correlation_magnitude_beam3 = []
-        correlation_magnitude_beam4 = []
-        for row in range(0, num_cells):
-            (a, b, c, d) = struct.unpack_from('<4B', data, offset)
-            correlation_magnitude_beam1.append(a)
-            correlation_magnitude_beam2.append(b)
-            correlation_magnitude_beam3.append(c)
-            correlation_magnitude_beam4.append(d)
-            offset += CORRELATION_BYTES_PER_CELL
+        (correlation_magnitude_beam1, correlation_magnitude_beam2, correlation_magnitude_beam3,
+         correlation_magnitude_beam4) = pd0.unpack_cells(data, ID_BYTES, self.num_depth_cells, 'u1')
 
         self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.CORRELATION_MAGNITUDE_BEAM1,
                                                     correlation_magnitude_beam1, list))
@@ -823,20 +858,8 @@ class AdcpPd0DataParticle(DataParticle):
         """
         Parse the echo intensity portion of the particle
         """
-        num_cells = self.num_depth_cells
-        offset = ID_BYTES
-
-        echo_intesity_beam1 = []
-        echo_intesity_beam2 = []
-        echo_intesity_beam3 = []
-        echo_intesity_beam4 = []
-        for row in range(0, num_cells):
-            (a, b, c, d) = struct.unpack_from('<4B', data, offset)
-            echo_intesity_beam1.append(a)
-            echo_intesity_beam2.append(b)
-            echo_intesity_beam3.append(c)
-            echo_intesity_beam4.append(d)
-            offset += ECHO_INTENSITY_BYTES_PER_CELL
+        (echo_intesity_beam1, echo_intesity_beam2, echo_intesity_beam3, echo_intesity_beam4) = \
+            pd0.unpack_cells(data, ID_BYTES, self.num_depth_cells, 'u1')
 
         self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.ECHO_INTENSITY_BEAM1,
                                                     echo_intesity_beam1, list))
@@ -853,20 +876,8 @@ class AdcpPd0DataParticle(DataParticle):
 
         @throws RecoverableSampleException If there is a problem with sample creation
         """
-        num_cells = self.num_depth_cells
-        offset = ID_BYTES
-
-        percent_good_3beam = []
-        percent_transforms_reject = []
-        percent_bad_beams = []
-        percent_good_4beam = []
-        for row in range(0, num_cells):
-            (a, b, c, d) = struct.unpack_from('<4B', data, offset)
-            percent_good_3beam.append(a)
-            percent_transforms_reject.append(b)
-            percent_bad_beams.append(c)
-            percent_good_4beam.append(d)
-            offset += PERCENT_GOOD_BYTES_PER_CELL
+        (percent_good_3beam, percent_transforms_reject, percent_bad_beams, percent_good_4beam) = \
+            pd0.unpack_cells(data, ID_BYTES, self.num_depth_cells, 'u1')
 
         self.final_result.append(self._encode_value(AdcpPd0ParserDataParticleKey.PERCENT_GOOD_3BEAM,
                                                     percent_good_3beam, list))
@@ -906,7 +917,7 @@ class AdcpPd0DataParticle(DataParticle):
          beam2_rssi_amplitude, beam3_rssi_amplitude, beam4_rssi_amplitude,
          bt_gain, beam1_bt_range_msb, beam2_bt_range_msb, beam3_bt_range_msb,
          beam4_bt_range_msb) = \
-            struct.unpack_from('<3H4BHL4H4h12B3H4h12BH9B', data)
+            pd0.unpack_record(pd0.BOTTOM_TRACK_FORMAT, data)
             #Note, ADCPS has 4 additional reserved bytes at the end, which are
             #not needed for either particle
 
@@ -1025,6 +1036,10 @@ class AdcpPd0DataParticle(DataParticle):
 
 
 class AdcpPd0Parser(BufferLoadingParser):
+
+    # records are self contained and the state is only the position
+    append_safe = True
+
     def __init__(self,
                  config,
                  state,
@@ -1043,6 +1058,11 @@ class AdcpPd0Parser(BufferLoadingParser):
 
         self._read_state = {StateKey.POSITION: 0}
 
+        # positions of the ensembles parsed, if configured to index them
+        self.ensemble_index = None
+        if config.get(ParserConfigKey.INDEX_ENSEMBLES):
+            self.ensemble_index = []
+
         if state:
             self.set_state(self._state)
 
@@ -1088,6 +1108,8 @@ class AdcpPd0Parser(BufferLoadingParser):
 
             # particle-ize the data block received, return the record
             sample = self._extract_sample(self._particle_class, None, chunk, None)
+            if self.ensemble_index is not None:
+                self.ensemble_index.append(self._read_state[StateKey.POSITION])
             self._increment_state(len(chunk))
             if sample:
                 # create particle
@@ -1118,55 +1140,15 @@ class AdcpPd0Parser(BufferLoadingParser):
         """
         Sort through the input buffer looking for a data record.
         A data record is considered to be properly framed if there is a
-        sync word and the checksum matches.
+        sync word and the checksum matches.  Records are found by jumping
+        from one to the next with their length fields, see find_ensembles.
         Arguments:
           input_buffer - the contents of the input stream
         Returns:
           A list of start,end tuples
         """
 
-        #log.debug("sieve called with buffer of length %d", len(input_buffer))
-
-        indices_list = []  # initialize the return list to empty
-        header_iter = ADCPS_PD0_HEADER_MATCHER.finditer(input_buffer[0: -CHECKSUM_BYTES])
-        #find all occurrences of the record header sentinel
-        #don't look in the last 2 bytes because you will not have num bytes
-
-        for match in header_iter:
-
-            record_start = match.start()
-            #place in string where sentinel was found
-
-            #log.debug("sieve function found sentinel at byte  %d", record_start)
-
-            num_bytes = struct.unpack("<H", input_buffer[record_start + 2: record_start + 4])[0]
-            # get the number of bytes in the record, does not include the 2 checksum bytes
-
-            record_end = record_start + num_bytes
-
-            #log.debug("sieve function number of bytes= %d , record end is %d", num_bytes, record_end)
-
-            #if there is enough in the buffer check the record
-            if record_end <= len(input_buffer[0: -CHECKSUM_BYTES]):
-                #make sure the checksum bytes are in the buffer too
-
-                total = 0
-                for i in range(record_start, record_end):
-                    total += ord(input_buffer[i])
-                #add up all the bytes in the record
-
-                checksum = total & CHECKSUM_MODULO  # bitwise and with 65535 or mod vs 65536
-
-                #log.debug("sieve checksum & total = %d %d ", checksum, total)
-
-                if checksum == struct.unpack("<H", input_buffer[record_end: record_end + CHECKSUM_BYTES])[0]:
-                    #verify the checksum
-                    indices_list.append((record_start, record_end + CHECKSUM_BYTES))
-                    #include the 2 checksum bytes in the chunk
-
-                    #log.debug("sieve function found record.  Start = %d End = %d", record_start, record_end)
-
-        return indices_list
+        return find_ensembles(input_buffer)
 
 
 
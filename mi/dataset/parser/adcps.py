@@ -18,6 +18,7 @@ from dateutil import parser
 from mi.core.log import get_logger
 log = get_logger()
 
+from mi.dataset.dataset_parser import next_sync
 from mi.dataset.parser.sio_mule_common import SioMuleParser, SIO_HEADER_MATCHER
 from mi.core.common import BaseEnum
 from mi.core.exceptions import  RecoverableSampleException, UnexpectedDataException
@@ -65,6 +66,9 @@ DATA_WRAPPER_MATCHER = re.compile(DATA_WRAPPER_REGEX)
 DATA_FAIL_REGEX = b'<ERROR type=(.+) msg=(.+)/>\x0d\x0a'
 DATA_FAIL_MATCHER = re.compile(DATA_FAIL_REGEX)
 
+# the first bytes of data wrappers and failure messages
+RECORD_SYNC = (b'<Executing/>', b'<ERROR')
+
 DATA_REGEX = b'\x6e\x7f[\x00-\xFF]{32}([\x00-\xFF]+)([\x00-\xFF]{2})'
 DATA_MATCHER = re.compile(DATA_REGEX)
 
@@ -305,10 +309,10 @@ class AdcpsParser(SioMuleParser):
                 chunk_idx = SIO_HEADER_BYTES
                 end_idx_okay = SIO_HEADER_BYTES
 
-                while chunk_idx <= len(chunk):
+                while chunk_idx < len(chunk):
 
-                    data_fail_match = DATA_FAIL_MATCHER.match(chunk[chunk_idx:])
-                    data_wrapper_match = DATA_WRAPPER_MATCHER.match(chunk[chunk_idx:])
+                    data_fail_match = DATA_FAIL_MATCHER.match(chunk, chunk_idx)
+                    data_wrapper_match = DATA_WRAPPER_MATCHER.match(chunk, chunk_idx)
 
                     if data_wrapper_match:
 
@@ -374,7 +378,7 @@ class AdcpsParser(SioMuleParser):
 
                     else:
                         # if we have to skip bytes, we have unexplained data
-                        chunk_idx += 1
+                        chunk_idx = next_sync(chunk, RECORD_SYNC, chunk_idx)
 
             self._chunk_sample_count.append(sample_count)
 
@@ -26,11 +26,12 @@ from mi.core.log import get_logger
 log = get_logger()
 
 from mi.core.common import BaseEnum
+from mi.core.checksum import sum16
 from mi.core.instrument.data_particle import DataParticle
 from mi.core.exceptions import SampleException, DatasetParserException
 from mi.core.exceptions import RecoverableSampleException, UnexpectedDataException
 
-from mi.dataset.dataset_parser import BufferLoadingParser
+from mi.dataset.dataset_parser import BufferLoadingParser, find_sync
 
 # *** Defining regexes for this parser ***
 HEADER_REGEX = b'#UIMM Status.+DateTime: (\d{8}\s\d{6}).+#ID=(\d+).+#SN=(\d+).+#Volts=(\d+\.\d{2}).+' \
@@ -53,6 +54,9 @@ DATA_MATCHER_B = re.compile(DATA_REGEX_B)
 RX_FAILURE_REGEX = b'Record\[\d+\]:ReceiveFailure\r\n'
 RX_FAILURE_MATCHER = re.compile(RX_FAILURE_REGEX)
 
+# both data and receive failure records start with this
+RECORD_SYNC = (b'Record[',)
+
 HEADER_BYTES = 200
 FOOTER_BYTES = 43
 MIN_DATA_BYTES = 36
@@ -282,25 +286,25 @@ class AdcpsJlnStcParser(BufferLoadingParser):
         @retval list of matched start,end index found in raw_data
         """
         return_list = []
-        st_idx = 0
-        while st_idx < len(raw_data): 
-            # Find a match, then advance
-            fail_match = RX_FAILURE_MATCHER.match(raw_data[st_idx:])
-            match = DATA_MATCHER.match(raw_data[st_idx:])
+        st_idx = find_sync(raw_data, RECORD_SYNC)
+        while st_idx != -1:
+            # Find a match in place, then advance
+            fail_match = RX_FAILURE_MATCHER.match(raw_data, st_idx)
+            match = DATA_MATCHER.match(raw_data, st_idx)
             if fail_match:
                 # found a marked receive failure match, still add this to the chunks so it is not non-data
-                end_packet_idx = fail_match.end(0) + st_idx
-                return_list.append((fail_match.start(0) + st_idx, end_packet_idx))
-                st_idx = end_packet_idx
+                end_packet_idx = fail_match.end(0)
+                return_list.append((fail_match.start(0), end_packet_idx))
+                st_idx = find_sync(raw_data, RECORD_SYNC, end_packet_idx)
             elif match:
                 # found a real record match
-                end_packet_idx = match.end(0) - 6 + st_idx  # string "Record" or "#End U" is length 6
+                end_packet_idx = match.end(0) - 6  # string "Record" or "#End U" is length 6
                 if end_packet_idx < len(raw_data):
                     # Record "ReceiveFailure" and checksum are checked in parse_chunks
-                    return_list.append((match.start(0) + st_idx, end_packet_idx))
-                st_idx = end_packet_idx         
+                    return_list.append((match.start(0), end_packet_idx))
+                st_idx = find_sync(raw_data, RECORD_SYNC, end_packet_idx)
             else:
-                st_idx += 1    
+                st_idx = find_sync(raw_data, RECORD_SYNC, st_idx + 1)
         return return_list
 
     def compare_checksum(self, raw_bytes):
@@ -311,17 +315,8 @@ class AdcpsJlnStcParser(BufferLoadingParser):
         return False
 
     def calc_checksum(self, raw_bytes):
-        n_bytes = len(raw_bytes)
-        # unpack raw bytes into unsigned chars
-        unpack_str = '<'
-        for i in range(0, n_bytes):
-            unpack_str = unpack_str + 'B'
-        fields = struct.unpack(unpack_str, raw_bytes)
-        sum_fields = sum(fields)
-        # since we are summing as unsigned short, limit range to 0 to 65535
-        while sum_fields > 65535:
-            sum_fields -= 65536
-        return sum_fields
+        # sum of the unsigned bytes, as an unsigned short
+        return sum16(raw_bytes)
 
     def _parse_header(self):
         """
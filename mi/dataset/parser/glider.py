@@ -19,7 +19,7 @@ import inspect
 import importlib
 import sys
 
-from math import copysign
+from math import copysign, isnan
 from functools import partial
 
 from mi.core.log import get_logger
@@ -32,6 +32,24 @@ from mi.dataset.dataset_parser import BufferLoadingParser
 # start the logger
 log = get_logger()
 
+# lat/lon in DDMM.MMMM or DDDMM.MMMM, for values the string split in _string_to_ddegrees does not handle
+LATLON_MATCHER = re.compile(r'(-*\d{2,3})(\d{2}.\d+)')
+
+
+def ddmm_to_ddegrees(values):
+    """
+    Convert glider latitudes or longitudes in DDMM.MMMM format to decimal
+    degrees, a whole column at a time.  Unlike _string_to_ddegrees the values
+    are split into degrees and minutes with float math, so results may differ
+    from the string conversion in the last bit.
+    @param values array like of latitudes or longitudes as floats, NaN where missing
+    @retval numpy array of the positions in decimal degrees, NaN where missing
+    """
+    values = np.asarray(values, dtype=np.float64)
+    magnitude = np.abs(values)
+    degrees = np.floor(magnitude / 100.)
+    return np.copysign(degrees + (magnitude - degrees * 100.) / 60., values)
+
 class StateKey(BaseEnum):
     POSITION = 'position'
     SENT_METADATA = 'sent_metadata'
@@ -80,6 +98,123 @@ class GliderParticleKey(BaseEnum):
         return result
 
 
+class GliderColumnIndex(object):
+    """
+    Index of the columns converted from the rows of a glider file, shared by
+    all of its rows.  The particle parameters found in the columns, and the
+    column indexes of the science parameters, are worked out once for each
+    particle class and cached here.
+    """
+    def __init__(self, labels):
+        """
+        @param labels labels of the converted columns, in the order of the row values
+        """
+        self.labels = labels
+        self.index = dict((label, position) for (position, label) in enumerate(labels))
+        # id of a key list : (key list, (key, index) pairs of keys in the columns, keys not in the columns)
+        self._projections = {}
+        # id of a key list : (key list, array of the indexes of the keys in the columns)
+        self._indexes = {}
+
+    def project(self, key_list):
+        """
+        Split a list of particle parameters into those found in the columns and those not
+        @param key_list list of parameter names, a class attribute of the particle
+        @retval tuple of a list of (key, index) pairs for the keys in the columns and a
+        list of the keys not in the columns, both in key list order
+        """
+        projection = self._projections.get(id(key_list))
+        if projection is None or projection[0] is not key_list:
+            projection = (key_list,
+                          [(key, self.index[key]) for key in key_list if key in self.index],
+                          [key for key in key_list if key not in self.index])
+            self._projections[id(key_list)] = projection
+        return projection[1:]
+
+    def indexes(self, key_list):
+        """
+        @param key_list list of parameter names, a class attribute of the particle
+        @retval numpy array of the indexes of the keys found in the columns
+        """
+        indexes = self._indexes.get(id(key_list))
+        if indexes is None or indexes[0] is not key_list:
+            indexes = (key_list, np.array([self.index[key] for key in key_list if key in self.index], dtype=int))
+            self._indexes[id(key_list)] = indexes
+        return indexes[1]
+
+
+class GliderRow(object):
+    """
+    View of one row of glider data, the converted values of the columns in a
+    GliderColumnIndex and a mask of which of them are NaN.  Every particle
+    produced from a row is built from the same row rather than a copy of it.
+    Indexing a row by label gives the {'Name': label, 'Data': value} dict
+    used for glider data dictionaries.
+    """
+    def __init__(self, columns, values, nan_mask=None):
+        """
+        @param columns GliderColumnIndex of the values
+        @param values list of the column values
+        @param nan_mask numpy bool array, True for the values that are NaN, None to check the values
+        """
+        self.columns = columns
+        self.values = values
+        self.nan_mask = nan_mask
+
+    @staticmethod
+    def from_dict(data_dict):
+        """
+        Build a row from a glider data dictionary
+        @param data_dict dictionary of label : {'Name': label, 'Data': value}
+        """
+        labels = data_dict.keys()
+        return GliderRow(GliderColumnIndex(labels), [data_dict[label]['Data'] for label in labels])
+
+    def value(self, label):
+        """
+        @retval the value of a column
+        @throws KeyError if the column is not in the row
+        """
+        return self.values[self.columns.index[label]]
+
+    def has_data(self, indexes):
+        """
+        @param indexes array of column indexes, from GliderColumnIndex.indexes
+        @retval True if any of the columns are not NaN
+        """
+        if len(indexes) == 0:
+            return False
+        if self.nan_mask is not None:
+            return not self.nan_mask[indexes].all()
+        for index in indexes:
+            value = self.values[index]
+            if not (isinstance(value, float) and isnan(value)):
+                return True
+        return False
+
+    def keys(self):
+        return list(self.columns.labels)
+
+    def __contains__(self, label):
+        return label in self.columns.index
+
+    def __getitem__(self, label):
+        return {'Name': label, 'Data': self.value(label)}
+
+    def __len__(self):
+        return len(self.values)
+
+    def __eq__(self, other):
+        return isinstance(other, GliderRow) and self.columns.labels == other.columns.labels and \
+            self.values == other.values
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return 'GliderRow(%r)' % dict(zip(self.columns.labels, self.values))
+
+
 class GliderParticle(DataParticle):
     """
     Base particle for glider data. Glider files are
@@ -96,11 +231,19 @@ class GliderParticle(DataParticle):
     # will be set to true if we have found data when parsed.
     common_parameters = GliderParticleKey.list()
 
+    # the parameters in this particle, which are the only columns the parser needs to convert for it,
+    # None if they are not known
+    parameters = None
+
     def _parsed_values(self, key_list):
 
         log.debug(" @@@ GliderParticle._parsed_values(): Build a particle with keys: %s", key_list)
 
-        if not isinstance(self.raw_data, dict):
+        if isinstance(self.raw_data, GliderRow):
+            row = self.raw_data
+        elif isinstance(self.raw_data, dict):
+            row = GliderRow.from_dict(self.raw_data)
+        else:
             raise SampleException(
                 "%s: Object Instance is not a Glider Parsed Data \
                  dictionary" % self._data_particle_type)
@@ -117,45 +260,29 @@ class GliderParticle(DataParticle):
         # find if any of the variables from the particle key list are in
         # the data_dict and keep it
         #
-        # "key_list" is a list of particle parameter names
-        for key in key_list:
-
-            log.trace("GliderParticle._parsed_values(): About to check if key %s is in raw_data", key)
-
-            # if the item from the particle is in the raw_data (row) we just sampled...
-            if key in self.raw_data:
-                # read the value of the item from the dictionary
-                value = self.raw_data[key]['Data']
-
-                log.trace("GliderParticle._parsed_values(): Found particle item in row of Raw Data: key %s, value: %s", key, value)
-                # check if this value is a string, implying it is one of the three
-                # file info data items in the particle (filename,fileopen time & mission name)
-                # - don't need to perform a NaN check on a string
-                if isinstance(value, str):
-                    # add the value to the record
-                    list_of_found_particle_parameters.append({DataParticleKey.VALUE_ID: key,
-                                   DataParticleKey.VALUE: value})
-                    log.trace("GliderParticle._parsed_values(): Adding Key: %s, value: %s to particle", key, value)
-                else:
-                    # check to see that the value is not a 'NaN'
-                    if np.isnan(value):
-                        log.trace("GliderParticle._parsed_values(): NaN Value: %s", key)
-                        value = None
+        # "key_list" is a list of particle parameter names, which the row's column index
+        # splits into those in the raw_data (row) we just sampled and those not
+        (found_keys, missing_keys) = row.columns.project(key_list)
+        values = row.values
+
+        for (key, index) in found_keys:
+            value = values[index]
+
+            # check if this value is a string, implying it is one of the three
+            # file info data items in the particle (filename,fileopen time & mission name)
+            # - don't need to perform a NaN check on a string, otherwise replace a 'NaN' with None
+            if not isinstance(value, str) and isnan(value):
+                value = None
 
-                    # add the value to the record
-                    list_of_found_particle_parameters.append({DataParticleKey.VALUE_ID: key,
-                                   DataParticleKey.VALUE: value})
-                    log.trace("GliderParticle._parsed_values(): Adding Key: %s, value: %s to particle", key, value)
+            # add the value to the record
+            list_of_found_particle_parameters.append({DataParticleKey.VALUE_ID: key,
+                                                      DataParticleKey.VALUE: value})
 
-            # if the item from the particle is NOT the raw_data (row) we just sampled...
-            else:
-                # This parameter was not in the row of data (raw_data), but at least one other parameter from the particle
-                # was found in the raw data (row). A None value must be included for this parameter in the particle.
-                value = None
-                # add the None value to the result
-                list_of_missing_particle_parameters.append({DataParticleKey.VALUE_ID: key,
-                               DataParticleKey.VALUE: value})
-                log.trace("GliderParticle._parsed_values(): NO DATA in parsed row for particle, using NONE as value for key %s", key)
+        for key in missing_keys:
+            # This parameter was not in the row of data (raw_data), but at least one other parameter from the particle
+            # was found in the raw data (row). A None value must be included for this parameter in the particle.
+            list_of_missing_particle_parameters.append({DataParticleKey.VALUE_ID: key,
+                                                        DataParticleKey.VALUE: None})
 
         # if there is at lease ONE parameter from the particle found in the raw_data (row), publish the particle with
         # parameter data that has been found and NONEs for paramters that were not found
@@ -181,6 +308,7 @@ class CtdgvParticleKey(GliderParticleKey):
 class CtdgvTelemeteredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.CTDGV_M_GLIDER_INSTRUMENT
     science_parameters = CtdgvParticleKey.science_parameter_list()
+    parameters = CtdgvParticleKey.list()
 
     def _build_parsed_values(self):
         """
@@ -190,12 +318,13 @@ class CtdgvTelemeteredDataParticle(GliderParticle):
         @returns result a list of dictionaries of particle data
         @throws SampleException if the data is not a glider data dictionary
         """
-        return self._parsed_values(CtdgvParticleKey.list())
+        return self._parsed_values(self.parameters)
 
 
 class CtdgvRecoveredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.CTDGV_M_GLIDER_INSTRUMENT_RECOVERED
     science_parameters = CtdgvParticleKey.science_parameter_list()
+    parameters = CtdgvParticleKey.list()
 
     def _build_parsed_values(self):
         """
@@ -205,7 +334,7 @@ class CtdgvRecoveredDataParticle(GliderParticle):
         @returns result a list of dictionaries of particle data
         @throws SampleException if the data is not a glider data dictionary
         """
-        return self._parsed_values(CtdgvParticleKey.list())
+        return self._parsed_values(self.parameters)
 
 
 class DostaTelemeteredParticleKey(GliderParticleKey):
@@ -235,6 +364,7 @@ class DostaRecoveredParticleKey(GliderParticleKey):
 class DostaTelemeteredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.DOSTA_ABCDJM_GLIDER_INSTRUMENT
     science_parameters = DostaTelemeteredParticleKey.science_parameter_list()
+    parameters = DostaTelemeteredParticleKey.list()
 
     def _build_parsed_values(self):
         """
@@ -244,12 +374,13 @@ class DostaTelemeteredDataParticle(GliderParticle):
         @returns result a list of dictionaries of particle data
         @throws SampleException if the data is not a glider data dictionary
         """
-        return self._parsed_values(DostaTelemeteredParticleKey.list())
+        return self._parsed_values(self.parameters)
 
 
 class DostaRecoveredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.DOSTA_ABCDJM_GLIDER_RECOVERED
     science_parameters = DostaRecoveredParticleKey.science_parameter_list()
+    parameters = DostaRecoveredParticleKey.list()
 
     def _build_parsed_values(self):
         """
@@ -259,7 +390,7 @@ class DostaRecoveredDataParticle(GliderParticle):
         @returns result a list of dictionaries of particle data
         @throws SampleException if the data is not a glider data dictionary
         """
-        return self._parsed_values(DostaRecoveredParticleKey.list())
+        return self._parsed_values(self.parameters)
 
 
 class FlordParticleKey(GliderParticleKey):
@@ -277,6 +408,7 @@ class FlordParticleKey(GliderParticleKey):
 class FlordTelemeteredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.FLORD_M_GLIDER_INSTRUMENT
     science_parameters = FlordParticleKey.science_parameter_list()
+    parameters = FlordParticleKey.list()
 
     def _build_parsed_values(self):
         """
@@ -286,12 +418,13 @@ class FlordTelemeteredDataParticle(GliderParticle):
         @returns result a list of dictionaries of particle data
         @throws SampleException if the data is not a glider data dictionary
         """
-        return self._parsed_values(FlordParticleKey.list())
+        return self._parsed_values(self.parameters)
 
 
 class FlordRecoveredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.FLORD_M_GLIDER_INSTRUMENT_RECOVERED
     science_parameters = FlordParticleKey.science_parameter_list()
+    parameters = FlordParticleKey.list()
 
     def _build_parsed_values(self):
         """
@@ -301,7 +434,7 @@ class FlordRecoveredDataParticle(GliderParticle):
         @returns result a list of dictionaries of particle data
         @throws SampleException if the data is not a glider data dictionary
         """
-        return self._parsed_values(FlordParticleKey.list())
+        return self._parsed_values(self.parameters)
 
 
 class FlortTelemeteredParticleKey(GliderParticleKey):
@@ -329,6 +462,7 @@ class FlortRecoveredParticleKey(GliderParticleKey):
 class FlortTelemeteredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.FLORT_M_GLIDER_INSTRUMENT
     science_parameters = FlortTelemeteredParticleKey.science_parameter_list()
+    parameters = FlortTelemeteredParticleKey.list()
 
     def _build_parsed_values(self):
         """
@@ -338,12 +472,13 @@ class FlortTelemeteredDataParticle(GliderParticle):
         @returns result a list of dictionaries of particle data
         @throws SampleException if the data is not a glider data dictionary
         """
-        return self._parsed_values(FlortTelemeteredParticleKey.list())
+        return self._parsed_values(self.parameters)
 
 
 class FlortRecoveredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.FLORT_M_GLIDER_RECOVERED
     science_parameters = FlortRecoveredParticleKey.science_parameter_list()
+    parameters = FlortRecoveredParticleKey.list()
 
     def _build_parsed_values(self):
         """
@@ -353,7 +488,7 @@ class FlortRecoveredDataParticle(GliderParticle):
         @returns result a list of dictionaries of particle data
         @throws SampleException if the data is not a glider data dictionary
         """
-        return self._parsed_values(FlortRecoveredParticleKey.list())
+        return self._parsed_values(self.parameters)
 
 
 class ParadTelemeteredParticleKey(GliderParticleKey):
@@ -372,6 +507,7 @@ class ParadRecoveredParticleKey(GliderParticleKey):
 class ParadTelemeteredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.PARAD_M_GLIDER_INSTRUMENT
     science_parameters = ParadTelemeteredParticleKey.science_parameter_list()
+    parameters = ParadTelemeteredParticleKey.list()
 
     def _build_parsed_values(self):
         """
@@ -381,12 +517,13 @@ class ParadTelemeteredDataParticle(GliderParticle):
         @returns result a list of dictionaries of particle data
         @throws SampleException if the data is not a glider data dictionary
         """
-        return self._parsed_values(ParadTelemeteredParticleKey.list())
+        return self._parsed_values(self.parameters)
 
 
 class ParadRecoveredDataParticle(GliderParticle):
     _data_particle_type = DataParticleType.PARAD_M_GLIDER_RECOVERED
     science_parameters = ParadRecoveredParticleKey.science_parameter_list()
+    parameters = ParadRecoveredParticleKey.list()
 
     def _build_parsed_values(self):
         """
@@ -396,7 +533,7 @@ class ParadRecoveredDataParticle(GliderParticle):
         @returns result a list of dictionaries of particle data
         @throws SampleException if the data is not a glider data dictionary
         """
-        return self._parsed_values(ParadRecoveredParticleKey.list())
+        return self._parsed_values(self.parameters)
 
 
 class EngineeringRecoveredParticleKey(GliderParticleKey):
@@ -737,6 +874,7 @@ class EngineeringTelemeteredDataParticle(GliderParticle):
     keys_exclude_sci_times = EngineeringTelemeteredParticleKey.list()
     keys_exclude_sci_times.remove(GliderParticleKey.SCI_M_PRESENT_TIME)
     keys_exclude_sci_times.remove(GliderParticleKey.SCI_M_PRESENT_SECS_INTO_MISSION)
+    parameters = keys_exclude_sci_times
 
     def _build_parsed_values(self):
         """
@@ -747,7 +885,7 @@ class EngineeringTelemeteredDataParticle(GliderParticle):
         @throws SampleException if the data is not a glider data dictionary
         """
         # need to exclude sci times
-        return self._parsed_values(EngineeringTelemeteredDataParticle.keys_exclude_sci_times)
+        return self._parsed_values(self.parameters)
 
 
 class EngineeringMetadataDataParticle(GliderParticle):
@@ -759,6 +897,7 @@ class EngineeringMetadataDataParticle(GliderParticle):
     keys_exclude_times.remove(GliderParticleKey.M_PRESENT_SECS_INTO_MISSION)
     keys_exclude_times.remove(GliderParticleKey.SCI_M_PRESENT_TIME)
     keys_exclude_times.remove(GliderParticleKey.SCI_M_PRESENT_SECS_INTO_MISSION)
+    parameters = keys_exclude_times
 
     def _build_parsed_values(self):
         """
@@ -769,7 +908,7 @@ class EngineeringMetadataDataParticle(GliderParticle):
         @throws SampleException if the data is not a glider data dictionary
         """
         # need to exclude m times
-        return self._parsed_values(EngineeringMetadataDataParticle.keys_exclude_times)
+        return self._parsed_values(self.parameters)
 
 
 class EngineeringMetadataRecoveredDataParticle(GliderParticle):
@@ -781,6 +920,7 @@ class EngineeringMetadataRecoveredDataParticle(GliderParticle):
     keys_exclude_times.remove(GliderParticleKey.M_PRESENT_SECS_INTO_MISSION)
     keys_exclude_times.remove(GliderParticleKey.SCI_M_PRESENT_TIME)
     keys_exclude_times.remove(GliderParticleKey.SCI_M_PRESENT_SECS_INTO_MISSION)
+    parameters = keys_exclude_times
 
     def _build_parsed_values(self):
         """
@@ -791,7 +931,7 @@ class EngineeringMetadataRecoveredDataParticle(GliderParticle):
         @throws SampleException if the data is not a glider data dictionary
         """
         # need to exclude all times
-        return self._parsed_values(EngineeringMetadataDataParticle.keys_exclude_times)
+        return self._parsed_values(self.parameters)
 
 
 class EngineeringScienceTelemeteredDataParticle(GliderParticle):
@@ -801,6 +941,7 @@ class EngineeringScienceTelemeteredDataParticle(GliderParticle):
     keys_exclude_times = EngineeringScienceTelemeteredParticleKey.list()
     keys_exclude_times.remove(GliderParticleKey.M_PRESENT_TIME)
     keys_exclude_times.remove(GliderParticleKey.M_PRESENT_SECS_INTO_MISSION)
+    parameters = keys_exclude_times
 
     def _build_parsed_values(self):
         """
@@ -811,7 +952,7 @@ class EngineeringScienceTelemeteredDataParticle(GliderParticle):
         @throws SampleException if the data is not a glider data dictionary
         """
         # need to exclude m times
-        return self._parsed_values(EngineeringScienceTelemeteredDataParticle.keys_exclude_times)
+        return self._parsed_values(self.parameters)
 
 
 class EngineeringRecoveredDataParticle(GliderParticle):
@@ -821,6 +962,7 @@ class EngineeringRecoveredDataParticle(GliderParticle):
     keys_exclude_sci_times = EngineeringRecoveredParticleKey.list()
     keys_exclude_sci_times.remove(GliderParticleKey.SCI_M_PRESENT_TIME)
     keys_exclude_sci_times.remove(GliderParticleKey.SCI_M_PRESENT_SECS_INTO_MISSION)
+    parameters = keys_exclude_sci_times
 
     def _build_parsed_values(self):
         """
@@ -831,7 +973,7 @@ class EngineeringRecoveredDataParticle(GliderParticle):
         @throws SampleException if the data is not a glider data dictionary
         """
         # need to exclude sci times
-        return self._parsed_values(EngineeringRecoveredDataParticle.keys_exclude_sci_times)
+        return self._parsed_values(self.parameters)
 
 
 class EngineeringScienceRecoveredDataParticle(GliderParticle):
@@ -841,6 +983,7 @@ class EngineeringScienceRecoveredDataParticle(GliderParticle):
     keys_exclude_times = EngineeringScienceRecoveredParticleKey.list()
     keys_exclude_times.remove(GliderParticleKey.M_PRESENT_TIME)
     keys_exclude_times.remove(GliderParticleKey.M_PRESENT_SECS_INTO_MISSION)
+    parameters = keys_exclude_times
 
     def _build_parsed_values(self):
         """
@@ -851,7 +994,7 @@ class EngineeringScienceRecoveredDataParticle(GliderParticle):
         @throws SampleException if the data is not a glider data dictionary
         """
         # need to exclude m times
-        return self._parsed_values(EngineeringScienceRecoveredDataParticle.keys_exclude_times)
+        return self._parsed_values(self.parameters)
 
 class GliderParser(BufferLoadingParser):
     """
@@ -883,10 +1026,16 @@ class GliderParser(BufferLoadingParser):
         # specific to the gliders with ascii data, parse the header rows of the input file
         self._read_header()
 
-        # regex for first order parsing of input data from the chunker
-        record_regex = re.compile(r'.*\n')
+        # regex for first order parsing of input data from the chunker, anchored to the start of
+        # lines so the partial line at the end of the buffer is not rescanned from every position
+        record_regex = re.compile(r'^.*\n', re.MULTILINE)
         self._whitespace_regex = re.compile(r'\s*$')
 
+        # columns converted by _read_data, tuples of column index, label and converter, and the
+        # GliderColumnIndex of the rows it returns
+        self._columns = []
+        self._column_index = GliderColumnIndex([])
+
         super(GliderParser, self).__init__(config,
                                            self._stream_handle,
                                            state,
@@ -897,6 +1046,7 @@ class GliderParser(BufferLoadingParser):
                                            exception_callback,
                                            *args,
                                            **kwargs)
+        self._set_columns([getattr(self, '_particle_class', None)])
         if state:
             self.set_state(state)
 
@@ -1035,6 +1185,44 @@ class GliderParser(BufferLoadingParser):
 
         log.debug("End of header, position: %d", self._stream_handle.tell())
 
+    def _set_columns(self, particle_classes):
+        """
+        Project the columns of the file onto the parameters of the particles being produced, so only
+        those columns and m_present_time are converted for each row.  If any of the particle classes
+        does not declare its parameters, every column is converted.
+        @param particle_classes list of the particle classes produced from each row
+        """
+        data_labels = self._header_dict['labels']
+        num_bytes = self._header_dict['num_of_bytes']
+
+        needed = set([GliderParticleKey.M_PRESENT_TIME])
+        for particle_class in particle_classes:
+            parameters = getattr(particle_class, 'parameters', None)
+            if parameters is None:
+                needed = set(data_labels)
+                break
+            needed.update(parameters)
+
+        self._columns = []
+        for (index, label) in enumerate(data_labels):
+            if label not in needed:
+                continue
+
+            # determine how to convert the value, lat/lon strings are converted to decimal degrees,
+            # others by the number of bytes attribute, or left as strings
+            if ('_lat' in label) or ('_lon' in label):
+                converter = self._string_to_ddegrees
+            elif (num_bytes[index] == 1) or (num_bytes[index] == 2):
+                converter = int
+            elif (num_bytes[index] == 4) or (num_bytes[index] == 8):
+                converter = float
+            else:
+                converter = None
+            self._columns.append((index, label, converter))
+        self._column_index = GliderColumnIndex([label for (index, label, converter) in self._columns])
+
+        log.debug("Converting %d of %d columns", len(self._columns), len(data_labels))
+
     def set_state(self, state_obj):
         """
         Set the value of the state object for this parser @param state_obj The
@@ -1078,16 +1266,16 @@ class GliderParser(BufferLoadingParser):
 
     def _read_data(self, data_record):
         """
-        Read in the column labels, data type, number of bytes of each
-        data type, and the data from an ASCII glider data file.
+        Read a row of data from an ASCII glider data file, converting the
+        columns projected by _set_columns by their labels and number of bytes.
+        @retval GliderRow of the converted values
         """
 
-        data_dict = {}
+        values = []
+        nans = []
         num_columns = self._header_dict['sensors_per_cycle']
-        data_labels = self._header_dict['labels']
-        num_bytes = self._header_dict['num_of_bytes']
 
-        data = data_record.strip().split()
+        data = data_record.split()
 
         log.trace("GliderParser._read_data(): Split data: %s", data)
 
@@ -1102,60 +1290,40 @@ class GliderParser(BufferLoadingParser):
                                   'Described: %d, Actual: %d' %
                                   (num_columns, len(data)))
 
-        # extract record to dictionary
-        for ii in range(0, num_columns, 1):
-            log.trace("GliderParser._read_data(): index: %d label: %s, value: %s", ii, data_labels[ii], data[ii])
-
-            valuePreConversion = data[ii]
+        # extract the projected columns of the record to the row
+        for (index, label, converter) in self._columns:
+            value = data[index]
 
             # Check if this data value is a NaN...
-            if valuePreConversion == "NaN":
+            if value == "NaN":
                 # data is NaN, convert it to a float
-                value = float(valuePreConversion)
-            # Determine what type of data the value is - int or float, or neither
+                values.append(float(value))
+                nans.append(True)
             else:
+                if converter is not None:
+                    # convert the string to an int, float or lat/lon, or leave it as a string
+                    value = converter(value)
+                values.append(value)
+                nans.append(False)
 
-                # determine what type of data the value is, based on the number of bytes attribute
-                if (num_bytes[ii] == 1) or (num_bytes[ii] == 2):
-                        stringConverter = int
-                elif (num_bytes[ii] == 4) or (num_bytes[ii] == 8):
-                        stringConverter = float
-                else:
-                        stringConverter = None
-
-                # check to see if this is a latitude/longitude string
-                if ('_lat' in data_labels[ii]) or ('_lon' in data_labels[ii]):
-                    # convert latitude/longitude strings to decimal degrees
-                    value = self._string_to_ddegrees(data[ii])
-
-                    log.trace("GliderParser._read_data(): converted lat/lon %s from %s to %10.5f", data_labels[ii], data[ii], value)
-
-                else:
-                    # convert the string to and int or float, or leave it as a string
-                    if stringConverter is not None:
-                        value = stringConverter(data[ii])
-                    else:
-                        log.trace("GliderParser._read_data(): data value %s was not an int or a float", data[ii])
-                        value = data[ii]
-
-            data_dict[data_labels[ii]] = {
-                'Name': data_labels[ii],
-                'Data': value
-            }
+        row = GliderRow(self._column_index, values, np.array(nans, dtype=bool))
+        log.trace("Data row parsed: %s", row)
 
-        log.trace("Data dict parsed: %s", data_dict)
+        return row
 
-        return data_dict
-
-    def get_block(self, size=1024):
+    def get_block(self, size=None):
         """
         Need to overload the base class behavior so we can get the last
         record if it doesn't end with a newline it would be ignored.
         """
+        requested_size = size
+        if requested_size is None:
+            requested_size = self._block_size
+
         length = super(GliderParser, self).get_block(size)
         log.debug("Buffer read bytes: %d", length)
 
-        if length != size:
+        if length != requested_size:
             self._chunker.add_chunk("\n", ntplib.system_to_ntp_time(time.time()))
 
         return length
@@ -1193,9 +1361,8 @@ class GliderParser(BufferLoadingParser):
                 exception_detected = False
 
                 try:
-                    # create the dictionary of key/value pairs composed of the labels and the values from the
-                    # record being parsed
-                    # ex: data_dict = {'sci_bsipar_temp': {'Data': 10.67, 'Name': 'sci_bsipar_temp'}, n1, n2, nn}
+                    # create the row of the labels and the values from the record being parsed
+                    # ex: data_dict['sci_bsipar_temp'] = {'Data': 10.67, 'Name': 'sci_bsipar_temp'}
                     data_dict = self._read_data(data_record)
 
                     log.debug("  GliderParser.parse_chunks(): ### ## #### ## ####  data_dict = %s", data_dict)
@@ -1207,8 +1374,8 @@ class GliderParser(BufferLoadingParser):
                 # from the parsed data, m_present_time is the unix timestamp per IDD
                 try:
                     if not exception_detected:
-                        record_time = data_dict['m_present_time']['Data']
-                        timestamp = ntplib.system_to_ntp_time(data_dict['m_present_time']['Data'])
+                        record_time = data_dict.value('m_present_time')
+                        timestamp = ntplib.system_to_ntp_time(record_time)
                         log.debug("## GliderParser.parse_chunks(): Converting record timestamp %f to ntp timestamp %f", record_time, timestamp)
                 except KeyError:
                     exception_detected = True
@@ -1259,20 +1426,24 @@ class GliderParser(BufferLoadingParser):
         """
         Examine the data_dict to see if it contains particle parameters
         """
-        log.trace("## ## ## GliderParser._has_science_data(): _particle_class is %s", self._particle_class)
-        log.trace("## ## ## GliderParser._has_science_data(): Looking for data in science parameters: %s", self._particle_class.science_parameters)
-        for key in data_dict.keys():
-            if key in self._particle_class.science_parameters:
-                value = data_dict[key]['Data']
-                if not np.isnan(value):
-                    log.debug("Found science value for key: %s, value: %s", key, value)
-                    return True
-                else:
-                    log.debug("Science data value is nan: %s %s", key, value)
+        if self._has_particle_data(data_dict, self._particle_class):
+            return True
 
         log.debug("No science data found!")
         return False
 
+    def _has_particle_data(self, row, particle_class):
+        """
+        Check if any of the science parameters of a particle class are not NaN in a row, from the
+        NaN mask of the row and the column indexes of the parameters
+        @param row GliderRow, or glider data dictionary
+        @param particle_class class of the particle
+        @retval True if the row has data for the particle
+        """
+        if not isinstance(row, GliderRow):
+            row = GliderRow.from_dict(row)
+        return row.has_data(row.columns.indexes(particle_class.science_parameters))
+
     def _string_to_ddegrees(self, pos_str):
         """
         Converts the given string from this data stream into a more
@@ -1284,8 +1455,18 @@ class GliderParser(BufferLoadingParser):
         @retval The position in decimal degrees
         """
 
+        # split well formed values at the decimal point, without a regex
+        (whole, point, fraction) = pos_str.partition('.')
+        negative = whole.startswith('-')
+        if negative:
+            whole = whole[1:]
+        if whole.isdigit() and len(whole) <= 5 and (fraction.isdigit() or not point):
+            minutes = float('%s.%s' % (whole[-2:], fraction or '0'))
+            degrees = float(whole[:-2] or 0)
+            return copysign(degrees + minutes / 60., -1. if negative else 1.)
+
         # If NaN then return NaN
-        if np.isnan(float(pos_str)):
+        if isnan(float(pos_str)):
             return float(pos_str)
 
         # As a stop gap fix add a .0 to integers that don't contain a decimal.  This
@@ -1301,9 +1482,7 @@ class GliderParser(BufferLoadingParser):
             for i in range(0, adj_zeros):
                 pos_str = '0' + pos_str
 
-        regex = r'(-*\d{2,3})(\d{2}.\d+)'
-        regex_matcher = re.compile(regex)
-        latlon_match = regex_matcher.match(pos_str)
+        latlon_match = LATLON_MATCHER.match(pos_str)
 
         if latlon_match is None:
             log.error("Failed to parse lat/lon value: '%s'", pos_str)
@@ -1337,6 +1516,8 @@ class GliderEngineeringParser(GliderParser):
                                                       *args, **kwargs)
 
         self.list_of_particles_to_produce = config.get('particle_class')
+        if self.list_of_particles_to_produce:
+            self._set_columns(self.list_of_particles_to_produce)
 
         log.trace(" ######################### GliderEngineeringParser._init_(): MY CONFIG: %s", config)
 
@@ -1407,8 +1588,8 @@ class GliderEngineeringParser(GliderParser):
                 exception_detected = False
 
                 try:
-                    # create the dictionary of key/value pairs composed of the labels and the values from the
-                    # record being parsed
+                    # create the row of the labels and the values from the record being parsed, every
+                    # particle produced from this record is built from the same row
                     data_dict = self._read_data(data_record)
                 except SampleException as e:
                     exception_detected = True
@@ -1420,8 +1601,8 @@ class GliderEngineeringParser(GliderParser):
                 # from the parsed data, m_present_time is the unix timestamp
                 try:
                     if not exception_detected:
-                        record_time = data_dict['m_present_time']['Data']
-                        timestamp = ntplib.system_to_ntp_time(data_dict['m_present_time']['Data'])
+                        record_time = data_dict.value('m_present_time')
+                        timestamp = ntplib.system_to_ntp_time(record_time)
                         log.debug(" ## ## ## GliderEngineeringParser.parse_chunks(): "
                                   "Converting record timestamp %f to ntp timestamp %f", record_time, timestamp)
                 except KeyError:
@@ -1587,15 +1768,9 @@ class GliderEngineeringParser(GliderParser):
         """
         Examine the data_dict to see if it contains data from the engineering telemetered particle being worked on
         """
-
-        for key in data_dict.keys():
-
-            # only check for particle params that do not include the two m_ time oriented attributes
-            if key in particle_class.science_parameters:
-                # return true as soon as the first particle non-NaN attribute from the data dict
-                value = data_dict[key]['Data']
-                if not np.isnan(value):
-                    return True
+        # only check for particle params that do not include the two m_ time oriented attributes
+        if self._has_particle_data(data_dict, particle_class):
+            return True
 
         log.debug("No engineering attributes in the particle found!")
         return False
\ No newline at end of file
@@ -174,6 +174,12 @@ class MmpCdsParser(BufferLoadingParser):
         # Always seek to the beginning of the buffer to read all records
         self._stream_handle.seek(0)
 
+    def iter_records(self):
+        """
+        Records are counted in the state as they are yanked, so this parser only supports get_records
+        """
+        raise NotImplementedException("iter_records() not supported!")
+
     def _yank_particles(self, num_records):
         """
         Get particles out of the buffer and publish them. Update the state
@@ -24,6 +24,7 @@ from mi.core.log import get_logger
 log = get_logger()
 
 from mi.core.common import BaseEnum
+from mi.core.checksum import sum16
 from mi.core.instrument.data_particle import DataParticle
 from mi.core.exceptions import \
     SampleException, \
@@ -31,12 +32,13 @@ from mi.core.exceptions import \
     UnexpectedDataException, \
     ConfigurationException
 
-from mi.dataset.dataset_parser import BufferLoadingParser
+from mi.dataset.dataset_parser import BufferLoadingParser, next_sync
 from mi.dataset.dataset_driver import DataSetDriverConfigKeys
 
 
 ACCEL_ID = b'\xcb'
 RATE_ID = b'\xcf'
+RECORD_IDS = (ACCEL_ID, RATE_ID)
 ACCEL_BYTES = 43
 RATE_BYTES = 31
 
@@ -282,7 +284,7 @@ class MopakODclParser(BufferLoadingParser):
                     # not enough bytes for rate yet, jump to end
                     data_index = raw_data_len
             else:
-                data_index += 1
+                data_index = next_sync(raw_data, RECORD_IDS, data_index)
 
             remain_bytes = raw_data_len - data_index
             # if the remaining bytes are less than the data rate bytes we're done
@@ -299,17 +301,8 @@ class MopakODclParser(BufferLoadingParser):
         return False
 
     def calc_checksum(self, raw_bytes):
-        n_bytes = len(raw_bytes)
-        # unpack raw bytes into unsigned chars
-        unpack_str = '>'
-        for i in range(0, n_bytes):
-            unpack_str = unpack_str + 'B'
-        fields = struct.unpack(unpack_str, raw_bytes)
-        sum_fields = sum(fields)
-        # since we are summing as unsigned short, limit range to 0 to 65535
-        while sum_fields > 65535:
-            sum_fields -= 65536
-        return sum_fields
+        # sum of the unsigned bytes, as an unsigned short
+        return sum16(raw_bytes)
 
     def set_state(self, state_obj):
         """
@@ -16,6 +16,8 @@ __license__ = 'Apache 2.0'
 import re
 import ntplib
 import time
+import struct
+import binascii
 from datetime import datetime
 from dateutil import parser
 
@@ -23,6 +25,8 @@ from mi.core.log import get_logger ; log = get_logger()
 from mi.core.common import BaseEnum
 from mi.core.instrument.data_particle import DataParticle, DataParticleKey, DataParticleValue
 from mi.core.exceptions import SampleException, DatasetParserException, RecoverableSampleException
+from mi.core.checksum import sum8
+from mi.dataset.dataset_parser import next_sync
 from mi.dataset.parser.sio_mule_common import SioMuleParser, SIO_HEADER_MATCHER
 
 # match the ascii hex ph records
@@ -51,6 +55,9 @@ PH_EXTRA_END = b'?03\r'
 # end of sio block of data marker
 SIO_END = b'\x03'
 
+# the first bytes of data records, control records and the sio block end
+RECORD_SYNC = (b'^', b'*', SIO_END)
+
 PH_ID = '0A'
 # the control message has an optional data or battery field for some control IDs
 DATA_CONTROL_IDS = ['BF', 'FF']
@@ -61,6 +68,76 @@ NORMAL_CONTROL_LEN = 40
 OPTIONAL_CONTROL_LEN = 44
 MEASUREMENT_BYTES = 4
 
+N_REFERENCE_MEASUREMENTS = 16
+N_LIGHT_MEASUREMENTS = 92
+# range of the ph record covered by the checksum, from the length after the unique id up to the checksum
+DATA_CHECKSUM_START = 7
+DATA_CHECKSUM_END = 467
+# offset of the reference light measurements in the bytes decoded from the checksum range
+DATA_MEASUREMENT_OFFSET = 8
+# range of the control record covered by the checksum, relative to the end for the optional field
+CONTROL_CHECKSUM_START = 3
+CONTROL_CHECKSUM_END = -5
+
+def decode_hex(hex_str):
+    """
+    Decode an ascii hex string into bytes in one pass
+    @param hex_str ascii hex string
+    @retval the decoded bytes, or None if the string contains non hex characters
+    """
+    try:
+        return binascii.unhexlify(hex_str)
+    except (TypeError, binascii.Error):
+        return None
+
+def decode_hex_words(hex_str):
+    """
+    Decode ascii hex measurements, 4 characters each, into big endian 16 bit ints.  The string is
+    decoded in one pass, and only decoded a measurement at a time if it has non hex characters,
+    which are not an error, the measurements containing them are None.
+    @param hex_str ascii hex string
+    @retval list of measurements
+    """
+    decoded = decode_hex(hex_str)
+    if decoded is not None:
+        return list(struct.unpack('>%dH' % (len(decoded) / 2), decoded))
+
+    words = []
+    for i in range(0, len(hex_str), MEASUREMENT_BYTES):
+        word = hex_str[i:i + MEASUREMENT_BYTES]
+        if HEX_INT_MATCHER.match(word):
+            words.append(int(word, 16))
+        else:
+            words.append(None)
+    return words
+
+def verify_hex_checksum(record, start, end):
+    """
+    Decode the ascii hex in a record covered by its checksum, and compare the 8 bit sum of the
+    decoded bytes with the checksum, the 2 hex characters before the record's final carriage return.
+    @param record the record
+    @param start index of the first character covered by the checksum
+    @param end index after the last character covered by the checksum
+    @retval tuple of the decoded bytes, or None if there are non hex characters, and True if the checksum passed
+    """
+    hex_str = record[start:end]
+    decoded = decode_hex(hex_str)
+    try:
+        chksum = int(record[-3:-1], 16)
+        if decoded is not None:
+            calc_chksum = sum8(decoded)
+        else:
+            # int allows some characters unhexlify does not, so fall back to a byte at a time
+            calc_chksum = sum(int(hex_str[i:i + 2], 16) for i in range(0, len(hex_str), 2)) & 255
+    except Exception as e:
+        log.debug('Error calculating checksums: %s, setting passed checksum to False', e)
+        return (decoded, False)
+
+    if calc_chksum != chksum:
+        log.debug('Calculated internal checksum %d does not match received %d', calc_chksum, chksum)
+        return (decoded, False)
+    return (decoded, True)
+
 class DataParticleType(BaseEnum):
     SAMPLE = 'phsen_abcdef_sio_mule_instrument'
     CONTROL = 'phsen_abcdef_sio_mule_metadata'
@@ -120,59 +197,22 @@ class PhsenParserDataParticle(DataParticle):
         result = []
         if self._data_match:
 
-            ref_meas = []
-            previous_record_bytes = 4
-            # 4 sets of 4 reference light measurements (16 total)
-            for i in range(0, 16):
-                start_idx = previous_record_bytes + i*MEASUREMENT_BYTES
-                # confirm this contains only ascii hex chars
-                if HEX_INT_MATCHER.match(self._data_match.group(4)[start_idx:start_idx+MEASUREMENT_BYTES]):
-                    try:
-                        this_ref = int(self._data_match.group(4)[start_idx:start_idx+MEASUREMENT_BYTES], 16)
-                        ref_meas.append(this_ref)
-                    except Exception as e:
-                        ref_meas.append(None)
-                        self._encoding_errors.append({PhsenParserDataParticleKey.REFERENCE_LIGHT_MEASUREMENTS: \
-                                                      "Error encoding %d: %s" % (i, e)})
-                else:
-                    # don't send an exception if a non ascii hex char is in this value
-                    ref_meas.append(None)
-    
-            light_meas = []
-            n_outer_sets = 23
-            n_inner_sets = 4
-            previous_record_bytes = 68
-            # 23 sets of 4 light measurements
-            for i in range(0, n_outer_sets):
-                for s in range(0,n_inner_sets):
-                    start_idx = previous_record_bytes + i*n_inner_sets*MEASUREMENT_BYTES + s*MEASUREMENT_BYTES
-                    # confirm this contains only ascii hex chars
-                    if HEX_INT_MATCHER.match(self._data_match.group(4)[start_idx:start_idx+MEASUREMENT_BYTES]):
-                        try:
-                            this_meas = int(self._data_match.group(4)[start_idx:start_idx+MEASUREMENT_BYTES], 16)
-                            light_meas.append(this_meas)
-                        except Exception as e:
-                            light_meas.append(None)
-                            self._encoding_errors.append({PhsenParserDataParticleKey.LIGHT_MEASUREMENTS: \
-                                                          "Error encoding (%d,%d): %s" % (i, s, e)})
-                    else:
-                        # don't send an exception if a non ascii hex char is in this value
-                        light_meas.append(None)
-    
-            # calculate the checksum and compare with the received checksum
-            passed_checksum = True
-            try: 
-                chksum = int(self._data_match.group(0)[-3:-1], 16)
-                sum_bytes = 0
-                for i in range(7, 467, 2):
-                    sum_bytes += int(self._data_match.group(0)[i:i+2], 16)
-                calc_chksum = sum_bytes & 255
-                if calc_chksum != chksum:
-                    passed_checksum = False
-                    log.debug('Calculated internal checksum %d does not match received %d', calc_chksum, chksum)
-            except Exception as e:
-                log.debug('Error calculating checksums: %s, setting passed checksum to False', e)
-                passed_checksum = False
+            # decode everything covered by the checksum at once, which includes the measurements
+            (decoded, passed_checksum) = verify_hex_checksum(self._data_match.group(0),
+                                                             DATA_CHECKSUM_START, DATA_CHECKSUM_END)
+            if decoded is not None:
+                # 4 sets of 4 reference light measurements (16 total), then 23 sets of 4 light measurements
+                measurements = struct.unpack_from('>%dH' % (N_REFERENCE_MEASUREMENTS + N_LIGHT_MEASUREMENTS),
+                                                  decoded, DATA_MEASUREMENT_OFFSET)
+                ref_meas = list(measurements[:N_REFERENCE_MEASUREMENTS])
+                light_meas = list(measurements[N_REFERENCE_MEASUREMENTS:])
+            else:
+                # non hex characters outside the measurements fall back to decoding just the measurements,
+                # don't send an exception if a non ascii hex char is in a value, set it to None
+                ref_end = MEASUREMENT_BYTES * (1 + N_REFERENCE_MEASUREMENTS)
+                light_end = ref_end + MEASUREMENT_BYTES * N_LIGHT_MEASUREMENTS
+                ref_meas = decode_hex_words(self._data_match.group(4)[MEASUREMENT_BYTES:ref_end])
+                light_meas = decode_hex_words(self._data_match.group(4)[ref_end:light_end])
 
             result = [self._encode_value(PhsenParserDataParticleKey.CONTROLLER_TIMESTAMP, self.raw_data[:8],
                                          PhsenParserDataParticle.encode_int_16),
@@ -288,21 +328,8 @@ class PhsenControlDataParticle(DataParticle):
                                                      control_id, NORMAL_CONTROL_LEN)
 
             # calculate the checksum and compare with the received checksum
-            passed_checksum = True
-            try: 
-                chksum = int(self._data_match.group(0)[-3:-1], 16)
-                sum_bytes = 0
-                # subtract the 3 bytes for the '*' and unique ID, 2 for the checksum, and 1 for the last \r
-                control_len = len(self._data_match.group(0)) - 6
-                for i in range(3, control_len, 2):
-                    sum_bytes += int(self._data_match.group(0)[i:i+2], 16)
-                calc_chksum = sum_bytes & 255
-                if calc_chksum != chksum:
-                    passed_checksum = False
-                    log.debug('Calculated internal checksum %d does not match received %d', calc_chksum, chksum)
-            except Exception as e:
-                log.debug('Error calculating checksums: %s, setting passed checksum to False', e)
-                passed_checksum = False
+            (decoded, passed_checksum) = verify_hex_checksum(self._data_match.group(0),
+                                                             CONTROL_CHECKSUM_START, CONTROL_CHECKSUM_END)
 
             # turn the flag value from a hex-ascii value into a string of binary values
             try:
@@ -470,8 +497,8 @@ class PhsenParser(SioMuleParser):
                 last_index = index
                 chunk_len = len(chunk)
                 while index < chunk_len:
-                    data_match = DATA_MATCHER.match(chunk[index:])
-                    control_match = CONTROL_MATCHER.match(chunk[index:])
+                    data_match = DATA_MATCHER.match(chunk, index)
+                    control_match = CONTROL_MATCHER.match(chunk, index)
                     # check for any valid match and make sure no extra data was found between valid matches
                     if data_match or control_match or chunk[index] == SIO_END:
                         # if the indices don't match we have data that doesn't match
@@ -515,7 +542,7 @@ class PhsenParser(SioMuleParser):
                         break;
                     else:
                         # we found extra data, warn on chunks of extra data not each byte
-                        index += 1
+                        index = next_sync(chunk, RECORD_SYNC, index)
 
             self._chunk_sample_count.append(sample_count)
 
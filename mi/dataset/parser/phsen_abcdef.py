@@ -176,25 +176,17 @@ class PhsenRecoveredInstrumentDataParticle(DataParticle):
         field += 1
         starting_thermistor = self.raw_data[field]
 
-        # Create array for reference and light measurements.
-        # noinspection PyUnusedLocal
-        reference_measurements = [0 for x in range(PH_REFERENCE_MEASUREMENTS)]
-        for record_set in range(0, PH_REFERENCE_MEASUREMENTS):
-
-            field += 1
-            # We cast to int here as _encode_value does not cast elements in the list
-            reference_measurements[record_set] = int(self.raw_data[field], 10)
-
-        # noinspection PyUnusedLocal
-        light_measurements = [0 for x in range(PH_LIGHT_MEASUREMENTS)]
-        for record_set in range(0, PH_LIGHT_MEASUREMENTS):
+        # Convert the reference and light measurements a list at a time.
+        # We cast to int here as _encode_value does not cast elements in the list
+        field += 1
+        reference_measurements = map(int, self.raw_data[field:field + PH_REFERENCE_MEASUREMENTS])
+        field += PH_REFERENCE_MEASUREMENTS
 
-            field += 1
-            # We cast to int here as _encode_value does not cast elements in the list
-            light_measurements[record_set] = int(self.raw_data[field], 10)
+        light_measurements = map(int, self.raw_data[field:field + PH_LIGHT_MEASUREMENTS])
+        field += PH_LIGHT_MEASUREMENTS
 
         # Skip unused
-        field += 2
+        field += 1
 
         battery_voltage = self.raw_data[field]
 
@@ -20,8 +20,9 @@ import time
 import ntplib
 
 from mi.core.common import BaseEnum
+from mi.core.checksum import CRC16_X25
 from mi.core.log import get_logger; log = get_logger()
-from mi.core.exceptions import DatasetParserException
+from mi.core.exceptions import DatasetParserException, NotImplementedException
 from mi.dataset.dataset_parser import BufferLoadingParser
 
 # SIO Main controller header (ascii) and data (binary):
@@ -131,33 +132,9 @@ class SioParser(BufferLoadingParser):
     def calc_checksum(self, data):
         """
         Calculate SIO header checksum of data
+        @retval the CRC-16/X.25 of the data as 4 upper case hex digits
         """
-        crc = 65535
-        if len(data) == 0:
-            return '0000'
-        for iData in range(0, len(data)):
-            short = struct.unpack('H', data[iData] + '\x00')
-            point = 255 & short[0]
-            crc = crc ^ point
-            for i in range(7, -1, -1):
-                if crc & 1:
-                    crc = (crc >> 1) ^ 33800
-                else:
-                    crc >>= 1
-        crc = ~crc
-        # convert to unsigned
-        if crc < 0:
-            crc += 65536
-        # get rid of the '0x' from the hex string
-        crc = "%s" % hex(crc)[2:].upper()
-        # make sure we have the right format for comparing, must be 4 hex digits
-        if len(crc) == 3:
-            crc = '0' + crc
-        elif len(crc) == 2:
-            crc = '00' + crc
-        elif len(crc) == 1:
-            crc = '000' + crc
-        return crc
+        return '%04X' % CRC16_X25.calculate(data)
 
     def _combine_adjacent_packets(self, packets):
         """
@@ -523,6 +500,12 @@ class SioParser(BufferLoadingParser):
 
         return return_list
 
+    def iter_records(self):
+        """
+        Records are counted in the state as they are yanked, so this parser only supports get_records
+        """
+        raise NotImplementedException("iter_records() not supported!")
+
     def _yank_particles(self, num_to_fetch):
         """
         Get particles out of the buffer and publish them. Update the state
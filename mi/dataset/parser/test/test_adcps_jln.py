@@ -11,6 +11,7 @@ this code verifies select items in the parsed data particle
 """
 
 from nose.plugins.attrib import attr
+from mock import patch
 import yaml
 import numpy
 import os
@@ -19,7 +20,9 @@ from mi.core.log import get_logger; log = get_logger()
 from mi.idk.config import Config
 from mi.dataset.test.test_parser import ParserUnitTestCase
 from mi.dataset.dataset_driver import DataSetDriverConfigKeys
-from mi.dataset.parser.adcp_pd0 import AdcpPd0Parser, StateKey
+from mi.dataset.parser import adcp_pd0
+from mi.dataset.parser.adcp_pd0 import AdcpPd0Parser, StateKey, ParserConfigKey
+from mi.dataset.parser.adcp_pd0 import find_ensembles, read_ensemble_index
 
 RESOURCE_PATH = os.path.join(Config().base_dir(), 'mi', 'dataset',
                              'driver', 'adcps_jln', 'stc', 'resource')
@@ -382,6 +385,56 @@ class AdcpsJlnParserUnitTestCase(ParserUnitTestCase):
 
         fid.close()
 
+    def test_ensemble_index(self):
+        """
+        Test the positions of the ensembles are recorded when configured, match a scan of the file,
+        and can be used to resume parsing at an ensemble
+        """
+        #ADCP_CCE1T_20.000 has 20 records in it, each 1254 bytes long
+        fid = open(os.path.join(RESOURCE_PATH, 'ADCP_CCE1T_20.000'), 'rb')
+        expected = [1254 * i for i in range(20)]
+
+        self.config[ParserConfigKey.INDEX_ENSEMBLES] = True
+        self.parser = AdcpPd0Parser(self.config, self.start_state, fid,
+                                    self.state_callback, self.pub_callback, self.exception_callback)
+        self.parser.get_records(20)
+        self.assertEqual(self.parser.ensemble_index, expected)
+
+        fid.seek(0)
+        self.assertEqual(read_ensemble_index(fid), expected)
+        # scan in blocks smaller than an ensemble
+        fid.seek(0)
+        with patch.object(adcp_pd0, 'MAX_BLOCK_SIZE', 1000):
+            self.assertEqual(read_ensemble_index(fid), expected)
+
+        #ensemble 6 is the 6th ensemble in the file
+        self.parser = AdcpPd0Parser(self.config, {StateKey.POSITION: expected[5]}, fid,
+                                    self.state_callback, self.pub_callback, self.exception_callback)
+        particles = self.parser.get_records(1)
+        self.assert_result(self.test04, particles[0])
+        self.assertEqual(self.parser.ensemble_index[0], expected[5])
+
+        fid.close()
+
+    def test_find_ensembles(self):
+        """
+        Test ensembles are found by their length fields, and the search resumes after data that
+        is not a valid ensemble
+        """
+        fid = open(os.path.join(RESOURCE_PATH, 'ADCP_CCE1T_20.000'), 'rb')
+        ensemble = fid.read(1254)
+        fid.close()
+
+        self.assertEqual(find_ensembles(ensemble * 3), [(0, 1254), (1254, 2508), (2508, 3762)])
+
+        # a stray header byte right before an ensemble, a bad checksum, junk and a partial ensemble
+        bad_checksum = ensemble[:-1] + chr((ord(ensemble[-1]) + 1) % 256)
+        data = '\x7f' + ensemble + bad_checksum + 'junk\x7f\x7f\xff\xff' + ensemble + ensemble[:600]
+        self.assertEqual(find_ensembles(data), [(1, 1255), (2517, 3771)])
+
+        self.assertEqual(find_ensembles(''), [])
+        self.assertEqual(find_ensembles(ensemble[:-1]), [])
+
     def test_bad_data(self):
         """
         Ensure that bad data is skipped when it exists.
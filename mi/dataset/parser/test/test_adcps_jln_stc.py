@@ -408,6 +408,23 @@ class AdcpsJlnStcParserUnitTestCase(ParserUnitTestCase):
         self.assert_(isinstance(self.publish_callback_value, list))
         self.assertEqual(self.publish_callback_value[0], self.particle_e)
 
+    def test_noisy_sieve(self):
+        """
+        Ensure the sieve finds the same records when they follow a long stretch of noise,
+        including near misses of the record start
+        """
+        with open(os.path.join(RESOURCE_PATH, 'adcpt_20130929_091817.DAT')) as data_file:
+            data = data_file.read()
+        self.parser = AdcpsJlnStcParser(self.config, self.start_state, StringIO(data),
+                                        self.state_callback, self.pub_callback, self.exception_callback)
+        expected = self.parser.sieve_function(data)
+        self.assertEqual(len(expected), 5)
+
+        noise = ('Record[x]:' + '\xff' * 20) * 5000
+        offset = len(noise)
+        self.assertEqual(self.parser.sieve_function(noise + data),
+                         [(start + offset, end + offset) for (start, end) in expected])
+
     def test_get_many(self):
         """
         Read test data and pull out multiple data particles at one time.
@@ -10,6 +10,7 @@
 from StringIO import StringIO
 
 import numpy as np
+from math import copysign, isnan
 import ntplib
 
 from mi.core.log import get_logger
@@ -21,6 +22,7 @@ from mi.core.exceptions import SampleException
 from mi.dataset.test.test_parser import ParserUnitTestCase
 from mi.dataset.dataset_driver import DataSetDriverConfigKeys
 from mi.dataset.parser.glider import GliderParser, GliderEngineeringParser, StateKey
+from mi.dataset.parser.glider import GliderRow, GliderColumnIndex, LATLON_MATCHER, ddmm_to_ddegrees
 from mi.dataset.parser.glider import CtdgvRecoveredDataParticle, CtdgvTelemeteredDataParticle, CtdgvParticleKey
 from mi.dataset.parser.glider import DostaTelemeteredDataParticle, DostaTelemeteredParticleKey
 from mi.dataset.parser.glider import DostaRecoveredDataParticle, DostaRecoveredParticleKey
@@ -398,6 +400,69 @@ class CTDGV_Telemetered_GliderTest(GliderParserUnitTestCase):
         records = self.parser.get_records(1)
         self.assertEqual(len(records), 0)
 
+    def test_ddegrees(self):
+        """
+        Verify lat/lon strings are converted the same as by matching the DDMM.MMMM regex, and
+        columns of values are converted to nearly the same decimal degrees
+        """
+        self.set_data(HEADER, CTDGV_RECORD)
+        self.reset_parser()
+        values = ['4214.5510', '-4214.5510', '-7040.3990', '12345.678', '4214', '12', '5', '0.5',
+                  '-0012.5', '-12.5', '00.0', '-1.25']
+        for value in values:
+            padded = value if '.' in value else value + '.0'
+            padded = '0' * (4 - len(padded.split('.')[0])) + padded
+            match = LATLON_MATCHER.match(padded)
+            if match:
+                degrees = float(match.group(1))
+                expected = copysign(abs(degrees) + float(match.group(2)) / 60., degrees)
+                self.assertEqual(self.parser._string_to_ddegrees(value), expected)
+
+        # negative values with less than two digits of degrees don't match the regex
+        self.assertAlmostEqual(self.parser._string_to_ddegrees('-12.5'), -12.5 / 60.)
+        self.assertAlmostEqual(self.parser._string_to_ddegrees('-1.25'), -1.25 / 60.)
+        self.assertTrue(isnan(self.parser._string_to_ddegrees('NaN')))
+        self.assertEqual(self.error_callback_values, [])
+
+        self.assertIsNone(self.parser._string_to_ddegrees('4214.'))
+        self.assertEqual(len(self.error_callback_values), 1)
+
+        converted = ddmm_to_ddegrees([float(value) for value in values] + [float('nan')])
+        for (value, ddegrees) in zip(values, converted):
+            self.assertAlmostEqual(ddegrees, self.parser._string_to_ddegrees(value))
+        self.assertTrue(np.isnan(converted[-1]))
+
+    def test_column_projection(self):
+        """
+        Verify only the columns in the particle and the timestamp are converted, so values that
+        can't be converted in other columns are ignored
+        """
+        # m_battpos and m_gps_lat are not in the particle
+        record = CTDGV_RECORD.strip().split('\n')[0].split()
+        record[3] = 'bad'
+        record[8] = 'bad'
+        self.set_data(HEADER, '\n' + ' '.join(record) + '\n')
+        self.reset_parser()
+
+        data_dict = self.parser._read_data(' '.join(record))
+        self.assertEqual(sorted(data_dict.keys()),
+                         sorted(['m_present_time', 'm_present_secs_into_mission', 'sci_m_present_time',
+                                 'sci_m_present_secs_into_mission', 'sci_water_cond', 'sci_water_pressure',
+                                 'sci_water_temp']))
+        self.assertEqual(data_dict['sci_water_temp']['Data'], 15.3683)
+        self.assertEqual(data_dict['m_present_secs_into_mission']['Data'], 121147)
+
+        self.assert_generate_particle(CtdgvTelemeteredDataParticle,
+                                      {CtdgvParticleKey.SCI_WATER_TEMP: 15.3683, CtdgvParticleKey.SCI_WATER_COND: 4.03096,
+                                       CtdgvParticleKey.SCI_WATER_PRESSURE: 0.021})
+        self.assertEqual(self.error_callback_values, [])
+
+        # without a particle class every column is converted
+        self.set_data(HEADER, CTDGV_RECORD)
+        self.config = {}
+        self.reset_parser()
+        self.assertEqual(len(self.parser._read_data(CTDGV_RECORD.strip().split('\n')[0])), 29)
+
 @attr('UNIT', group='mi')
 class CTDGV_Recovered_GliderTest(GliderParserUnitTestCase):
     """
@@ -815,4 +880,40 @@ class ENGRecoveredGliderTest(GliderParserUnitTestCase):
         self.reset_eng_parser({StateKey.POSITION: 10795, StateKey.SENT_METADATA: True})
         self.assert_generate_particle(EngineeringRecoveredDataParticle, record_2, 10795)
         self.assert_generate_particle(EngineeringScienceRecoveredDataParticle, record_sci_2, 12479)
-        self.assert_no_more_data()
\ No newline at end of file
+        self.assert_no_more_data()
+
+    def test_shared_row(self):
+        """
+        Verify the engineering and science particles from a row are built from the same row, and
+        the NaN mask of the row finds the particles with data
+        """
+        self.set_data(HEADER4, ENGSCI_RECORD)
+        self.reset_eng_parser()
+        particles = self.parser.get_records(5)
+        self.assertEqual([particle.type() for particle in particles],
+                         [EngineeringMetadataRecoveredDataParticle.type(), EngineeringRecoveredDataParticle.type(),
+                          EngineeringScienceRecoveredDataParticle.type(), EngineeringRecoveredDataParticle.type(),
+                          EngineeringScienceRecoveredDataParticle.type()])
+        self.assertIsInstance(particles[1].raw_data, GliderRow)
+        self.assertIs(particles[1].raw_data, particles[2].raw_data)
+        self.assertIs(particles[3].raw_data, particles[4].raw_data)
+        self.assertIs(particles[1].raw_data.columns, particles[3].raw_data.columns)
+
+        # science columns all NaN, engineering columns not
+        row = particles[1].raw_data
+        values = list(row.values)
+        for key in EngineeringScienceRecoveredDataParticle.science_parameters:
+            if key in row:
+                values[row.columns.index[key]] = float('nan')
+        nan_row = GliderRow(row.columns, values, np.array([value != value for value in values]))
+        for test_row in [nan_row, GliderRow.from_dict(dict((key, nan_row[key]) for key in nan_row.keys()))]:
+            self.assertTrue(self.parser._contains_eng_data(test_row, EngineeringRecoveredDataParticle))
+            self.assertFalse(self.parser._contains_eng_data(test_row, EngineeringScienceRecoveredDataParticle))
+            self.assertFalse(self.parser._contains_eng_data(test_row, EngineeringMetadataRecoveredDataParticle))
+
+        columns = GliderColumnIndex(['m_present_time', 'sci_m_disk_free', 'x'])
+        parameters = EngineeringScienceRecoveredDataParticle.parameters
+        (found, missing) = columns.project(parameters)
+        self.assertEqual(found, [('sci_m_disk_free', 1)])
+        self.assertEqual(missing, [key for key in parameters if key != 'sci_m_disk_free'])
+        self.assertEqual(list(columns.indexes(parameters)), [1])
@@ -16,7 +16,7 @@ from mi.dataset.parser.sio_mule_common import StateKey
 from mi.dataset.dataset_driver import DataSetDriverConfigKeys
 from mi.core.instrument.data_particle import DataParticleKey
 from mi.dataset.parser.phsen import PhsenParser, PhsenParserDataParticle
-from mi.dataset.parser.phsen import PhsenControlDataParticle
+from mi.dataset.parser.phsen import PhsenControlDataParticle, PhsenParserDataParticleKey
 
 from mi.idk.config import Config
 RESOURCE_PATH = os.path.join(Config().base_dir(), 'mi',
@@ -263,6 +263,42 @@ class PhsenParserUnitTestCase(ParserUnitTestCase):
                             [11451, 11520], [14142,14700]],
                            self.particle_d)
 
+    def test_hex_decoding(self):
+        """
+        Test the measurements and checksum decoded from the whole record match decoding them a field
+        at a time, including records with non hex characters in and outside of the measurements
+        """
+        # a non hex character in the 2nd light measurement
+        bad_light = self.particle_a.raw_data[:100] + 'G' + self.particle_a.raw_data[101:]
+
+        for raw_data in [self.particle_a.raw_data, self.particle_b.raw_data, self.particle_f.raw_data, bad_light]:
+            record = raw_data[8:]
+            expected_meas = []
+            for i in range(108):
+                field = record[23 + i*4:27 + i*4]
+                try:
+                    expected_meas.append(int(field, 16) if len(field.strip('0123456789ABCDEFabcdef')) == 0
+                                         else None)
+                except ValueError:
+                    expected_meas.append(None)
+            try:
+                expected_checksum = sum(int(record[i:i+2], 16) for i in range(7, 467, 2)) & 255 == \
+                                    int(record[-3:-1], 16)
+            except ValueError:
+                expected_checksum = False
+
+            values = dict((value[DataParticleKey.VALUE_ID], value[DataParticleKey.VALUE])
+                          for value in PhsenParserDataParticle(raw_data).generate_dict()[DataParticleKey.VALUES])
+            self.assertEqual(values[PhsenParserDataParticleKey.REFERENCE_LIGHT_MEASUREMENTS], expected_meas[:16])
+            self.assertEqual(values[PhsenParserDataParticleKey.LIGHT_MEASUREMENTS], expected_meas[16:])
+            self.assertEqual(values[PhsenParserDataParticleKey.PASSED_CHECKSUM], expected_checksum)
+
+        values = PhsenParserDataParticle(bad_light).generate_dict()[DataParticleKey.VALUES]
+        light_meas = [value[DataParticleKey.VALUE] for value in values
+                      if value[DataParticleKey.VALUE_ID] == PhsenParserDataParticleKey.LIGHT_MEASUREMENTS][0]
+        self.assertIsNone(light_meas[1])
+        self.assertEqual(light_meas.count(None), 1)
+
     def test_update(self):
         """
         Test a file which has had a section of data replaced by 0s, as if a block of data has not been received yet,
@@ -32,6 +32,7 @@ import struct
 
 from mi.core.log import get_logger; log = get_logger()
 from mi.core.common import BaseEnum
+from mi.core.checksum import nortek_checksum
 from mi.core.instrument.data_particle import DataParticle, DataParticleKey
 from mi.core.exceptions import \
     DatasetParserException, \
@@ -310,26 +311,19 @@ class Vel3dKWfpParser(BufferLoadingParser):
             state, self.sieve_function, state_callback, publish_callback,
             exception_callback)
 
-    def calculate_checksum(self, input_buffer, values):
+    def calculate_checksum(self, input_buffer, values, start=0):
         """
         This function calculates a 16-bit unsigned sum of 16-bit data.
         Parameters:
           input_buffer - Buffer containing the values to be summed
           values - Number of 16-bit values to sum
+          start - Index in the buffer of the first value
         Returns:
           Calculated checksum
         """
 
-        checksum = 0xB58C  # initial value per Nortek's Integrator's Guide
-        index = 0
-        for x in range(0, values):
-            checksum += struct.unpack('<H', input_buffer[index: index + 2])[0]
-            index += 2
-
-        #
-        # Modulo 65535
-        #
-        return checksum & 0xFFFF
+        # starts from 0xB58C per Nortek's Integrator's Guide, modulo 65536
+        return nortek_checksum(input_buffer, start, start + 2 * values)
 
     def calculate_timestamp(self):
         """
@@ -652,19 +646,20 @@ class Vel3dKWfpParser(BufferLoadingParser):
             #
             # See if there's a data header anywhere in the buffer
             # starting from the current search index.
+            # The search is done in place so a miss doesn't copy the buffer.
             #
-            header = DATA_HEADER_MATCHER.search(input_buffer[search_index : ])
+            header = DATA_HEADER_MATCHER.search(input_buffer, search_index)
             if header is not None:
                 #
-                # Calculate at what position in the buffer the header starts.
+                # The position in the buffer the header starts at.
                 #
-                header_index = header.start() + search_index
+                header_index = header.start()
 
                 #
                 # Verify that the header checksum matches.
                 #
                 header_checksum_matches = self.validate_header_checksum(header,
-                    input_buffer[header_index : ], False)
+                    input_buffer, False, header_index)
 
                 if header_checksum_matches:
                     #
@@ -680,9 +675,8 @@ class Vel3dKWfpParser(BufferLoadingParser):
                     #
                     if record_end < len(input_buffer):
                         payload_checksum_matches = self.validate_payload_checksum(
-                            header,
-                            input_buffer[header_index + DATA_HEADER_SIZE : ],
-                            False)
+                            header, input_buffer, False,
+                            header_index + DATA_HEADER_SIZE)
 
                         #
                         # If the payload checksum matches,
@@ -692,7 +686,7 @@ class Vel3dKWfpParser(BufferLoadingParser):
                             indices_list.append((header_index, record_end))
                             search_index = record_end
                         else:
-                            search_index += 1
+                            search_index = header_index + 1
 
                     #
                     # If there aren't enough bytes left in the buffer for the
@@ -703,10 +697,10 @@ class Vel3dKWfpParser(BufferLoadingParser):
 
                 #
                 # If the header checksum test fails, do another match
-                # starting at the next byte in the input buffer.
+                # starting at the byte after this header.
                 #
                 else:
-                    search_index += 1
+                    search_index = header_index + 1
 
             #
             # If there were no data headers in this buffer,
@@ -729,13 +723,14 @@ class Vel3dKWfpParser(BufferLoadingParser):
 
         return indices_list
 
-    def validate_header_checksum(self, header, input_buffer, stop_on_error):
+    def validate_header_checksum(self, header, input_buffer, stop_on_error, start=0):
         """
         This function verifies that the header checksum is correct.
         Parameters:
           header - the fields from the header (extracted via pattern match)
-          input_buffer - starting from the header
+          input_buffer - containing the header
           stop_on_error - Stop (True) or Continue (False) if error detected
+          start - Index in the buffer where the header starts
         Returns:
           checksum matches (True) or doesn't match (False)
         """
@@ -744,7 +739,7 @@ class Vel3dKWfpParser(BufferLoadingParser):
             header.group(GROUP_HEADER_CHECKSUM))[0]
 
         actual_checksum = self.calculate_checksum(input_buffer,
-            DATA_HEADER_CHECKSUM_LENGTH)
+            DATA_HEADER_CHECKSUM_LENGTH, start)
 
         if actual_checksum == expected_checksum:
             checksum_matches = True
@@ -758,13 +753,14 @@ class Vel3dKWfpParser(BufferLoadingParser):
 
         return checksum_matches
 
-    def validate_payload_checksum(self, header, input_buffer, stop_on_error):
+    def validate_payload_checksum(self, header, input_buffer, stop_on_error, start=0):
         """
         This function verifies that the data payload checksum is correct.
         Parameters:
           header - the fields from the header (extracted via pattern match)
-          input_buffer - starting from the payload
+          input_buffer - containing the payload
           stop_on_error - Stop (True) or Continue (False) if error detected
+          start - Index in the buffer where the payload starts
         Returns:
           checksum matches (True) or doesn't match (False)
         """
@@ -777,7 +773,7 @@ class Vel3dKWfpParser(BufferLoadingParser):
         #
         payload_size = struct.unpack('<H',
             header.group(GROUP_HEADER_DATA_SIZE))[0]
-        actual_checksum = self.calculate_checksum(input_buffer, payload_size / 2)
+        actual_checksum = self.calculate_checksum(input_buffer, payload_size / 2, start)
 
         if actual_checksum == expected_checksum:
             checksum_matches = True
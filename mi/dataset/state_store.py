@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+
+"""
+@package mi.dataset.state_store Local store for data set driver state
+@file mi/dataset/state_store.py
+@brief Keeps data set driver state in a local sqlite database, one row per file
+
+The driver state is a nested dict with an entry for every file a driver has
+ever seen.  Rather than serializing all of it each time it is saved, the
+store keeps a row for each file, indexed by data key and ingested flag.
+apply_delta writes only the rows of the file states a driver checkpoint
+changed, so a checkpoint costs the same however many files the driver has
+seen.  save_state takes a whole driver state and writes the rows that differ
+from what was last written, or only the rows named by its paths argument.
+
+File states are stored pickled, so parser states come back exactly as they
+were saved, with tuples, integer dict keys and floats unchanged.
+
+load() only reads the rows of files that are still being ingested.  Files
+that have been ingested are only compared against the directory by the
+harvester, so the state load() returns looks each one up by its primary key
+the first time it is asked for, and rebuilds it from its size, modification
+date, checksum and modified state columns without decoding its parser state.
+Starting a driver costs the same however many files it has ingested.
+
+To tell which rows changed, the store keeps a digest of each row it has
+loaded or written rather than a copy of it.
+
+Data set drivers use a store when their config has a state_store entry with
+the path of the database, see SimpleDataSetDriver.  It can also be used
+directly:
+
+store = SqliteStateStore('/tmp/dsatest_state.db')
+driver = MyDataSetDriver(config, store.load(), data_callback, store.save_state,
+                         event_callback, exception_callback)
+driver.set_state_delta_callback(store.apply_delta)
+"""
+
+__license__ = 'Apache 2.0'
+
+import sqlite3
+import hashlib
+import cPickle as pickle
+from threading import Lock
+
+from mi.core.log import get_logger ; log = get_logger()
+from mi.dataset.dataset_driver import DriverStateKey
+
+# data key of the files of drivers with a single harvester
+NO_DATA_KEY = ''
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS file_state (
+        data_key TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        ingested INTEGER NOT NULL,
+        file_size INTEGER,
+        file_mod_date REAL,
+        file_checksum TEXT,
+        modified_state BLOB,
+        state BLOB NOT NULL,
+        PRIMARY KEY (data_key, file_name))""",
+    """CREATE INDEX IF NOT EXISTS file_state_ingested ON file_state (data_key, ingested)""",
+    """CREATE TABLE IF NOT EXISTS driver_value (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL)""",
+]
+
+UPSERT_FILE = """INSERT OR REPLACE INTO file_state
+    (data_key, file_name, ingested, file_size, file_mod_date, file_checksum, modified_state, state)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+
+UPSERT_VALUE = """INSERT OR REPLACE INTO driver_value (key, value) VALUES (?, ?)"""
+
+def _dumps(value):
+    """
+    Pickle a value for a BLOB column
+    """
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+def _loads(blob):
+    """
+    Unpickle a value read from a BLOB column
+    """
+    return pickle.loads(str(blob))
+
+def _digest(serialized):
+    """
+    Digest of a serialized row, to tell if it has changed
+    """
+    return hashlib.md5(serialized).digest()
+
+class StoredFileStates(dict):
+    """
+    The file states of one harvester loaded from a store.  It holds the files still being ingested,
+    and the states of ingested files are looked up in the store the first time they are asked for.
+    Iterating, copying or pickling only covers the files held.
+    """
+    def __init__(self, store, data_key):
+        super(StoredFileStates, self).__init__()
+        self._store = store
+        self._data_key = data_key
+
+    def __missing__(self, file_name):
+        file_state = self._store._stored_file_state(file_name, self._data_key)
+        if file_state is None:
+            raise KeyError(file_name)
+        self[file_name] = file_state
+        return file_state
+
+    def __contains__(self, file_name):
+        return self.get(file_name) is not None
+
+    def has_key(self, file_name):
+        return file_name in self
+
+    def get(self, file_name, default=None):
+        try:
+            return self[file_name]
+        except KeyError:
+            return default
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+class SqliteStateStore(object):
+    """
+    Driver state store backed by a sqlite database.  save_state can be used as the driver's state
+    callback, and apply_delta as its state delta callback.
+    """
+    def __init__(self, path, data_keys=None):
+        """
+        @param path path of the database file, created if it does not exist
+        @param data_keys data keys of a multiple harvester driver, whose state has a dict of files for
+        each data key.  None for drivers with a single harvester.
+        """
+        self._data_keys = set(data_keys or [])
+        self._lock = Lock()
+        # the driver calls back from the harvester thread as well as the publisher
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            for statement in SCHEMA:
+                self._connection.execute(statement)
+        # digest of each row as last loaded or written, (data key, file name) : digest, and key : digest
+        # for values
+        self._written = {}
+        self._written_values = {}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def is_empty(self):
+        """
+        @retval True if nothing has been saved in the store
+        """
+        with self._lock:
+            return self._connection.execute("SELECT 1 FROM file_state LIMIT 1").fetchone() is None and \
+                self._connection.execute("SELECT 1 FROM driver_value LIMIT 1").fetchone() is None
+
+    def load(self):
+        """
+        Build the driver state to pass to the driver as its memento.  It holds the files still being
+        ingested, ingested files are looked up in the store when they are asked for.
+        @retval driver state dict
+        """
+        if self._data_keys:
+            state = {}
+            for key in self._data_keys:
+                state[key] = StoredFileStates(self, key)
+        else:
+            state = StoredFileStates(self, NO_DATA_KEY)
+
+        with self._lock:
+            for (key, value) in self._connection.execute("SELECT key, value FROM driver_value"):
+                self._written_values[key] = _digest(str(value))
+                state[key] = _loads(value)
+
+            count = 0
+            for data_key in self._data_keys or [NO_DATA_KEY]:
+                files = state if data_key == NO_DATA_KEY else state[data_key]
+                rows = self._connection.execute(
+                    "SELECT file_name, state FROM file_state WHERE data_key = ? AND ingested = 0", (data_key,))
+                for (file_name, file_state) in rows:
+                    self._written[(data_key, file_name)] = _digest(str(file_state))
+                    files[file_name] = _loads(file_state)
+                    count += 1
+
+        log.debug("loaded state for %d files being ingested", count)
+        return state
+
+    def _stored_file_state(self, file_name, data_key=NO_DATA_KEY):
+        """
+        Look up a file for the state returned by load(), without the parser state if it has been ingested
+        @param file_name name of the file
+        @param data_key data key of the file's harvester
+        @retval file state dict, or None if the file is not in the store
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT ingested, file_size, file_mod_date, file_checksum, modified_state, "
+                "CASE WHEN ingested THEN NULL ELSE state END FROM file_state WHERE data_key = ? AND file_name = ?",
+                (data_key, file_name)).fetchone()
+        if row is None:
+            return None
+        (ingested, size, mod_date, checksum, modified, file_state) = row
+        if not ingested:
+            return _loads(file_state)
+        file_state = {
+            DriverStateKey.INGESTED: True,
+            DriverStateKey.FILE_SIZE: size,
+            DriverStateKey.FILE_MOD_DATE: mod_date,
+            DriverStateKey.FILE_CHECKSUM: checksum
+        }
+        if modified is not None:
+            file_state[DriverStateKey.MODIFIED_STATE] = _loads(modified)
+        return file_state
+
+    def file_state(self, file_name, data_key=NO_DATA_KEY):
+        """
+        Look up the full state of a single file, including the parser state of ingested files
+        @param file_name name of the file
+        @param data_key data key of the file's harvester
+        @retval file state dict, or None if the file is not in the store
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT state FROM file_state WHERE data_key = ? AND file_name = ?",
+                                           (data_key, file_name)).fetchone()
+        if row is None:
+            return None
+        return _loads(row[0])
+
+    def pending_files(self, data_key=NO_DATA_KEY):
+        """
+        @param data_key data key of the harvester
+        @retval names of the files that have been found but not ingested
+        """
+        with self._lock:
+            rows = self._connection.execute("SELECT file_name FROM file_state WHERE data_key = ? AND ingested = 0",
+                                            (data_key,))
+            return [row[0] for row in rows]
+
+    def save_state(self, state, paths=None):
+        """
+        Driver state callback, writes the rows of the files whose state changed since they were last written.
+        Without paths every file state is compared to what was last written, so pass the paths of the
+        changed files, or use apply_delta, when they are known.
+        @param state the whole driver state
+        @param paths key paths in state of the file states to write, (file name,) or (data key, file name),
+        None to check them all and write the other driver values
+        """
+        if paths is not None:
+            delta = []
+            for path in paths:
+                node = state
+                for key in path:
+                    node = node[key]
+                delta.append((path, node))
+            self._write(delta, [])
+            return
+
+        files = []
+        values = []
+        for (key, value) in state.iteritems():
+            if key in self._data_keys:
+                for (file_name, file_state) in value.iteritems():
+                    files.append(((key, file_name), file_state))
+            elif not self._data_keys and isinstance(value, dict):
+                files.append(((key,), value))
+            else:
+                values.append((key, value))
+        self._write(files, values)
+
+    def apply_delta(self, delta):
+        """
+        Driver state delta callback, writes the rows of the files in the delta
+        @param delta list of (key path, file state) pairs
+        """
+        self._write(delta, [])
+
+    def _write(self, files, values):
+        """
+        Write rows for file states and driver values in one transaction
+        @param files list of (key path, file state) pairs
+        @param values list of (key, value) pairs for anything in the driver state other than file states
+        """
+        with self._lock:
+            updates = []
+            for (path, file_state) in files:
+                if len(path) == 1:
+                    row_key = (NO_DATA_KEY, path[0])
+                else:
+                    row_key = (path[0], path[1])
+                serialized = _dumps(file_state)
+                digest = _digest(serialized)
+                if self._written.get(row_key) == digest:
+                    continue
+                self._written[row_key] = digest
+
+                if DriverStateKey.PARSER_STATE not in file_state:
+                    # ingested files are loaded without their parser state, keep the stored one
+                    row = self._connection.execute("SELECT state FROM file_state WHERE data_key = ? AND file_name = ?",
+                                                   row_key).fetchone()
+                    if row is not None:
+                        stored = _loads(row[0])
+                        stored.update(file_state)
+                        serialized = _dumps(stored)
+
+                modified = file_state.get(DriverStateKey.MODIFIED_STATE)
+                if modified is not None:
+                    modified = sqlite3.Binary(_dumps(modified))
+                updates.append(row_key + (bool(file_state.get(DriverStateKey.INGESTED)),
+                                          file_state.get(DriverStateKey.FILE_SIZE),
+                                          file_state.get(DriverStateKey.FILE_MOD_DATE),
+                                          file_state.get(DriverStateKey.FILE_CHECKSUM),
+                                          modified, sqlite3.Binary(serialized)))
+
+            value_updates = []
+            for (key, value) in values:
+                serialized = _dumps(value)
+                digest = _digest(serialized)
+                if self._written_values.get(key) != digest:
+                    self._written_values[key] = digest
+                    value_updates.append((key, sqlite3.Binary(serialized)))
+
+            with self._connection:
+                self._connection.executemany(UPSERT_FILE, updates)
+                self._connection.executemany(UPSERT_VALUE, value_updates)
+        log.trace("wrote %d file states", len(updates))
@@ -7,11 +7,160 @@
 @brief Test code for the dataset driver base classes
 """
 
+import os
+import re
+import copy
+import cPickle as pickle
+import shutil
+import tempfile
+from functools import partial
+
+from mock import patch
 from nose.plugins.attrib import attr
 
 from mi.core.unit_test import MiUnitTestCase
+from mi.idk.config import Config
 from mi.core.exceptions import DataSourceLocationException
+from mi.core.exceptions import NotImplementedException
+from mi.core.exceptions import RecoverableSampleException
+from mi.core.instrument.chunker import StringChunker
 from mi.dataset.dataset_driver import DataSourceLocation
+from mi.dataset.dataset_driver import SimpleDataSetDriver
+from mi.dataset.dataset_driver import DriverStateKey
+from mi.dataset.dataset_driver import DataSourceConfigKey
+from mi.dataset.dataset_driver import DataSetDriverConfigKeys
+from mi.dataset.dataset_driver import DriverParameter
+from mi.dataset.dataset_driver import apply_state_delta
+from mi.dataset.state_store import SqliteStateStore
+from mi.dataset.driver.cg_stc_eng.stc.driver import CgStcEngStcDataSetDriver, DataTypeKey
+from mi.dataset.parser.mopak_o_dcl import MopakODclAccelParserRecoveredDataParticle
+from mi.dataset import dataset_parser
+from mi.dataset.dataset_parser import BufferLoadingParser
+
+LINE_MATCHER = re.compile(r'[^\n]*\n')
+
+CG_STC_ENG_RESOURCE_PATH = os.path.join(Config().base_dir(), 'mi', 'dataset', 'driver', 'cg_stc_eng', 'stc',
+                                        'resource')
+
+class LineParser(BufferLoadingParser):
+    """
+    Publishes each complete line of a file, leaving partial lines for later
+    """
+    append_safe = True
+
+    def __init__(self, state, stream_handle, state_callback, publish_callback, exception_callback=None):
+        super(LineParser, self).__init__({}, stream_handle, state,
+                                         partial(StringChunker.regex_sieve_function, regex_list=[LINE_MATCHER]),
+                                         state_callback, publish_callback, exception_callback)
+        self._read_state = {'position': 0}
+        if state:
+            self.set_state(state)
+
+    def set_state(self, state_obj):
+        self._read_state = state_obj
+        self._stream_handle.seek(state_obj['position'])
+
+    def parse_chunks(self):
+        result = []
+        (timestamp, chunk) = self._chunker.get_next_data()
+        while chunk is not None:
+            self._read_state['position'] += len(chunk)
+            result.append((chunk, copy.copy(self._read_state)))
+            (timestamp, chunk) = self._chunker.get_next_data()
+        return result
+
+    def _process_end_of_file(self):
+        # a partial line at the end is finished by the next append
+        pass
+
+class UnsafeLineParser(LineParser):
+    append_safe = False
+
+class LocalLine(str):
+    """
+    A line that can only be published in the driver process
+    """
+    def __reduce__(self):
+        raise pickle.PicklingError('%r can not be pickled' % self)
+
+class CheckedLineParser(LineParser):
+    """
+    Reports lines starting with 'bad' to the exception callback, raises an IOError at a line 'ioerror' and
+    publishes lines starting with 'local' as LocalLines
+    """
+    def parse_chunks(self):
+        result = []
+        for (chunk, state) in super(CheckedLineParser, self).parse_chunks():
+            if chunk.startswith('bad'):
+                self._exception_callback(RecoverableSampleException('bad line %r' % chunk))
+                continue
+            if chunk == 'ioerror\n':
+                raise IOError('unable to read line')
+            if chunk.startswith('local'):
+                chunk = LocalLine(chunk)
+            result.append((chunk, state))
+        return result
+
+class LineDataSetDriver(SimpleDataSetDriver):
+    parser_class = LineParser
+
+    def _build_parser(self, parser_state, infile):
+        self.parser_inputs.append(infile)
+        return self.parser_class(parser_state, infile, self._save_parser_state, self._data_callback,
+                                 self._sample_exception_callback)
+
+class DataFileTestCase(MiUnitTestCase):
+    """
+    Base for tests parsing data files in a temporary directory, collecting what drivers publish
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'node59p1.dat')
+        self.published = []
+        # (number of particles published, copy of the state) for each state callback
+        self.states = []
+        self.events = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, data, file_name='node59p1.dat'):
+        with open(os.path.join(self.directory, file_name), 'wb') as filehandle:
+            filehandle.write(data)
+
+    def append(self, data):
+        with open(self.path, 'ab') as filehandle:
+            filehandle.write(data)
+
+    def save_state(self, state):
+        self.states.append((len(self.published), copy.deepcopy(state)))
+
+    def build_config(self, harvester_config=None, driver_config=None):
+        """
+        Build a driver config harvesting *.dat files from the temporary directory
+        @param harvester_config harvester config to add
+        @param driver_config driver parameters
+        """
+        config = {
+            DataSourceConfigKey.HARVESTER: {
+                DataSetDriverConfigKeys.DIRECTORY: self.directory,
+                DataSetDriverConfigKeys.PATTERN: '*.dat'
+            },
+            DataSourceConfigKey.PARSER: {},
+            DataSourceConfigKey.DRIVER: driver_config or {}
+        }
+        config[DataSourceConfigKey.HARVESTER].update(harvester_config or {})
+        return config
+
+    def new_driver(self, config, memento=None, parser_class=LineParser, data_callback=None):
+        """
+        Build a line driver publishing to the test's particles, states and events
+        """
+        driver = LineDataSetDriver(config, memento, data_callback or self.published.extend, self.save_state,
+                                   lambda **kwargs: self.events.append(kwargs), self.fail)
+        driver.parser_class = parser_class
+        driver.parser_inputs = []
+        return driver
 
 @attr('UNIT', group='mi')
 class DataSourceLocationUnitTestCase(MiUnitTestCase):
@@ -55,6 +204,585 @@ class DataSourceLocationUnitTestCase(MiUnitTestCase):
         dsl = DataSourceLocation(parser_position=parser_pos1)
         self.assertEqual(dsl.harvester_position, None)
         self.assertEqual(dsl.parser_position, parser_pos1)
-        
-        
-                
\ No newline at end of file
+
+
+@attr('UNIT', group='mi')
+class TailModeUnitTestCase(DataFileTestCase):
+    """
+    Test parsing appended data in tail mode
+    """
+    @property
+    def state(self):
+        return copy.deepcopy(self.states[-1][1])
+
+    def build_driver(self, parser_class=LineParser, tail_mode=True, memento=None):
+        config = self.build_config({DataSetDriverConfigKeys.TAIL_MODE: tail_mode})
+        return self.new_driver(config, memento, parser_class)
+
+    def test_tail(self):
+        """
+        Test each parse only reads the data appended since the last published record
+        """
+        driver = self.build_driver()
+        self.append('a\nb\n')
+        driver._new_file_callback('node59p1.dat')
+        driver._got_file('node59p1.dat')
+        self.assertEqual(self.published, ['a\n', 'b\n'])
+        self.assertEqual(self.state['node59p1.dat'][DriverStateKey.TAIL_OFFSET], 4)
+
+        self.append('c\nd')
+        driver._got_file('node59p1.dat')
+        self.assertEqual(driver.parser_inputs[-1].offset, 4)
+        self.assertEqual(self.published[2:], ['c\n'])
+        self.assertEqual(self.state['node59p1.dat'][DriverStateKey.TAIL_OFFSET], 6)
+
+        # restart from the saved state, the partial line is finished
+        self.append('\ne\n')
+        driver = self.build_driver(memento=self.state)
+        driver._got_file('node59p1.dat')
+        self.assertEqual(driver.parser_inputs[-1].offset, 6)
+        self.assertEqual(self.published[3:], ['d\n', 'e\n'])
+        file_state = self.state['node59p1.dat']
+        self.assertEqual(file_state[DriverStateKey.TAIL_OFFSET], 10)
+        # the saved parser state is for the whole file, so it can be used outside tail mode
+        self.assertEqual(file_state[DriverStateKey.PARSER_STATE], {'position': 10})
+
+        self.append('f\n')
+        driver = self.build_driver(tail_mode=False, memento=self.state)
+        driver._got_file('node59p1.dat')
+        self.assertEqual(self.published[5:], ['f\n'])
+
+    def test_not_append_safe(self):
+        """
+        Test tail mode is ignored for parsers that are not append safe
+        """
+        driver = self.build_driver(UnsafeLineParser)
+        self.append('a\n')
+        driver._new_file_callback('node59p1.dat')
+        driver._got_file('node59p1.dat')
+        self.append('b\n')
+        driver._got_file('node59p1.dat')
+        self.assertEqual(self.published, ['a\n', 'b\n'])
+        self.assertNotIn(DriverStateKey.TAIL_OFFSET, self.state['node59p1.dat'])
+        self.assertIsInstance(driver.parser_inputs[-1], file)
+
+
+@attr('UNIT', group='mi')
+class BlockReadUnitTestCase(DataFileTestCase):
+    """
+    Test reading parser blocks, with and without a file map
+    """
+    # the last state the parser sent
+    state = None
+
+    def save_state(self, state, file_ingested=False):
+        self.state = state
+
+    def parse(self, handle, use_mmap):
+        parser = LineParser(self.state, handle, self.save_state, self.published.extend)
+        parser._use_mmap = use_mmap
+        parser.get_records(1000000)
+        return parser
+
+    def test_block_size(self):
+        """
+        Test the block size grows while blocks are read full
+        """
+        self.append(('x' * 999 + '\n') * 3000)
+        with open(self.path, 'rb') as handle:
+            parser = LineParser(None, handle, self.save_state, self.published.extend)
+            self.assertEqual(parser.get_block(), dataset_parser.MIN_BLOCK_SIZE)
+            self.assertEqual(parser.get_block(), dataset_parser.MIN_BLOCK_SIZE * 2)
+            self.assertEqual(parser.get_block(10), 10)
+            while parser._block_size < dataset_parser.MAX_BLOCK_SIZE:
+                parser.get_block()
+            parser.get_block()
+            self.assertEqual(parser._block_size, dataset_parser.MAX_BLOCK_SIZE)
+
+    def test_mmap(self):
+        """
+        Test records and state read from a file map match those read from the file, including data
+        appended after the file was mapped
+        """
+        self.append(('a' * 999 + '\n') * 300 + 'b')
+        with open(self.path, 'rb') as handle:
+            self.parse(handle, False)
+        expected = (self.published, self.state)
+
+        self.published = []
+        self.state = None
+        with open(self.path, 'rb') as handle:
+            parser = self.parse(handle, True)
+            self.assertIsNone(parser._mmap)
+            self.assertEqual((self.published, self.state), expected)
+
+            self.append('\nc\n')
+            parser.get_records(10)
+            self.assertEqual(self.published[-2:], ['b\n', 'c\n'])
+            self.assertEqual(self.state, {'position': 300004})
+
+    def test_mmap_empty(self):
+        """
+        Test an empty file, which can't be mapped, is read instead
+        """
+        self.append('')
+        with open(self.path, 'rb') as handle:
+            self.parse(handle, True)
+        self.assertEqual(self.published, [])
+        self.append('a\n')
+        with open(self.path, 'rb') as handle:
+            self.parse(handle, True)
+        self.assertEqual(self.published, ['a\n'])
+
+
+@attr('UNIT', group='mi')
+class IterRecordsUnitTestCase(DataFileTestCase):
+    """
+    Test taking records from a parser's record generator
+    """
+    def setUp(self):
+        super(IterRecordsUnitTestCase, self).setUp()
+        self.write('a\nb\nc\nd\ne\n')
+        self.handle = open(self.path, 'rb')
+        self.parser = LineParser(None, self.handle, self.save_state, self.published.extend)
+
+    def tearDown(self):
+        self.handle.close()
+        super(IterRecordsUnitTestCase, self).tearDown()
+
+    def save_state(self, state, file_ingested):
+        self.states.append((copy.copy(state), file_ingested))
+
+    def test_iter_records(self):
+        """
+        Test records are generated with their state without being published, and can be mixed with get_records
+        """
+        records = self.parser.iter_records()
+        self.assertEqual(next(records), ('a\n', {'position': 2}))
+        self.assertEqual(next(records), ('b\n', {'position': 4}))
+        self.assertEqual(self.published, [])
+        self.assertEqual(self.states, [])
+
+        self.parser.publish_records(['a\n', 'b\n'], {'position': 4})
+        self.assertEqual(self.states, [({'position': 4}, False)])
+
+        self.assertEqual(self.parser.get_records(1), ['c\n'])
+        self.assertEqual(list(records), [('d\n', {'position': 8}), ('e\n', {'position': 10})])
+        self.parser.publish_records(['d\n', 'e\n'], {'position': 10})
+        self.assertEqual(self.published, ['a\n', 'b\n', 'c\n', 'd\n', 'e\n'])
+        self.assertEqual(self.states[-1], ({'position': 10}, True))
+        self.assertEqual(self.parser.get_records(1), [])
+
+    def test_set_state(self):
+        """
+        Test records taken before the parser state is set don't affect the records after
+        """
+        self.assertEqual(self.parser.get_records(2), ['a\n', 'b\n'])
+        # like most parsers, replace the record buffer when setting the state
+        self.parser._record_buffer = []
+        self.parser._chunker.clean_all_chunks()
+        self.parser.set_state({'position': 6})
+        self.assertEqual(list(self.parser.iter_records()), [('d\n', {'position': 8}), ('e\n', {'position': 10})])
+
+    def test_driver_batches(self):
+        """
+        Test the driver publishes records from the generator in batches, falling back to get_records
+        for parsers without one
+        """
+        driver = self.new_driver(self.build_config())
+        driver._generate_particle_count = 2
+        driver._particle_count_per_second = 1000
+        batches = []
+        self.parser._publish_callback = batches.append
+
+        driver._parse_records(self.parser)
+        self.assertEqual(batches, [['a\n', 'b\n'], ['c\n', 'd\n'], ['e\n']])
+        self.assertEqual(self.states[-1], ({'position': 10}, True))
+
+        self.handle.seek(0)
+        parser = LineParser(None, self.handle, self.save_state, batches.append)
+        with patch.object(parser, 'iter_records', side_effect=NotImplementedException()):
+            driver._parse_records(parser)
+        self.assertEqual(batches[3:], [['a\n', 'b\n'], ['c\n', 'd\n'], ['e\n']])
+
+
+@attr('UNIT', group='mi')
+class RecoveredBatchUnitTestCase(DataFileTestCase):
+    """
+    Test recovered data is published in unpaced batches
+    """
+    def setUp(self):
+        super(RecoveredBatchUnitTestCase, self).setUp()
+        self.write(''.join('%d\n' % i for i in range(25)))
+        self.batches = []
+
+    def parse(self, recovered, driver_config):
+        config = self.build_config({DataSetDriverConfigKeys.RECOVERED: recovered}, driver_config)
+        driver = self.new_driver(config, data_callback=self.batches.append)
+        driver._new_file_callback('node59p1.dat')
+        with patch('mi.dataset.dataset_driver.gevent.sleep') as sleep:
+            driver._got_file('node59p1.dat')
+        return [args[0] for (args, kwargs) in sleep.call_args_list]
+
+    def test_recovered(self):
+        """
+        Test recovered records are fetched and published recovered_batch_count at a time
+        """
+        delays = self.parse(True, {DriverParameter.RECOVERED_BATCH_COUNT: 10})
+        self.assertEqual([len(batch) for batch in self.batches], [10, 10, 5])
+        self.assertEqual(self.batches[2][-1], '24\n')
+        self.assertEqual(delays, [0, 0, 0])
+
+    def test_paced(self):
+        """
+        Test live records are still paced to records_per_second
+        """
+        delays = self.parse(False, {DriverParameter.RECORDS_PER_SECOND: 20,
+                                    DriverParameter.BATCHED_PARTICLE_COUNT: 5})
+        self.assertEqual([len(batch) for batch in self.batches], [5] * 5)
+        self.assertEqual(delays, [0.25] * 5)
+
+
+@attr('UNIT', group='mi')
+class CheckpointUnitTestCase(DataFileTestCase):
+    """
+    Test coalesced driver state checkpoints
+    """
+    def setUp(self):
+        super(CheckpointUnitTestCase, self).setUp()
+        self.write(''.join('%02d\n' % i for i in range(25)))
+        self.deltas = []
+
+    def build_driver(self, driver_config, state_store=None, state_store_only=False, memento=None):
+        config = self.build_config({DataSetDriverConfigKeys.RECOVERED: True}, driver_config)
+        if state_store:
+            config[DataSourceConfigKey.STATE_STORE] = state_store
+            config[DataSourceConfigKey.STATE_STORE_ONLY] = state_store_only
+        return self.new_driver(config, memento)
+
+    def test_coalesce(self):
+        """
+        Test the state is only sent every checkpoint_record_count particles and at the end of the file,
+        and never before the particles it covers
+        """
+        driver = self.build_driver({DriverParameter.RECOVERED_BATCH_COUNT: 4,
+                                    DriverParameter.CHECKPOINT_RECORD_COUNT: 10,
+                                    DriverParameter.CHECKPOINT_INTERVAL: 1000})
+        driver._new_file_callback('node59p1.dat')
+        driver._got_file('node59p1.dat')
+
+        self.assertEqual(len(self.published), 25)
+        published = [count for (count, state) in self.states]
+        self.assertEqual(published, [0, 12, 24, 25])
+        for (count, state) in self.states[1:]:
+            # each state covers exactly the particles published before it
+            self.assertEqual(state['node59p1.dat'][DriverStateKey.PARSER_STATE]['position'], count * 3)
+        self.assertTrue(self.states[-1][1]['node59p1.dat'][DriverStateKey.INGESTED])
+
+    def test_interval(self):
+        """
+        Test the state is sent when the checkpoint interval has passed
+        """
+        driver = self.build_driver({DriverParameter.RECOVERED_BATCH_COUNT: 4,
+                                    DriverParameter.CHECKPOINT_RECORD_COUNT: 1000,
+                                    DriverParameter.CHECKPOINT_INTERVAL: 1000})
+        driver._new_file_callback('node59p1.dat')
+        driver._last_checkpoint -= 1000
+        driver._got_file('node59p1.dat')
+        self.assertEqual([count for (count, state) in self.states], [0, 4, 25])
+
+    def test_stop_sampling(self):
+        """
+        Test held particles are sent when sampling stops
+        """
+        driver = self.build_driver({DriverParameter.CHECKPOINT_RECORD_COUNT: 10})
+        driver._new_file_callback('node59p1.dat')
+        driver._buffer_data(['00\n'])
+        driver._checkpoint(('node59p1.dat',), force=False)
+        self.assertEqual(self.published, [])
+
+        driver.stop_sampling()
+        self.assertEqual(self.published, ['00\n'])
+        self.assertEqual(len(self.states), 2)
+
+        # nothing is held, so nothing more is sent
+        driver.stop_sampling()
+        self.assertEqual(len(self.states), 2)
+
+    def test_delta(self):
+        """
+        Test only the changed file states are sent to the state delta callback
+        """
+        driver = self.build_driver({DriverParameter.RECOVERED_BATCH_COUNT: 10,
+                                    DriverParameter.CHECKPOINT_RECORD_COUNT: 10})
+        driver.set_state_delta_callback(self.deltas.append)
+        state = {}
+        driver._new_file_callback('node59p1.dat')
+        driver._driver_state['other.dat'] = {DriverStateKey.INGESTED: True}
+        driver._got_file('node59p1.dat')
+
+        self.assertEqual(self.states, [])
+        self.assertEqual(len(self.deltas), 4)
+        for delta in self.deltas:
+            self.assertEqual([path for (path, file_state) in delta], [('node59p1.dat',)])
+            apply_state_delta(state, delta)
+        del driver._driver_state['other.dat']
+        self.assertEqual(state, {'node59p1.dat': driver._driver_state['node59p1.dat']})
+
+    def test_state_store(self):
+        """
+        Test a driver configured with a state store checkpoints to it as well as the state callback,
+        and starts from the memento when restarted
+        """
+        path = os.path.join(self.directory, 'state.db')
+        driver = self.build_driver({DriverParameter.RECOVERED_BATCH_COUNT: 10,
+                                    DriverParameter.CHECKPOINT_RECORD_COUNT: 10}, path)
+        driver._new_file_callback('node59p1.dat')
+        driver._got_file('node59p1.dat')
+        driver.shutdown()
+
+        self.assertEqual(len(self.published), 25)
+        self.assertEqual([count for (count, state) in self.states], [0, 10, 20, 25])
+        memento = self.states[-1][1]
+        store = SqliteStateStore(path)
+        self.assertEqual(store.file_state('node59p1.dat'), memento['node59p1.dat'])
+        store.close()
+
+        driver = self.build_driver({}, path, memento=copy.deepcopy(memento))
+        self.assertEqual(driver._driver_state, memento)
+        driver.shutdown()
+
+    def test_state_store_only(self):
+        """
+        Test a driver configured to only keep its state in the state store no longer calls the state
+        callback, and starts from the store when restarted
+        """
+        path = os.path.join(self.directory, 'state.db')
+        driver = self.build_driver({DriverParameter.RECOVERED_BATCH_COUNT: 10,
+                                    DriverParameter.CHECKPOINT_RECORD_COUNT: 10}, path, True)
+        driver._new_file_callback('node59p1.dat')
+        driver._got_file('node59p1.dat')
+        file_state = copy.deepcopy(driver._driver_state['node59p1.dat'])
+        driver.shutdown()
+
+        self.assertEqual(len(self.published), 25)
+        self.assertEqual(self.states, [])
+        self.assertEqual(SqliteStateStore(path).file_state('node59p1.dat'), file_state)
+
+        # the store replaces the memento, ingested files are looked up without their parser state
+        driver = self.build_driver({}, path, True, {DriverStateKey.VERSION: 0.1})
+        self.assertEqual(dict(driver._driver_state), {DriverStateKey.VERSION: 0.1})
+        del file_state[DriverStateKey.PARSER_STATE]
+        self.assertEqual(driver._driver_state['node59p1.dat'], file_state)
+        driver.shutdown()
+
+
+@attr('UNIT', group='mi')
+class ParsePoolUnitTestCase(DataFileTestCase):
+    """
+    Test parsing recovered files in a pool of worker processes
+    """
+    def setUp(self):
+        super(ParsePoolUnitTestCase, self).setUp()
+        self.file_names = []
+        for i in range(5):
+            file_name = 'node59p1_%d.dat' % i
+            # later files are smaller, so they tend to finish first
+            self.write(''.join('%d_%03d\n' % (i, j) for j in range(500 - i * 100)), file_name)
+            self.file_names.append(file_name)
+
+    def build_driver(self, parse_workers, parser_class=CheckedLineParser, tail_mode=False):
+        config = self.build_config({DataSetDriverConfigKeys.RECOVERED: True,
+                                    DataSetDriverConfigKeys.TAIL_MODE: tail_mode},
+                                   {DriverParameter.PARSE_WORKERS: parse_workers})
+        driver = self.new_driver(config, parser_class=parser_class)
+        for file_name in self.file_names:
+            driver._new_file_callback(file_name)
+        del self.states[:]
+        del self.events[:]
+        return driver
+
+    def write_lines(self, index, lines):
+        self.write(''.join(line + '\n' for line in lines), self.file_names[index])
+
+    def test_pool(self):
+        """
+        Test files parsed in parallel are published in order with one checkpoint per file
+        """
+        driver = self.build_driver(2, LineParser)
+        try:
+            # two workers take four files at a time
+            driver._poll()
+            self.assertEqual(driver._new_file_queue, ['node59p1_4.dat'])
+            driver._poll()
+            self.assertEqual(driver._new_file_queue, [])
+        finally:
+            driver.stop_sampling()
+
+        expected = []
+        for i in range(5):
+            expected.extend('%d_%03d\n' % (i, j) for j in range(500 - i * 100))
+        self.assertEqual(self.published, expected)
+
+        self.assertEqual(len(self.states), 5)
+        for (i, (count, state)) in enumerate(self.states):
+            self.assertEqual(count, sum(500 - j * 100 for j in range(i + 1)))
+            file_state = state[self.file_names[i]]
+            self.assertEqual(file_state[DriverStateKey.PARSER_STATE], {'position': (500 - i * 100) * 6})
+            self.assertTrue(file_state[DriverStateKey.INGESTED])
+        self.assertIsNone(driver._parse_pool)
+
+    def test_pool_exceptions(self):
+        """
+        Test the exceptions parsers report in the workers are sent to the exception callback in order, as
+        they are when the files are parsed in the driver
+        """
+        self.write_lines(1, ['1_000', 'bad 1', '1_001', 'bad 2'])
+        self.write_lines(3, ['bad 3', '3_000'])
+
+        driver = self.build_driver(1)
+        while driver._new_file_queue:
+            driver._poll()
+        (published, states, events) = (self.published[:], self.states[:], self.events[:])
+        del self.published[:]
+
+        driver = self.build_driver(2)
+        try:
+            while driver._new_file_queue:
+                driver._poll()
+        finally:
+            driver.stop_sampling()
+
+        errors = [event['error_msg'] for event in events if 'error_msg' in event]
+        self.assertEqual(len(errors), 3)
+        for (error, line) in zip(errors, ['bad 1', 'bad 2', 'bad 3']):
+            self.assertIn(line, error)
+        self.assertEqual(self.events, events)
+        self.assertEqual(self.published, published)
+        self.assertEqual(self.states, states)
+
+    def test_pool_tail(self):
+        """
+        Test files parsed in the workers in tail mode are given the same tail offsets as in the driver
+        """
+        self.write_lines(1, ['1_000', '1_001'])
+        driver = self.build_driver(1, tail_mode=True)
+        while driver._new_file_queue:
+            driver._poll()
+        states = self.states[:]
+        del self.published[:]
+
+        driver = self.build_driver(2, tail_mode=True)
+        try:
+            while driver._new_file_queue:
+                driver._poll()
+        finally:
+            driver.stop_sampling()
+        self.assertEqual(self.states, states)
+        file_state = self.states[1][1][self.file_names[1]]
+        self.assertEqual(file_state[DriverStateKey.TAIL_OFFSET], 12)
+        self.assertEqual(file_state[DriverStateKey.PARSER_STATE], {'position': 12})
+
+    def test_pool_worker_error(self):
+        """
+        Test a file whose worker fails with an error other than a SampleException is parsed in the driver,
+        and files are only taken off the queue when they are published
+        """
+        # the particles of file 1 can not be sent back from a worker
+        self.write_lines(1, ['local 1', 'local 2'])
+        driver = self.build_driver(2)
+        try:
+            driver._poll()
+            self.assertEqual(driver._new_file_queue, ['node59p1_4.dat'])
+            self.assertEqual(self.published[500:502], ['local 1\n', 'local 2\n'])
+            self.assertIsInstance(self.published[500], LocalLine)
+            self.assertEqual(len(self.published), 500 + 2 + 300 + 200)
+            self.assertTrue(all(state[file_name][DriverStateKey.INGESTED]
+                                for (state, file_name) in zip([state for (count, state) in self.states],
+                                                              self.file_names)))
+
+            # file 2 can not be read in the worker or the driver, the files after it stay queued
+            self.write_lines(2, ['2_000', 'ioerror', '2_001'])
+            del self.published[:]
+            driver._driver_state[self.file_names[2]][DriverStateKey.PARSER_STATE] = None
+            driver._new_file_queue[:] = self.file_names[2:]
+            self.assertRaises(IOError, driver._poll)
+            self.assertEqual(driver._new_file_queue, self.file_names[3:])
+        finally:
+            driver.stop_sampling()
+
+
+@attr('UNIT', group='mi')
+class FileNameParserUnitTestCase(DataFileTestCase):
+    """
+    Test a multiple harvester driver whose parsers are built with the name of the file
+    """
+    def setUp(self):
+        super(FileNameParserUnitTestCase, self).setUp()
+        # the mopak parser takes the start time from the file name
+        self.file_names = ['20140120_140004.mopak.log', '20140120_150004.mopak.log']
+        for (file_name, resource) in zip(self.file_names, ['first.mopak.log', 'first_rate.mopak.log']):
+            shutil.copy(os.path.join(CG_STC_ENG_RESOURCE_PATH, resource), os.path.join(self.directory, file_name))
+
+    def build_driver(self, driver_config, file_names):
+        config = {
+            DataSourceConfigKey.HARVESTER: {
+                DataTypeKey.MOPAK_RECOV: {
+                    DataSetDriverConfigKeys.DIRECTORY: self.directory,
+                    DataSetDriverConfigKeys.PATTERN: '*.mopak.log',
+                    DataSetDriverConfigKeys.RECOVERED: True
+                }
+            },
+            DataSourceConfigKey.PARSER: {DataTypeKey.MOPAK_RECOV: {}},
+            DataSourceConfigKey.DRIVER: driver_config
+        }
+        driver = CgStcEngStcDataSetDriver(config, None, self.published.extend, self.save_state,
+                                          lambda **kwargs: self.events.append(kwargs), self.fail)
+        for file_name in file_names:
+            driver._new_file_callback(file_name, DataTypeKey.MOPAK_RECOV)
+        del self.states[:]
+        return driver
+
+    def test_recovered(self):
+        """
+        Test recovered files are parsed in unpaced batches, with one checkpoint at the end of the file
+        """
+        driver = self.build_driver({DriverParameter.RECOVERED_BATCH_COUNT: 2,
+                                    DriverParameter.CHECKPOINT_RECORD_COUNT: 10}, self.file_names[:1])
+        with patch('mi.dataset.dataset_driver.gevent.sleep') as sleep:
+            driver._poll(DataTypeKey.MOPAK_RECOV)
+        self.assertEqual([args[0] for (args, kwargs) in sleep.call_args_list], [0, 0, 0])
+
+        self.assertEqual(len(self.published), 5)
+        for particle in self.published:
+            self.assertIsInstance(particle, MopakODclAccelParserRecoveredDataParticle)
+        self.assertEqual(len(self.states), 1)
+        (count, state) = self.states[0]
+        self.assertEqual(count, 5)
+        self.assertTrue(state[DataTypeKey.MOPAK_RECOV][self.file_names[0]][DriverStateKey.INGESTED])
+        self.assertEqual(driver._new_file_queue[DataTypeKey.MOPAK_RECOV], [])
+
+    def test_pool(self):
+        """
+        Test files parsed in the parse pool are parsed in the workers, publishing the same particles and
+        states as when they are parsed in the driver
+        """
+        driver = self.build_driver({}, self.file_names)
+        while driver._new_file_queue[DataTypeKey.MOPAK_RECOV]:
+            driver._poll(DataTypeKey.MOPAK_RECOV)
+        (published, states) = (self.published[:], self.states[:])
+        del self.published[:]
+
+        driver = self.build_driver({DriverParameter.PARSE_WORKERS: 2}, self.file_names)
+        try:
+            # a worker error would fall back to parsing the file in the driver
+            with patch.object(driver, '_got_file', side_effect=AssertionError('file parsed in the driver')):
+                driver._poll(DataTypeKey.MOPAK_RECOV)
+        finally:
+            driver.stop_sampling()
+        self.assertEqual(driver._new_file_queue[DataTypeKey.MOPAK_RECOV], [])
+        # particles compare by raw data and timestamp
+        self.assertEqual(self.published, published)
+        self.assertEqual([type(particle) for particle in self.published], [type(particle) for particle in published])
+        self.assertEqual(self.states, states)
+        self.assertEqual(len(self.states), 2)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+"""
+@package mi.dataset.test.test_file_identity
+@file mi/dataset/test/test_file_identity.py
+@brief Test code for the file identity cache
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTestCase
+from mi.dataset.file_identity import FileIdentityCache
+
+@attr('UNIT', group='mi')
+class FileIdentityCacheUnitTestCase(MiUnitTestCase):
+    """
+    Test the FileIdentityCache
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'node59p1.dat')
+        self.write('0123456789' * 1000)
+        # small blocks so files are hashed over several reads
+        self.cache = FileIdentityCache(max_entries=2, block_size=256)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, data, path=None, mode='wb'):
+        with open(path or self.path, mode) as filehandle:
+            filehandle.write(data)
+
+    def md5(self, path=None):
+        with open(path or self.path, 'rb') as filehandle:
+            return hashlib.md5(filehandle.read()).hexdigest()
+
+    def test_hash_once(self):
+        """
+        Test an unchanged file is only hashed once
+        """
+        identity = self.cache.get(self.path)
+        self.assertEqual(identity.checksum, self.md5())
+        self.assertEqual(identity.size, 10000)
+        self.assertEqual(identity.mod_time, os.path.getmtime(self.path))
+
+        self.assertEqual(self.cache.get(self.path), identity)
+        self.assertEqual(self.cache.hash_count, 1)
+
+    def test_changed_file(self):
+        """
+        Test a change in size, mod time or inode invalidates the cached checksum
+        """
+        # whole second times, so utime can restore them exactly
+        os.utime(self.path, (1400000000, 1400000000))
+        stat = os.stat(self.path)
+        original = self.cache.get(self.path).checksum
+
+        # same size and mod time, the cached value is used
+        self.write('9876543210' * 1000)
+        os.utime(self.path, (stat.st_atime, stat.st_mtime))
+        self.assertEqual(self.cache.get(self.path).checksum, original)
+
+        # a new mod time means the file is hashed again
+        os.utime(self.path, (stat.st_atime, stat.st_mtime + 1))
+        self.assertEqual(self.cache.get(self.path).checksum, self.md5())
+
+        # appended data changes the size, and only the new data is hashed
+        self.write('abc', mode='ab')
+        self.assertEqual(self.cache.get(self.path, append_only=True).checksum, self.md5())
+        self.assertEqual(self.cache.extend_count, 1)
+
+        # replaced by a different file with the same size and mod time
+        stat = os.stat(self.path)
+        replacement = os.path.join(self.directory, 'replacement.dat')
+        self.write('x' * stat.st_size, replacement)
+        os.utime(replacement, (stat.st_atime, stat.st_mtime))
+        os.rename(replacement, self.path)
+        self.assertEqual(self.cache.get(self.path).checksum, self.md5())
+        self.assertEqual(self.cache.hash_count, 3)
+
+    def test_append(self):
+        """
+        Test the checksum of a growing file is extended over the new data, unless
+        the data already hashed has changed
+        """
+        for i in range(5):
+            self.write('%d' % i * 300, mode='ab')
+            self.assertEqual(self.cache.get(self.path, append_only=True).checksum, self.md5())
+        self.assertEqual(self.cache.hash_count, 1)
+        self.assertEqual(self.cache.extend_count, 4)
+
+        # rewrite the start of the file while it grows
+        data = open(self.path, 'rb').read()
+        self.write('X' + data[1:] + 'more')
+        self.assertEqual(self.cache.get(self.path, append_only=True).checksum, self.md5())
+        self.assertEqual(self.cache.hash_count, 2)
+
+        # and the end of the previously hashed data
+        data = open(self.path, 'rb').read()
+        self.write(data[:-1] + 'Y' + 'more')
+        self.assertEqual(self.cache.get(self.path, append_only=True).checksum, self.md5())
+        self.assertEqual(self.cache.hash_count, 3)
+        self.assertEqual(self.cache.extend_count, 4)
+
+    def test_middle_change_and_append(self):
+        """
+        Test a file rewritten in the middle, keeping its ends and inode, then appended to
+        is hashed again unless it is declared append only
+        """
+        self.write('0123456789' * 20000)
+        self.cache.get(self.path)
+
+        def rewrite_middle_and_append(data):
+            with open(self.path, 'r+b') as filehandle:
+                filehandle.seek(100000)
+                filehandle.write(data)
+            self.write('appended', mode='ab')
+
+        rewrite_middle_and_append('CHANGED')
+        self.assertEqual(self.cache.get(self.path).checksum, self.md5())
+        self.assertEqual(self.cache.hash_count, 2)
+        self.assertEqual(self.cache.extend_count, 0)
+
+        # an append only file keeps the checksum it was extended from, the ends were not changed
+        rewrite_middle_and_append('AGAIN')
+        self.assertNotEqual(self.cache.get(self.path, append_only=True).checksum, self.md5())
+        self.assertEqual(self.cache.extend_count, 1)
+
+    def test_eviction(self):
+        """
+        Test the least recently used file is dropped when the cache is full
+        """
+        paths = []
+        for i in range(3):
+            path = os.path.join(self.directory, 'file_%d.dat' % i)
+            self.write(str(i), path)
+            paths.append(path)
+
+        self.cache.get(paths[0])
+        self.cache.get(paths[1])
+        self.cache.get(paths[0])
+        self.cache.get(paths[2])
+        self.assertEqual(self.cache.hash_count, 3)
+
+        self.cache.get(paths[0])
+        self.assertEqual(self.cache.hash_count, 3)
+        self.cache.get(paths[1])
+        self.assertEqual(self.cache.hash_count, 4)
@@ -7,11 +7,36 @@
 @brief Test code for the dataset parser base classes and common structures for
 testing parsers.
 """
+from nose.plugins.attrib import attr
+
 from mi.core.unit_test import MiUnitTestCase, MiIntTestCase
+from mi.dataset.dataset_parser import find_sync, next_sync
 
 # Make some stubs if we need to share among parser test suites
 class ParserUnitTestCase(MiUnitTestCase):
     pass
 
 class ParserIntTestCase(MiIntTestCase):
-    pass
\ No newline at end of file
+    pass
+
+@attr('UNIT', group='mi')
+class SyncScanUnitTestCase(MiUnitTestCase):
+    """
+    Test the sync word scanning helpers sieves use
+    """
+    def test_find_sync(self):
+        buf = 'xx\xa5yy\xcbzz\xa5'
+        self.assertEqual(find_sync(buf, ('\xcb', '\xa5')), 2)
+        self.assertEqual(find_sync(buf, ('\xcb', '\xa5'), 3), 5)
+        self.assertEqual(find_sync(buf, ('\xcb',), 6), -1)
+        self.assertEqual(find_sync(buf, ('\xa5',), 3, 8), -1)
+        self.assertEqual(find_sync('Record[1]Recor', ('Record[', 'Rec')), 0)
+        # the first sync word doesn't depend on the order they are given in
+        self.assertEqual(find_sync('abc', ('b', 'abc')), 0)
+        self.assertEqual(find_sync('abc', ('abc', 'b')), 0)
+        self.assertEqual(find_sync('Record[1]Recor', ('Record[', 'Rec'), 1), 9)
+
+    def test_next_sync(self):
+        buf = '<ERROR><Executing/>'
+        self.assertEqual(next_sync(buf, ('<Executing/>', '<ERROR'), 0), 7)
+        self.assertEqual(next_sync(buf, ('<Executing/>', '<ERROR'), 7), len(buf))
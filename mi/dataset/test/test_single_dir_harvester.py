@@ -15,6 +15,8 @@ import hashlib
 
 from mi.core.log import get_logger ; log = get_logger()
 from nose.plugins.attrib import attr
+from nose.plugins.skip import SkipTest
+from mi.core import inotify
 from mi.core.unit_test import MiUnitTest
 from mi.dataset.harvester import SingleDirectoryHarvester
 from mi.dataset.dataset_driver import DriverStateKey, DataSetDriverConfigKeys
@@ -368,6 +370,85 @@ class TestSingleDirHarvester(MiUnitTest):
 
         file_harvester.shutdown()
 
+    def test_harvester_inotify(self):
+        """
+        Test that with inotify new and modified files are found without waiting for the polling interval
+        """
+        if not inotify.available():
+            raise SkipTest("inotify is not available")
+
+        # one file is already ingested, and one is in the directory before the harvester starts
+        self.fill_directory_with_files(CONFIG[DataSetDriverConfigKeys.DIRECTORY],
+                                       CONFIG[DataSetDriverConfigKeys.PATTERN], 0, 2, 0)
+        filename_1 = 'unit_' + INDICIES[0] + CONFIG[DataSetDriverConfigKeys.PATTERN].replace('*', '')
+        metadata_1 = self.get_file_metadata(filename_1)
+        metadata_1[DriverStateKey.INGESTED] = True
+        memento = {DriverStateKey.VERSION: 0.1, filename_1: metadata_1}
+
+        config = CONFIG.copy()
+        config[DataSetDriverConfigKeys.FREQUENCY] = 30
+        config[DataSetDriverConfigKeys.FILE_MOD_WAIT_TIME] = 0
+        config[DataSetDriverConfigKeys.USE_INOTIFY] = True
+        modified = []
+        file_harvester = SingleDirectoryHarvester(config, memento,
+                                                  self.new_file_found_callback,
+                                                  modified.append,
+                                                  self.file_exception_callback)
+        file_harvester.start()
+        self.wait_for_file(0, .1, 5)
+        self.assertEqual(self.found_file_count, 1)
+
+        # new files are found well within the polling interval
+        self.fill_directory_with_files(CONFIG[DataSetDriverConfigKeys.DIRECTORY],
+                                       CONFIG[DataSetDriverConfigKeys.PATTERN], 2, 2, 0)
+        self.wait_for_file(1, .1, 5)
+        while self.found_file_count < 3:
+            self.wait_for_file(self.found_file_count, .1, 5)
+
+        # hidden and non matching files are ignored
+        open(os.path.join(TESTDIR, '.unit_hidden.txt'), 'w').close()
+        open(os.path.join(TESTDIR, 'unit_other.dat'), 'w').close()
+
+        # as is the modification of an ingested file
+        file_path = os.path.join(TESTDIR, filename_1)
+        time.sleep(.01)
+        with open(file_path, 'a') as filehandle:
+            filehandle.write('a b c d')
+        end_time = 0
+        while not modified:
+            time.sleep(.1)
+            end_time += .1
+            if end_time > 5:
+                raise Exception("Timeout waiting to find modified files")
+
+        file_harvester.shutdown()
+        self.assertEqual(self.found_file_count, 3)
+        self.assertEqual(modified[0].keys(), [filename_1])
+        os.remove(os.path.join(TESTDIR, '.unit_hidden.txt'))
+        os.remove(os.path.join(TESTDIR, 'unit_other.dat'))
+
+    def test_sort_files(self):
+        """
+        Test files with underscore separated indices are sorted by the integer value of the indices
+        """
+        file_harvester = SingleDirectoryHarvester(CONFIG, None,
+                                                  self.new_file_found_callback,
+                                                  self.modified_files_found_callback,
+                                                  self.file_exception_callback)
+        filenames = [TESTDIR + '/unit_' + index + '.txt' for index in INDICIES]
+        shuffled = list(reversed(filenames[6:])) + list(reversed(filenames[:6]))
+        self.assertEqual(file_harvester.sort_files(shuffled), filenames)
+        # again with the cached sort keys and a file removed
+        self.assertEqual(file_harvester.sort_files(shuffled[1:]), filenames[:-1])
+        # sorting a subset, as inotify checks do, keeps the keys of the other files
+        self.assertEqual(file_harvester.sort_files(filenames[:2]), filenames[:2])
+        self.assertEqual(sorted(file_harvester._sort_keys), sorted(filenames))
+
+        # a full scan forgets the keys of files that are no longer in the directory
+        self.fill_directory_with_files(TESTDIR, CONFIG[DataSetDriverConfigKeys.PATTERN], 0, 3, 0)
+        self.assertEqual(file_harvester._find_files(), filenames[:3])
+        self.assertEqual(sorted(file_harvester._sort_keys), sorted(filenames[:3]))
+
     def test_harvester_exception(self):
         """
         Verify exceptions
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+
+"""
+@package mi.dataset.test.test_state_store
+@file mi/dataset/test/test_state_store.py
+@brief Test code for the sqlite driver state store
+"""
+
+import os
+import copy
+import shutil
+import cPickle as pickle
+import tempfile
+
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTestCase
+from mi.dataset.dataset_driver import DriverStateKey
+from mi.dataset.dataset_driver import DataSetDriverConfigKeys
+from mi.dataset.dataset_driver import apply_state_delta
+from mi.dataset.state_store import SqliteStateStore
+from mi.dataset.parser.flord_l_wfp_sio_mule import FlordLWfpSioMuleParser
+from mi.idk.config import Config
+
+SIO_RESOURCE_PATH = os.path.join(Config().base_dir(), 'mi', 'dataset', 'driver', 'flord_l_wfp', 'sio_mule', 'resource')
+
+def file_state(ingested, position, size=100):
+    return {
+        DriverStateKey.FILE_SIZE: size,
+        DriverStateKey.FILE_MOD_DATE: 1400000000.25,
+        DriverStateKey.FILE_CHECKSUM: 'a3e9c6ba24c1c21e1b70aa6bbe14e0d0',
+        DriverStateKey.INGESTED: ingested,
+        DriverStateKey.PARSER_STATE: {'position': position, 'in_process_data': [[0, 10, 1, 0]]}
+    }
+
+@attr('UNIT', group='mi')
+class SqliteStateStoreUnitTestCase(MiUnitTestCase):
+    """
+    Test the SqliteStateStore
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'state.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        """
+        Test the state of files being ingested is loaded whole, and ingested files are loaded without
+        their parser state
+        """
+        store = SqliteStateStore(self.path)
+        state = {DriverStateKey.VERSION: 0.1,
+                 'node59p1_0.dat': file_state(True, 100),
+                 'node59p1_1.dat': file_state(False, 40)}
+        store.save_state(state)
+        store.close()
+
+        store = SqliteStateStore(self.path)
+        loaded = store.load()
+        self.assertEqual(loaded[DriverStateKey.VERSION], 0.1)
+        self.assertEqual(loaded['node59p1_1.dat'], state['node59p1_1.dat'])
+        expected = state['node59p1_0.dat'].copy()
+        del expected[DriverStateKey.PARSER_STATE]
+        self.assertEqual(loaded['node59p1_0.dat'], expected)
+
+        self.assertEqual(store.pending_files(), ['node59p1_1.dat'])
+        self.assertEqual(store.file_state('node59p1_0.dat'), state['node59p1_0.dat'])
+        self.assertIsNone(store.file_state('node59p1_2.dat'))
+
+        # a modification to the ingested file keeps its stored parser state
+        loaded['node59p1_0.dat'][DriverStateKey.MODIFIED_STATE] = {DriverStateKey.FILE_SIZE: 200}
+        store.save_state(loaded)
+        expected = state['node59p1_0.dat'].copy()
+        expected[DriverStateKey.MODIFIED_STATE] = {DriverStateKey.FILE_SIZE: 200}
+        self.assertEqual(store.file_state('node59p1_0.dat'), expected)
+        self.assertEqual(SqliteStateStore(self.path).load()['node59p1_0.dat'][DriverStateKey.MODIFIED_STATE],
+                         {DriverStateKey.FILE_SIZE: 200})
+
+    def test_load_pending(self):
+        """
+        Test only files still being ingested are loaded, and ingested files are looked up when asked for
+        """
+        store = SqliteStateStore(self.path, data_keys=['telemetered', 'recovered'])
+        state = {DriverStateKey.VERSION: 0.1, 'telemetered': {}, 'recovered': {}}
+        for i in range(20):
+            state['recovered']['node59p1_%d.dat' % i] = file_state(i < 19, 100)
+        store.save_state(state)
+        store.close()
+
+        store = SqliteStateStore(self.path, data_keys=['telemetered', 'recovered'])
+        loaded = store.load()
+        recovered = loaded['recovered']
+        self.assertEqual(recovered.keys(), ['node59p1_19.dat'])
+        self.assertEqual(len(store._written), 1)
+        self.assertEqual(recovered['node59p1_19.dat'], state['recovered']['node59p1_19.dat'])
+
+        self.assertIn('node59p1_3.dat', recovered)
+        self.assertTrue(recovered['node59p1_3.dat'][DriverStateKey.INGESTED])
+        self.assertNotIn(DriverStateKey.PARSER_STATE, recovered.get('node59p1_3.dat'))
+        self.assertNotIn('node59p1_3.dat', loaded['telemetered'])
+        self.assertNotIn('node59p1_20.dat', recovered)
+        self.assertIsNone(recovered.get('node59p1_20.dat'))
+        self.assertRaises(KeyError, lambda: recovered['node59p1_20.dat'])
+
+        # copies only have the files looked up so far, and don't refer to the store
+        self.assertEqual(sorted(copy.deepcopy(recovered)), ['node59p1_19.dat', 'node59p1_3.dat'])
+        self.assertEqual(type(pickle.loads(pickle.dumps(recovered))), dict)
+
+    def test_delta(self):
+        """
+        Test state deltas from a multiple harvester driver only update their own files
+        """
+        store = SqliteStateStore(self.path, data_keys=['telemetered', 'recovered'])
+        state = {DriverStateKey.VERSION: 0.1,
+                 'telemetered': {'node59p1.dat': file_state(False, 0)},
+                 'recovered': {'node59p1.dat': file_state(False, 0)}}
+        store.save_state(state)
+
+        delta = [(('recovered', 'node59p1.dat'), file_state(False, 60)),
+                 (('recovered', 'node58p1.dat'), file_state(True, 100))]
+        store.apply_delta(delta)
+        apply_state_delta(state, delta)
+
+        self.assertEqual(store.pending_files('recovered'), ['node59p1.dat'])
+        loaded = SqliteStateStore(self.path, data_keys=['telemetered', 'recovered']).load()
+        self.assertEqual(loaded['telemetered'], state['telemetered'])
+        self.assertEqual(loaded['recovered']['node59p1.dat'], state['recovered']['node59p1.dat'])
+        self.assertTrue(loaded['recovered']['node58p1.dat'][DriverStateKey.INGESTED])
+
+    def test_parser_states(self):
+        """
+        Test real parser states, and states with tuples and integer keys, are loaded exactly as saved
+        """
+        config = {DataSetDriverConfigKeys.PARTICLE_MODULE: 'mi.dataset.parser.flord_l_wfp_sio_mule',
+                  DataSetDriverConfigKeys.PARTICLE_CLASS: 'FlordLWfpSioMuleParserDataParticle'}
+        parser_states = []
+        with open(os.path.join(SIO_RESOURCE_PATH, 'node58p1.dat')) as stream_handle:
+            parser = FlordLWfpSioMuleParser(config, None, stream_handle,
+                                            lambda state: parser_states.append(copy.deepcopy(state)),
+                                            lambda particles: None, self.fail)
+            while parser.get_records(5) and len(parser_states) < 20:
+                pass
+        self.assertTrue(parser_states)
+        parser_states.append({'position': (10, 20), 'records': {0: [1.5, (2, 3)], 7: None}, 'ratio': 1 / 3.0})
+
+        store = SqliteStateStore(self.path)
+        for parser_state in parser_states:
+            state = file_state(False, 0)
+            state[DriverStateKey.PARSER_STATE] = parser_state
+            store.apply_delta([(('node58p1.dat',), state)])
+            loaded = SqliteStateStore(self.path).load()['node58p1.dat'][DriverStateKey.PARSER_STATE]
+            self.assertEqual(loaded, parser_state)
+            self.assertEqual(repr(loaded), repr(parser_state))
+
+    def test_save_paths(self):
+        """
+        Test saving a state with the paths of the changed files only writes those rows
+        """
+        store = SqliteStateStore(self.path)
+        state = {DriverStateKey.VERSION: 0.1}
+        for i in range(10):
+            state['node59p1_%d.dat' % i] = file_state(True, 100)
+        store.save_state(state)
+
+        changes = store._connection.total_changes
+        for i in range(3):
+            state['node59p1_%d.dat' % i][DriverStateKey.PARSER_STATE]['position'] = 50
+        store.save_state(state, [('node59p1_1.dat',)])
+        self.assertEqual(store._connection.total_changes - changes, 1)
+        self.assertEqual(store.file_state('node59p1_1.dat'), state['node59p1_1.dat'])
+        self.assertEqual(store.file_state('node59p1_0.dat'), file_state(True, 100))
+
+    def test_unchanged(self):
+        """
+        Test saving the same state again writes nothing
+        """
+        store = SqliteStateStore(self.path)
+        state = {DriverStateKey.VERSION: 0.1, 'node59p1.dat': file_state(False, 0)}
+        store.save_state(state)
+
+        changes = store._connection.total_changes
+        store.save_state(state)
+        state['node59p1.dat'][DriverStateKey.PARSER_STATE]['position'] = 10
+        store.save_state(state)
+        self.assertEqual(store._connection.total_changes - changes, 1)
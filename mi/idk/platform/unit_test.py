@@ -687,7 +687,11 @@ class DataSetIntegrationTestCase(DataSetTestCase):
         """
         expected_params = [DriverParameter.BATCHED_PARTICLE_COUNT,
                            DriverParameter.PUBLISHER_POLLING_INTERVAL,
-                           DriverParameter.RECORDS_PER_SECOND]
+                           DriverParameter.RECORDS_PER_SECOND,
+                           DriverParameter.RECOVERED_BATCH_COUNT,
+                           DriverParameter.CHECKPOINT_RECORD_COUNT,
+                           DriverParameter.CHECKPOINT_INTERVAL,
+                           DriverParameter.PARSE_WORKERS]
         (res_cmds, res_params) = self.driver.get_resource_capabilities()
 
         # Ensure capabilities are as expected
@@ -701,6 +705,10 @@ class DataSetIntegrationTestCase(DataSetTestCase):
         self.assertEqual(params[DriverParameter.BATCHED_PARTICLE_COUNT], 1)
         self.assertEqual(params[DriverParameter.PUBLISHER_POLLING_INTERVAL], 1)
         self.assertEqual(params[DriverParameter.RECORDS_PER_SECOND], 60)
+        self.assertEqual(params[DriverParameter.RECOVERED_BATCH_COUNT], 1000)
+        self.assertEqual(params[DriverParameter.CHECKPOINT_RECORD_COUNT], 1)
+        self.assertEqual(params[DriverParameter.CHECKPOINT_INTERVAL], 1)
+        self.assertEqual(params[DriverParameter.PARSE_WORKERS], 1)
 
         # Try set resource individually
         self.driver.set_resource({DriverParameter.BATCHED_PARTICLE_COUNT: 2})
@@ -1146,7 +1154,11 @@ class DataSetQualificationTestCase(DataSetAgentTestCase):
         log.debug("Initialize the agent")
         expected_params = [DriverParameter.BATCHED_PARTICLE_COUNT,
                            DriverParameter.PUBLISHER_POLLING_INTERVAL,
-                           DriverParameter.RECORDS_PER_SECOND]
+                           DriverParameter.RECORDS_PER_SECOND,
+                           DriverParameter.RECOVERED_BATCH_COUNT,
+                           DriverParameter.CHECKPOINT_RECORD_COUNT,
+                           DriverParameter.CHECKPOINT_INTERVAL,
+                           DriverParameter.PARSE_WORKERS]
         self.assert_initialize(final_state=ResourceAgentState.COMMAND)
 
         log.debug("Call get capabilities")
@@ -1353,7 +1365,11 @@ class DataSetQualificationTestCase(DataSetAgentTestCase):
         '''
         return [DriverParameter.BATCHED_PARTICLE_COUNT,
                 DriverParameter.PUBLISHER_POLLING_INTERVAL,
-                DriverParameter.RECORDS_PER_SECOND]
+                DriverParameter.RECORDS_PER_SECOND,
+                DriverParameter.RECOVERED_BATCH_COUNT,
+                DriverParameter.CHECKPOINT_RECORD_COUNT,
+                DriverParameter.CHECKPOINT_INTERVAL,
+                DriverParameter.PARSE_WORKERS]
 
     def _common_agent_parameters(self):
         '''
@@ -48,6 +48,7 @@ from mi.core.exceptions import SampleException
 
 from mi.core.time import get_timestamp_delayed
 from mi.core.common import BaseEnum
+from mi.core.checksum import nortek_checksum
 
 # newline.
 NEWLINE = '\n\r'
@@ -1008,15 +1009,11 @@ class NortekProtocolParameterDict(ProtocolParameterDict):
         """
         Calculate the checksum
         """
-        calculated_checksum = CHECK_SUM_SEED
         if length is None:
             length = len(input)
 
-        for word_index in range(0, length - 2, 2):
-            word_value = NortekProtocolParameterDict.convert_word_to_int(input[word_index:word_index + 2])
-            calculated_checksum = (calculated_checksum + word_value) % 0x10000
-            #log.trace('w_i=%d, c_c=%d', word_index, calculated_checksum)
-        return calculated_checksum
+        # the words before the checksum in the last 2 bytes, starting from CHECK_SUM_SEED
+        return nortek_checksum(input, 0, 2 * ((length - 1) / 2))
 
     @staticmethod
     def convert_bytes_to_string(bytes_in):
@@ -1965,11 +1962,8 @@ class NortekInstrumentProtocol(CommandResponseInstrumentProtocol):
 
         log.debug("Created set output: %r with length: %s", output, len(output))
 
-        checksum = CHECK_SUM_SEED
         output = "".join(output)
-        for word_index in range(0, len(output), 2):
-            word_value = NortekProtocolParameterDict.convert_word_to_int(output[word_index:word_index+2])
-            checksum = (checksum + word_value) % 0x10000
+        checksum = nortek_checksum(output)
         log.debug('_create_set_output: user checksum = %r', checksum)
 
         output += (NortekProtocolParameterDict.word_to_string(checksum))
@@ -21,6 +21,7 @@ __license__ = 'Apache 2.0'
 import re
 import time
 import datetime
+import binascii
 
 from mi.core.log import get_logger
 
@@ -35,6 +36,7 @@ from mi.core.driver_scheduler import \
 
 from mi.core.util import dict_equal
 from mi.core.common import BaseEnum
+from mi.core.checksum import sum8
 from mi.core.instrument.data_particle import DataParticle
 from mi.core.instrument.data_particle import DataParticleKey
 from mi.core.instrument.data_particle import CommonDataParticleType
@@ -2124,10 +2126,10 @@ class SamiProtocol(CommandResponseInstrumentProtocol):
         @param s: string for check-sum analysis.
         """
 
-        cs = 0
-        for index in xrange(0, len(s), 2):
-            cs += int(s[index:index+2], 16)
-        cs &= 0xFF
+        # sum the bytes the ascii hex encodes, plus a trailing odd digit
+        cs = sum8(binascii.unhexlify(s[:len(s) & ~1]))
+        if len(s) & 1:
+            cs = (cs + int(s[-1], 16)) & 0xFF
         return cs
 
     def _build_param_dict(self):
@@ -18,6 +18,8 @@ from mi.core.log import get_logger
 
 log = get_logger()
 from mi.core.common import BaseEnum
+from mi.core.checksum import sum16
+from mi.core import pd0
 from mi.instrument.teledyne.driver import NEWLINE
 
 from mi.core.instrument.data_particle import DataParticle
@@ -40,6 +42,14 @@ ADCP_ANCILLARY_SYSTEM_DATA_REGEX_MATCHER = re.compile(ADCP_ANCILLARY_SYSTEM_DATA
 ADCP_TRANSMIT_PATH_REGEX = r'(IXMT.*\n.*\n.*\n.*)\n>'
 ADCP_TRANSMIT_PATH_REGEX_MATCHER = re.compile(ADCP_TRANSMIT_PATH_REGEX)
 
+#
+# Layouts of the PD0 data types as decoded by the PD0 particle
+#
+FIXED_LEADER_FORMAT = '!HBBHbBBBHHHBBBBHBBBBhhBBHHBBBBHQHBBIB'
+VARIABLE_LEADER_FORMAT = '<HHBBBBBBBBBBHHHhhHhBBBBBBBBBBBBBBBBBBBBLBLBBBBBBBB'
+# per cell values are read as four big endian words per cell
+CELL_DTYPE = '>u2'
+
 
 # ##############################################################################
 # Data Particles
@@ -242,11 +252,7 @@ class ADCP_PD0_PARSED_DataParticle(DataParticle):
         #
         # Calculate Checksum
         #
-        total = int(0)
-        for i in xrange(0, length):
-            total += int(ord(data[i]))
-
-        checksum = total & 65535  # bitwise and with 65535 or mod vs 65536
+        checksum = sum16(data, 0, length)
 
         if checksum != unpack("H", self.raw_data[length: length + 2])[0]:
             log.debug(
@@ -269,10 +275,7 @@ class ADCP_PD0_PARSED_DataParticle(DataParticle):
         self.final_result.append({DataParticleKey.VALUE_ID: ADCP_PD0_PARSED_KEY.NUM_DATA_TYPES,
                                   DataParticleKey.VALUE: num_data_types})
 
-        offsets = []
-        for offset in xrange(0, num_data_types):
-            value = unpack('<H', self.raw_data[(2 * offset + 6):(2 * offset + 8)])[0]
-            offsets.append(value)
+        offsets = pd0.data_type_offsets(data)
         self.final_result.append({DataParticleKey.VALUE_ID: ADCP_PD0_PARSED_KEY.OFFSET_DATA_TYPES,
                                   DataParticleKey.VALUE: offsets})
         offsets.append(length - 2)
@@ -314,7 +317,7 @@ class ADCP_PD0_PARSED_DataParticle(DataParticle):
          false_target_threshold,
          low_latency_trigger, transmit_lag_distance, cpu_board_serial_number, system_bandwidth, system_power,
          spare, serial_number, beam_angle) \
-            = unpack('!HBBHbBBBHHHBBBBHBBBBhhBBHHBBBBHQHBBIB', chunk[0:59])
+            = pd0.unpack_record(FIXED_LEADER_FORMAT, chunk)
 
         if 0 != fixed_leader_id:
             raise SampleException("fixed_leader_id was not equal to 0")
@@ -464,7 +467,7 @@ class ADCP_PD0_PARSED_DataParticle(DataParticle):
          RESERVED1, RESERVED2, pressure, RESERVED3, pressure_variance,
          rtc2k['century'], rtc2k['year'], rtc2k['month'], rtc2k['day'], rtc2k['hour'], rtc2k['minute'], rtc2k['second'],
          rtc2k['hundredths']) \
-            = unpack('<HHBBBBBBBBBBHHHhhHhBBBBBBBBBBBBBBBBBBBBLBLBBBBBBBB', chunk[0:65])
+            = pd0.unpack_record(VARIABLE_LEADER_FORMAT, chunk)
 
         if 128 != variable_leader_id:
             raise SampleException("variable_leader_id was not equal to 128")
@@ -585,7 +588,6 @@ class ADCP_PD0_PARSED_DataParticle(DataParticle):
         @throws SampleException If there is a problem with sample creation
         """
         N = (len(chunk) - 2) / 2 / 4
-        offset = 0
 
         velocity_data_id = unpack("!H", chunk[0:2])[0]
         if 1 != velocity_data_id:
@@ -597,17 +599,8 @@ class ADCP_PD0_PARSED_DataParticle(DataParticle):
             self._data_particle_type = DataParticleType.ADCP_PD0_PARSED_BEAM
             if self._slave:
                 self._data_particle_type = VADCPDataParticleType.VADCP_PD0_PARSED_BEAM
-            beam_1_velocity = []
-            beam_2_velocity = []
-            beam_3_velocity = []
-            beam_4_velocity = []
-            for row in xrange(1, N):
-                (a, b, c, d) = unpack('!HHHH', chunk[offset + 2: offset + 10])
-                beam_1_velocity.append(a)
-                beam_2_velocity.append(b)
-                beam_3_velocity.append(c)
-                beam_4_velocity.append(d)
-                offset += 4 * 2
+            (beam_1_velocity, beam_2_velocity, beam_3_velocity, beam_4_velocity) = \
+                pd0.unpack_cells(chunk, pd0.ID_BYTES, N - 1, CELL_DTYPE)
             self.final_result.append({DataParticleKey.VALUE_ID: ADCP_PD0_PARSED_KEY.BEAM_1_VELOCITY,
                                       DataParticleKey.VALUE: beam_1_velocity})
             self.final_result.append({DataParticleKey.VALUE_ID: ADCP_PD0_PARSED_KEY.BEAM_2_VELOCITY,
@@ -620,17 +613,8 @@ class ADCP_PD0_PARSED_DataParticle(DataParticle):
             self._data_particle_type = DataParticleType.ADCP_PD0_PARSED_EARTH
             if self._slave:
                 self._data_particle_type = VADCPDataParticleType.VADCP_PD0_PARSED_EARTH
-            water_velocity_east = []
-            water_velocity_north = []
-            water_velocity_up = []
-            error_velocity = []
-            for row in xrange(1, N):
-                (a, b, c, d) = unpack('!HHHH', chunk[offset + 2: offset + 10])
-                water_velocity_east.append(a)
-                water_velocity_north.append(b)
-                water_velocity_up.append(c)
-                error_velocity.append(d)
-                offset += 4 * 2
+            (water_velocity_east, water_velocity_north, water_velocity_up, error_velocity) = \
+                pd0.unpack_cells(chunk, pd0.ID_BYTES, N - 1, CELL_DTYPE)
             self.final_result.append({DataParticleKey.VALUE_ID: ADCP_PD0_PARSED_KEY.WATER_VELOCITY_EAST,
                                       DataParticleKey.VALUE: water_velocity_east})
             self.final_result.append({DataParticleKey.VALUE_ID: ADCP_PD0_PARSED_KEY.WATER_VELOCITY_NORTH,
@@ -650,7 +634,6 @@ class ADCP_PD0_PARSED_DataParticle(DataParticle):
         @throws SampleException If there is a problem with sample creation
         """
         N = (len(chunk) - 2) / 2 / 4
-        offset = 0
 
         correlation_magnitude_id = unpack("!H", chunk[0:2])[0]
         if 2 != correlation_magnitude_id:
@@ -658,17 +641,9 @@ class ADCP_PD0_PARSED_DataParticle(DataParticle):
         self.final_result.append({DataParticleKey.VALUE_ID: ADCP_PD0_PARSED_KEY.CORRELATION_MAGNITUDE_ID,
                                   DataParticleKey.VALUE: correlation_magnitude_id})
 
-        correlation_magnitude_beam1 = []
-        correlation_magnitude_beam2 = []
-        correlation_magnitude_beam3 = []
-        correlation_magnitude_beam4 = []
-        for row in xrange(1, N):
-            (a, b, c, d) = unpack('!HHHH', chunk[offset + 2: offset + 10])
-            correlation_magnitude_beam1.append(a)
-            correlation_magnitude_beam2.append(b)
-            correlation_magnitude_beam3.append(c)
-            correlation_magnitude_beam4.append(d)
-            offset += 4 * 2
+        (correlation_magnitude_beam1, correlation_magnitude_beam2, correlation_magnitude_beam3,
+         correlation_magnitude_beam4) = \
+            pd0.unpack_cells(chunk, pd0.ID_BYTES, N - 1, CELL_DTYPE)
 
         self.final_result.append({DataParticleKey.VALUE_ID: ADCP_PD0_PARSED_KEY.CORRELATION_MAGNITUDE_BEAM1,
                                   DataParticleKey.VALUE: correlation_magnitude_beam1})
@@ -686,7 +661,6 @@ class ADCP_PD0_PARSED_DataParticle(DataParticle):
         @throws SampleException If there is a problem with sample creation
         """
         N = (len(chunk) - 2) / 2 / 4
-        offset = 0
 
         echo_intensity_id = unpack("!H", chunk[0:2])[0]
         if 3 != echo_intensity_id:
@@ -694,17 +668,8 @@ class ADCP_PD0_PARSED_DataParticle(DataParticle):
         self.final_result.append({DataParticleKey.VALUE_ID: ADCP_PD0_PARSED_KEY.ECHO_INTENSITY_ID,
                                   DataParticleKey.VALUE: echo_intensity_id})
 
-        echo_intesity_beam1 = []
-        echo_intesity_beam2 = []
-        echo_intesity_beam3 = []
-        echo_intesity_beam4 = []
-        for row in xrange(1, N):
-            (a, b, c, d) = unpack('!HHHH', chunk[offset + 2: offset + 10])
-            echo_intesity_beam1.append(a)
-            echo_intesity_beam2.append(b)
-            echo_intesity_beam3.append(c)
-            echo_intesity_beam4.append(d)
-            offset += 4 * 2
+        (echo_intesity_beam1, echo_intesity_beam2, echo_intesity_beam3, echo_intesity_beam4) = \
+            pd0.unpack_cells(chunk, pd0.ID_BYTES, N - 1, CELL_DTYPE)
 
         self.final_result.append({DataParticleKey.VALUE_ID: ADCP_PD0_PARSED_KEY.ECHO_INTENSITY_BEAM1,
                                   DataParticleKey.VALUE: echo_intesity_beam1})
@@ -723,7 +688,6 @@ class ADCP_PD0_PARSED_DataParticle(DataParticle):
         """
 
         N = (len(chunk) - 2) / 2 / 4
-        offset = 0
 
         # coord_transform_type
         # Coordinate Transformation type:
@@ -740,17 +704,8 @@ class ADCP_PD0_PARSED_DataParticle(DataParticle):
             self._data_particle_type = DataParticleType.ADCP_PD0_PARSED_BEAM
             if self._slave:
                 self._data_particle_type = VADCPDataParticleType.VADCP_PD0_PARSED_BEAM
-            percent_good_beam1 = []
-            percent_good_beam2 = []
-            percent_good_beam3 = []
-            percent_good_beam4 = []
-            for row in xrange(1, N):
-                (a, b, c, d) = unpack('!HHHH', chunk[offset + 2: offset + 10])
-                percent_good_beam1.append(a)
-                percent_good_beam2.append(b)
-                percent_good_beam3.append(c)
-                percent_good_beam4.append(d)
-                offset += 4 * 2
+            (percent_good_beam1, percent_good_beam2, percent_good_beam3, percent_good_beam4) = \
+                pd0.unpack_cells(chunk, pd0.ID_BYTES, N - 1, CELL_DTYPE)
             self.final_result.append({DataParticleKey.VALUE_ID: ADCP_PD0_PARSED_KEY.PERCENT_GOOD_BEAM1,
                                       DataParticleKey.VALUE: percent_good_beam1})
             self.final_result.append({DataParticleKey.VALUE_ID: ADCP_PD0_PARSED_KEY.PERCENT_GOOD_BEAM2,
@@ -763,17 +718,8 @@ class ADCP_PD0_PARSED_DataParticle(DataParticle):
             self._data_particle_type = DataParticleType.ADCP_PD0_PARSED_EARTH
             if self._slave:
                 self._data_particle_type = VADCPDataParticleType.VADCP_PD0_PARSED_EARTH
-            percent_good_3beam = []
-            percent_transforms_reject = []
-            percent_bad_beams = []
-            percent_good_4beam = []
-            for row in xrange(1, N):
-                (a, b, c, d) = unpack('!HHHH', chunk[offset + 2: offset + 10])
-                percent_good_3beam.append(a)
-                percent_transforms_reject.append(b)
-                percent_bad_beams.append(c)
-                percent_good_4beam.append(d)
-                offset += 4 * 2
+            (percent_good_3beam, percent_transforms_reject, percent_bad_beams, percent_good_4beam) = \
+                pd0.unpack_cells(chunk, pd0.ID_BYTES, N - 1, CELL_DTYPE)
             self.final_result.append({DataParticleKey.VALUE_ID: ADCP_PD0_PARSED_KEY.PERCENT_GOOD_3BEAM,
                                       DataParticleKey.VALUE: percent_good_3beam})
             self.final_result.append({DataParticleKey.VALUE_ID: ADCP_PD0_PARSED_KEY.PERCENT_TRANSFORMS_REJECT,